@@ -0,0 +1,302 @@
+import json
+import os
+import re
+from utils.backends import get_model
+from utils.retry_handler import gemini_request_with_retry
+from utils.telemetry import AGENT_OUTPUTS, OUTPUT_REPAIRS, REASKED_FIELDS, record_parse_failure, span
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+# Model of each tier; MODEL_TIER_<TIER> overrides it
+MODEL_TIERS = {"small": "gemini-1.5-flash-8b", "standard": DEFAULT_MODEL}
+# Agents that do not use the standard tier by default
+AGENT_TIERS = {"triage": "small"}
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def object_schema(properties, required=None):
+    """
+    Builds a response schema for a flat JSON object.
+
+    `properties` maps each key to its schema, e.g. {"type": "STRING"} or
+    {"type": "STRING", "enum": ["LOW", "MEDIUM", "HIGH"]}. Every key is
+    required unless `required` says otherwise.
+    """
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(properties) if required is None else required,
+    }
+
+
+def string_fields(fields):
+    """Returns {field: {"type": "STRING"}} for each field, the schema of most extraction keys."""
+    return {field: {"type": "STRING"} for field in fields}
+
+
+def _json_candidates(text):
+    """Yields the response text with progressively more aggressive local fixes, naming each fix."""
+    text = _FENCE.sub("", text.strip()).strip()
+    start, end = text.find("{"), text.rfind("}")
+    # Drop prose around the object; a cut-off object has no closing brace to stop at
+    extracted = text[max(start, 0):end + 1 if end > start else len(text)]
+    fixes = ["extracted"] if extracted != text else []
+    yield extracted, fixes
+    text = extracted
+
+    fixes = list(fixes)
+    fixed = text.translate(_SMART_QUOTES)
+    if fixed != text:
+        fixes.append("smart_quotes")
+    if _TRAILING_COMMA.search(fixed):
+        fixed = _TRAILING_COMMA.sub(r"\1", fixed)
+        fixes.append("trailing_commas")
+    literals = re.sub(r"\b(True|False|None)\b", lambda m: _PYTHON_LITERALS[m.group(1)], fixed)
+    if literals != fixed:
+        fixed = literals
+        fixes.append("python_literals")
+    if fixed != text:
+        yield fixed, fixes
+    for closed in _close_truncated(fixed):
+        yield closed, fixes + ["truncated"]
+
+
+def _close_truncated(text):
+    """
+    Yields versions of a cut-off JSON object closed after its last complete
+    top-level members. A value cut off mid-string, mid-number or mid-list is
+    dropped rather than kept, since it could pass validation with the wrong
+    content; the re-ask asks for it again.
+    """
+    stack = []
+    in_string = escaped = False
+    cuts = []
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == "," and len(stack) == 1:
+            cuts.append(position)
+    if not stack:
+        return
+    if len(stack) == 1 and not in_string and text.rstrip()[-1:] in ('"', "}", "]"):
+        yield text + "}"
+    for position in reversed(cuts):
+        yield text[:position] + "}"
+
+
+def parse_json(text):
+    """
+    Parses a model's JSON object, repairing common formatting problems locally.
+
+    Handles markdown fences, prose around the object, smart quotes, trailing
+    commas, Python literals and output cut off mid-object (keeping the
+    complete members). Returns (dict, list of repairs applied); raises
+    ValueError if no repair yields a JSON object.
+    """
+    for candidate, repairs in _json_candidates(text):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data, repairs
+    raise ValueError("Response is not a JSON object.")
+
+
+def _check_value(value, schema):
+    """Returns (value, repair or None, problem or None) for one field against its schema."""
+    kind = schema.get("type", "STRING")
+    repair = None
+    if value is None:
+        return value, None, "is missing"
+
+    if kind == "STRING":
+        if isinstance(value, list):
+            value, repair = "; ".join(str(item) for item in value), "coerced"
+        elif not isinstance(value, str):
+            value, repair = json.dumps(value) if isinstance(value, dict) else str(value), "coerced"
+        if not value.strip():
+            return value, repair, "is empty"
+        if "enum" in schema and value not in schema["enum"]:
+            matches = [option for option in schema["enum"] if option.lower() == value.strip().lower()]
+            if not matches:
+                return value, repair, f"must be one of {', '.join(schema['enum'])}"
+            value, repair = matches[0], "enum_case"
+    elif kind in ("INTEGER", "NUMBER"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            try:
+                value, repair = float(str(value).strip().rstrip("%")), "coerced"
+            except ValueError:
+                return value, repair, "must be a number"
+        if kind == "INTEGER":
+            if value != int(value):
+                return value, repair, "must be a whole number"
+            value = int(value)
+        if "minimum" in schema and value < schema["minimum"]:
+            return value, repair, f"must be at least {schema['minimum']}"
+        if "maximum" in schema and value > schema["maximum"]:
+            return value, repair, f"must be at most {schema['maximum']}"
+    return value, repair, None
+
+
+def validate(data, schema):
+    """
+    Checks a parsed object against a flat object schema.
+
+    Returns (valid fields, {field: problem}, repairs), where values of the
+    wrong but convertible type (e.g. "72" for an integer, "high" for "HIGH")
+    are converted and listed in repairs.
+    """
+    valid, problems, repairs = {}, {}, []
+    required = set(schema.get("required", ()))
+    for field, field_schema in schema["properties"].items():
+        if field not in data:
+            if field in required:
+                problems[field] = "is missing"
+            continue
+        value, repair, problem = _check_value(data[field], field_schema)
+        if problem:
+            problems[field] = problem
+        else:
+            valid[field] = value
+        if repair:
+            repairs.append(repair)
+    return valid, problems, repairs
+
+
+def _valid_reply(schema):
+    """Returns a check that a reply text parses into an object with every field of `schema` valid."""
+    def check(text):
+        try:
+            data, _ = parse_json(text)
+        except ValueError:
+            return False
+        return not validate(data, schema)[1]
+    return check
+
+
+def agent_models():
+    """
+    Parses AGENT_MODELS, e.g. "risk=small,recommendation=gemini-1.5-pro".
+
+    Each agent is mapped to a tier name or a model name.
+    """
+    models = {}
+    for entry in os.getenv("AGENT_MODELS", "").split(","):
+        agent, _, model = entry.partition("=")
+        if agent.strip() and model.strip():
+            models[agent.strip()] = model.strip()
+    return models
+
+
+def model_for(agent):
+    """Returns the model an agent calls: its AGENT_MODELS entry, else its default tier's model."""
+    model = agent_models().get(agent) or AGENT_TIERS.get(agent, "standard")
+    if model in MODEL_TIERS:
+        return os.getenv(f"MODEL_TIER_{model.upper()}", MODEL_TIERS[model])
+    return model
+
+
+def json_config(schema):
+    """Returns the generation config of a JSON-mode call with the given response schema."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+def warm_models(schemas):
+    """
+    Creates the model instance each agent's first call will use.
+
+    `schemas` maps an agent to its response schema. Backends share models by
+    name and generation config, so this warms exactly the instances that
+    structured_call later requests, on each agent's configured model.
+    """
+    for agent, schema in schemas.items():
+        get_model(model_for(agent), generation_config=json_config(schema))
+
+
+def _reask_prompt(prompt, problems):
+    details = "\n".join(f'    - "{field}" {problem}' for field, problem in problems.items())
+    return f"""{prompt}
+
+    Your previous answer had missing or invalid values for these keys:
+{details}
+
+    Return a JSON object with only these keys.
+    """
+
+
+def structured_call(agent, prompt, schema, fallback=None, model_name=None, use_cache=True):
+    """
+    Asks the model for a JSON object matching `schema` and returns a valid dict.
+
+    The model is called in JSON mode with the schema. The reply is repaired
+    locally where possible (see parse_json and validate); fields that are
+    still missing or invalid are asked for again in a follow-up call whose
+    schema covers only those fields (AGENT_REASK_ATTEMPTS, default 1). Fields
+    that never become valid take their value from `fallback` (default
+    "Error"). Outcomes and repairs are counted per agent in the metrics.
+    `use_cache` applies to the first call; a reply is only cached when it is
+    valid, so a malformed one is never served again. The model defaults
+    to the agent's configured one (see model_for).
+    """
+    fallback = fallback or {}
+    model_name = model_name or model_for(agent)
+    result = {}
+    problems = {}
+    attempts = 1 + int(os.getenv("AGENT_REASK_ATTEMPTS", "1"))
+    request_schema, request_prompt = schema, prompt
+    repaired = False
+
+    for attempt in range(attempts):
+        if attempt:
+            print(f"{agent}: re-asking for {', '.join(problems)}...")
+            REASKED_FIELDS.inc(len(problems), agent=agent)
+            request_schema = object_schema({field: schema["properties"][field] for field in problems})
+            request_prompt = _reask_prompt(prompt, problems)
+
+        model = get_model(model_name, generation_config=json_config(request_schema))
+        with span("structured_output", agent, attempt=attempt + 1):
+            # Only replies that pass validation are cached; re-asks always go to the model
+            response = gemini_request_with_retry(model, request_prompt, use_cache=use_cache and not attempt,
+                                                 cache_if=_valid_reply(request_schema))
+            try:
+                data, repairs = parse_json(response.text)
+            except (ValueError, AttributeError) as e:
+                print(f"Error parsing AI response: {e}")
+                record_parse_failure(agent)
+                data, repairs = {}, []
+
+        valid, invalid, value_repairs = validate(data, request_schema)
+        for repair in repairs + value_repairs:
+            OUTPUT_REPAIRS.inc(agent=agent, repair=repair)
+        repaired = repaired or bool(repairs or value_repairs)
+        result.update(valid)
+        problems = invalid
+        if not problems:
+            break
+
+    if problems:
+        print(f"{agent}: no valid value for {', '.join(problems)}.")
+        outcome = "failed"
+    else:
+        outcome = "reasked" if attempt else "repaired" if repaired else "valid"
+    AGENT_OUTPUTS.inc(agent=agent, outcome=outcome)
+
+    for field in schema["properties"]:
+        if field not in result and field in schema.get("required", ()):
+            result[field] = fallback.get(field, "Error")
+    return result
@@ -1,40 +1,60 @@
 import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+import os
+
+from agents.base import object_schema, string_fields, structured_call
+from utils import peer_benchmarks
+from utils.context_builder import log_prompt_size
+
+RESPONSE_SCHEMA = object_schema(string_fields(["benchmark_summary"]))
+
+
+def llm_summary_enabled():
+    """BENCHMARK_LLM_SUMMARY=1 has the model rephrase the computed comparison."""
+    return os.getenv("BENCHMARK_LLM_SUMMARY", "0").lower() in ("1", "true", "yes")
+
 
 def benchmark_metrics(analysis_data: dict) -> dict:
     """
-    Benchmarks metrics against industry standards using a generative AI model.
-    """
-    print("Running Benchmark Agent with Vertex AI...")
+    Benchmarks metrics against the peer reference table for the startup's stage and sector.
 
-    model = GenerativeModel("gemini-1.5-flash")
-
-    input_data_str = json.dumps(analysis_data, indent=2)
+    Percentiles, z-scores and ratios come from utils.peer_benchmarks, so the
+    result is deterministic and needs no model call. Only with
+    BENCHMARK_LLM_SUMMARY is the model asked to phrase the summary, and its
+    answer may not change the computed numbers.
+    """
+    print("Running Benchmark Agent...")
+
+    result = peer_benchmarks.benchmark(analysis_data)
+    summary = peer_benchmarks.summarize(result)
+    if llm_summary_enabled() and result["metrics"]:
+        summary = _phrase_summary(result, summary)["benchmark_summary"]
+    return {"benchmark_summary": summary, **result}
+
+
+def _phrase_summary(result, summary):
+    comparisons = {
+        peer_benchmarks.LABELS[metric]: {
+            "value": peer_benchmarks.format_value(metric, comparison["value"]),
+            "peer_median": peer_benchmarks.format_value(metric, comparison["median"]),
+            "percentile": comparison["percentile"],
+            "assessment": comparison["assessment"],
+        }
+        for metric, comparison in result["metrics"].items()
+    }
 
     prompt = f"""
-    As a startup analyst, review the following structured data.
-    Compare the financial and market metrics (e.g., LTV/CAC ratio, revenue, market size) against typical benchmarks for a startup at this stage and sector.
-
-    Provide a "benchmark_summary" of how the startup compares to its peers (e.g., "LTV/CAC ratio is strong, but market penetration is low").
+    As a startup analyst, write a short "benchmark_summary" of how this startup compares to {peer_benchmarks.peer_group(result["stage"], result["sector"])}.
+    Use only the comparisons below; do not change any number or add benchmarks of your own. Lead with the strongest and weakest metrics.
 
     Return the result as a single-key JSON object with the key "benchmark_summary".
 
-    Input Data:
+    Comparisons:
     ---
-    {input_data_str}
+    {json.dumps(comparisons, separators=(",", ":"))}
     ---
 
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "benchmark_summary": "Error processing benchmark analysis."
-        }
+    log_prompt_size("benchmark", prompt)
+    return structured_call("benchmark", prompt, RESPONSE_SCHEMA, fallback={"benchmark_summary": summary})
@@ -1,24 +1,126 @@
+import contextvars
+import hashlib
 import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from agents.base import object_schema, string_fields, structured_call
+from utils.disk_cache import named_cache
+from utils.document_index import split_chunks
+from utils.rate_limiter import estimate_tokens
+
+SECTIONS = ["company_summary", "recent_updates", "key_discussion_points", "action_items", "red_flags"]
+RESPONSE_SCHEMA = object_schema(string_fields(SECTIONS))
+
+# Bump when the map prompt changes so stale summaries are not reused
+MAP_PROMPT_VERSION = 1
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Returns the on-disk cache of per-document summaries, keyed by document hash."""
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = named_cache("deal_summaries", "DEAL_SUMMARY_CACHE_MAX_MB", 100)
+        return _summary_cache
+
+
+def summarize_document(text: str) -> dict:
+    """
+    Map stage: condenses one document (or one part of a long document) into deal-note sections.
+
+    Summaries are cached by the hash of the text, so a document is only
+    summarized once no matter how many times the deal is regenerated.
+    """
+    key = hashlib.sha256(f"{MAP_PROMPT_VERSION}:{text}".encode("utf-8")).hexdigest()
+    cache = get_summary_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        print("Document summary served from cache.")
+        return cached
+
+    print("Summarizing document for deal notes with Vertex AI...")
+
+    prompt = f"""
+    You are a venture capital analyst. Summarize the following document, which may be a pitch deck, call transcript, founder update or email thread, for a potential investment deal.
+
+    Return a JSON object with these keys, keeping every concrete fact, number, name and date:
+
+    - "company_summary": What the document says about the startup.
+    - "recent_updates": Progress points and updates.
+    - "key_discussion_points": Salient points from discussions.
+    - "action_items": Follow-ups or next steps.
+    - "red_flags": Potential issues or concerns.
+
+    If the document has nothing for a key, use "Not found".
+
+    Document Text:
+    ---
+    {text}
+    ---
+
+    JSON Output:
+    """
+
+    summary = structured_call("deal_notes", prompt, RESPONSE_SCHEMA)
+    if not any(value == "Error" for value in summary.values()):
+        cache.put(key, summary)
+    return summary
+
+
+def _document_parts(texts):
+    """Splits documents that are too long for one map prompt into parts."""
+    max_tokens = int(os.getenv("DEAL_NOTES_MAP_TOKENS", "8000"))
+    parts = []
+    for number, text in enumerate(texts, start=1):
+        if estimate_tokens(text) <= max_tokens:
+            parts.append((f"DOCUMENT {number}", text))
+            continue
+        chunks = split_chunks(text)
+        group, size = [], 0
+        groups = []
+        for chunk in chunks:
+            if group and size + estimate_tokens(chunk) > max_tokens:
+                groups.append(group)
+                group, size = [], 0
+            group.append(chunk)
+            size += estimate_tokens(chunk)
+        if group:
+            groups.append(group)
+        for part_number, group in enumerate(groups, start=1):
+            parts.append((f"DOCUMENT {number} (PART {part_number} OF {len(groups)})", "\n".join(group)))
+    return parts
+
 
 def generate_notes(texts: list[str]) -> dict:
     """
     Generates structured deal notes from a list of text contents from multiple documents.
+
+    Each document is summarized separately and concurrently (map), and the
+    summaries are merged into the final notes in one more call (reduce).
+    Adding a document to a deal therefore costs one map call plus the reduce.
     """
     print("Running Deal Notes Agent with Vertex AI...")
 
-    model = GenerativeModel("gemini-1.5-flash")
+    parts = _document_parts(texts)
+    with ThreadPoolExecutor(max_workers=max(1, min(len(parts), int(os.getenv("DEAL_NOTES_MAP_WORKERS", "4"))))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, summarize_document, text) for _, text in parts]
+        summaries = [future.result() for future in futures]
 
-    # Combine all text content into a single string with separators
-    combined_text = "\n\n---" + "-" + "-" + " NEW DOCUMENT " + "---" + "\n\n".join(texts)
+    combined_summaries = "\n\n".join(
+        f"--- {title} ---\n{json.dumps(summary, ensure_ascii=False)}"
+        for (title, _), summary in zip(parts, summaries)
+    )
 
     prompt = f"""
-    You are a venture capital analyst. You have been given a collection of documents related to a potential investment deal. These documents may include pitch decks, call transcripts, founder updates, and email threads.
+    You are a venture capital analyst. You have been given per-document summaries of a collection of documents related to a potential investment deal. These documents may include pitch decks, call transcripts, founder updates, and email threads.
 
-    Your task is to synthesize all the information from these documents into a single, structured set of "deal notes".
+    Your task is to synthesize all the information from these summaries into a single, structured set of "deal notes". Prefer the most recent information when documents disagree, and remove duplicates.
 
-    Review the combined text from all documents provided below and generate a JSON object with the following structure:
+    Generate a JSON object with the following structure:
 
     - "company_summary": A brief overview of the startup.
     - "recent_updates": Key progress points and updates mentioned in the documents.
@@ -28,25 +130,10 @@ def generate_notes(texts: list[str]) -> dict:
 
     If any section is not applicable or no information is found, use "Not found".
 
-    Combined Document Text:
-    ---
-    {combined_text}
-    ---
+    Document Summaries:
+    {combined_summaries}
 
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "company_summary": "Error",
-            "recent_updates": "Error",
-            "key_discussion_points": "Error",
-            "action_items": "Error",
-            "red_flags": "Error"
-        }
+    return structured_call("deal_notes", prompt, RESPONSE_SCHEMA)
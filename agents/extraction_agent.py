@@ -0,0 +1,54 @@
+from agents.base import object_schema, string_fields, structured_call
+from utils.metric_extractor import known_fields
+
+FINANCIAL_FIELDS = ["revenue", "cac", "ltv"]
+MARKET_FIELDS = ["tam", "sam", "som"]
+TEAM_FIELDS = ["founders_background", "team_size", "ip_patents"]
+
+RESPONSE_SCHEMA = object_schema(string_fields(FINANCIAL_FIELDS + MARKET_FIELDS + TEAM_FIELDS))
+
+
+def extract_all(text_content: str) -> dict:
+    """
+    Extracts the financial, market and team fields in a single schema-constrained call.
+
+    Returns the same dict shapes as the financial, market and team agents,
+    keyed by "financial_data", "market_data" and "team_data". Metrics the
+    rule-based extractor reads with high confidence take precedence.
+    """
+    print("Running Combined Extraction Agent with Vertex AI...")
+
+    prompt = f"""
+    You are a precise data extraction bot. Analyze the following startup text and extract these fields:
+
+    Financial:
+    - "revenue": look for explicit mentions of 'revenue', 'ARR', 'Annual Recurring Revenue', or 'booked revenue'.
+    - "cac": Customer Acquisition Cost.
+    - "ltv": Lifetime Value.
+
+    Market:
+    - "tam", "sam", "som": the total, serviceable and obtainable market sizes.
+
+    Team:
+    - "founders_background": a brief summary of the founders' experience.
+    - "team_size": the number of people on the team.
+    - "ip_patents": a summary of any mention of intellectual property.
+
+    **CRITICAL:** Do not estimate, calculate, or assume any values. If a field is not explicitly stated in the text, you MUST return "Not found" for that field.
+
+    Text:
+    ---
+    {text_content}
+    ---
+    """
+
+    data = structured_call("extraction", prompt, RESPONSE_SCHEMA)
+
+    known, _ = known_fields(text_content, FINANCIAL_FIELDS + MARKET_FIELDS + ["team_size"])
+    data.update(known)
+
+    return {
+        "financial_data": {field: data[field] for field in FINANCIAL_FIELDS},
+        "market_data": {field: data[field] for field in MARKET_FIELDS},
+        "team_data": {field: data[field] for field in TEAM_FIELDS},
+    }
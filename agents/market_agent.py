@@ -1,18 +1,23 @@
-import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+from agents.base import object_schema, string_fields, structured_call
+from utils.metric_extractor import known_fields
 
 def analyze_market(text_content: str) -> dict:
     """
     Analyzes market data from the text using a generative AI model.
+
+    Market sizes stated verbatim in the text are read by the rule-based
+    extractor and the model is only asked for the remaining ones.
     """
-    print("Running Market Agent with Vertex AI...")
+    known, missing = known_fields(text_content, ["tam", "sam", "som"])
+    if not missing:
+        print("Market Agent: all metrics read by the rule-based extractor.")
+        return known
 
-    model = GenerativeModel("gemini-1.5-flash")
+    print("Running Market Agent with Vertex AI...")
 
     prompt = f"""
     Analyze the following startup description and extract the specified market size metrics.
-    Return the result as a JSON object with the keys "tam", "sam", and "som".
+    Return the result as a JSON object with the keys {", ".join(f'"{field}"' for field in missing)}.
     If a metric is not found, set its value to "Not found".
 
     Text:
@@ -23,16 +28,4 @@ def analyze_market(text_content: str) -> dict:
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "tam": "Error",
-            "sam": "Error",
-            "som": "Error",
-            "country": "Error"
-        }
+    return {**structured_call("market", prompt, object_schema(string_fields(missing))), **known}
@@ -1,14 +1,66 @@
-import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+import contextvars
+import os
+import threading
+from agents.base import object_schema, string_fields, structured_call
+from utils.company_cache import CompanyCache
+from utils.disk_cache import named_cache
+from utils.llm_cache import cache_enabled
+
+RESPONSE_SCHEMA = object_schema(string_fields(["news_sentiment", "public_data_summary"]))
+
+# Bump when the prompt changes so stale summaries are not reused
+PROMPT_VERSION = 1
+
+_company_cache = None
+_company_cache_lock = threading.Lock()
+
+
+def get_company_cache():
+    """Returns the cache of public data per company (PUBLIC_DATA_TTL_SECONDS, default one day)."""
+    global _company_cache
+    with _company_cache_lock:
+        if _company_cache is None:
+            _company_cache = CompanyCache(
+                named_cache("public_data", "PUBLIC_DATA_CACHE_MAX_MB", 20),
+                ttl=float(os.getenv("PUBLIC_DATA_TTL_SECONDS", "86400")),
+                namespace=f"v{PROMPT_VERSION}",
+            )
+        return _company_cache
+
 
 def analyze_public_data(company_name: str) -> dict:
     """
     Analyzes public data for the company using a generative AI model.
+
+    Results are shared by every document of the same company (see
+    utils.company_cache.company_key) until they expire, and concurrent
+    analyses of one company wait for a single model call.
     """
-    print("Running Public Data Agent with Vertex AI...")
+    return get_company_cache().get_or_compute(
+        company_name,
+        lambda: _ask_model(company_name),
+        cacheable=lambda data: not any(str(value).startswith("Error") for value in data.values()),
+        store=cache_enabled(),
+    )
+
 
-    model = GenerativeModel("gemini-1.5-flash")
+def prefetch_public_data(company_name: str):
+    """Starts analyze_public_data in the background so the pipeline finds it cached or in flight."""
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(_prefetch, company_name),
+                              name="public-data-prefetch", daemon=True)
+    thread.start()
+
+
+def _prefetch(company_name):
+    try:
+        analyze_public_data(company_name)
+    except Exception as e:
+        # The pipeline's own call reports the failure
+        print(f"Public data prefetch failed: {e}")
+
+
+def _ask_model(company_name):
+    print("Running Public Data Agent with Vertex AI...")
 
     prompt = f"""
     Based on your general knowledge, provide a summary of the public sentiment and any recent significant news for a company named '{company_name}'.
@@ -20,14 +72,7 @@ def analyze_public_data(company_name: str) -> dict:
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "news_sentiment": "Error",
-            "public_data_summary": "Error processing public data analysis."
-        }
+    # The company cache above decides how long an answer is reused
+    return structured_call("public_data", prompt, RESPONSE_SCHEMA, use_cache=False, fallback={
+        "public_data_summary": "Error processing public data analysis."
+    })
@@ -1,6 +1,11 @@
-import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+from agents.base import object_schema, structured_call
+from utils.context_builder import build_context, log_prompt_size
+
+RESPONSE_SCHEMA = object_schema({
+    "recommendation": {"type": "STRING", "enum": ["BUY", "HOLD", "PASS"]},
+    "confidence": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+    "investment_rationale": {"type": "STRING"},
+})
 
 def generate_recommendation(final_data: dict) -> dict:
     """
@@ -8,9 +13,8 @@ def generate_recommendation(final_data: dict) -> dict:
     """
     print("Running Recommendation Agent with Vertex AI...")
 
-    model = GenerativeModel("gemini-1.5-flash")
-
-    input_data_str = json.dumps(final_data, indent=2)
+    # Send only the fields this agent needs, in compact form
+    input_data_str = build_context("recommendation", final_data)
 
     prompt = f"""
     You are a principal investment analyst at a venture capital firm. You have been provided with a structured JSON object containing comprehensive analysis of a startup, compiled from various specialist agents (financial, market, team, risk, benchmark, public data).
@@ -32,15 +36,8 @@ def generate_recommendation(final_data: dict) -> dict:
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "recommendation": "Error",
-            "confidence": 0,
-            "investment_rationale": "Error processing final recommendation."
-        }
+    log_prompt_size("recommendation", prompt)
+    return structured_call("recommendation", prompt, RESPONSE_SCHEMA, fallback={
+        "confidence": 0,
+        "investment_rationale": "Error processing final recommendation."
+    })
@@ -1,6 +1,10 @@
-import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+from agents.base import object_schema, string_fields, structured_call
+from utils.context_builder import build_context, log_prompt_size
+
+RESPONSE_SCHEMA = object_schema({
+    **string_fields(["financial_risk", "market_risk", "execution_risk"]),
+    "overall_risk": {"type": "STRING", "enum": ["LOW", "MEDIUM", "HIGH"]},
+})
 
 def analyze_risk(analysis_data: dict) -> dict:
     """
@@ -8,10 +12,8 @@ def analyze_risk(analysis_data: dict) -> dict:
     """
     print("Running Risk Agent with Vertex AI...")
 
-    model = GenerativeModel("gemini-1.5-flash")
-
-    # Convert the input data dictionary to a JSON string for the prompt
-    input_data_str = json.dumps(analysis_data, indent=2)
+    # Send only the fields this agent needs, in compact form
+    input_data_str = build_context("risk", analysis_data)
 
     prompt = f"""
     As a startup risk analyst, review the following structured data which contains the output from financial, market, and team analysis agents.
@@ -30,16 +32,5 @@ def analyze_risk(analysis_data: dict) -> dict:
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "financial_risk": "Error",
-            "market_risk": "Error",
-            "execution_risk": "Error",
-            "overall_risk": "Error"
-        }
+    log_prompt_size("risk", prompt)
+    return structured_call("risk", prompt, RESPONSE_SCHEMA)
@@ -1,18 +1,21 @@
-import json
-from vertexai.generative_models import GenerativeModel
-from utils.retry_handler import gemini_request_with_retry
+from agents.base import object_schema, string_fields, structured_call
+from utils.metric_extractor import known_fields
 
 def analyze_team(text_content: str) -> dict:
     """
     Analyzes team data from the text using a generative AI model.
+
+    An explicitly stated team size is read by the rule-based extractor; the
+    founders' background and IP always need the model.
     """
-    print("Running Team Agent with Vertex AI...")
+    known, missing = known_fields(text_content, ["team_size"])
+    fields = ["founders_background"] + missing + ["ip_patents"]
 
-    model = GenerativeModel("gemini-1.5-flash")
+    print("Running Team Agent with Vertex AI...")
 
     prompt = f"""
     Analyze the following startup description and extract details about the team.
-    Return the result as a JSON object with the keys "founders_background", "team_size", and "ip_patents".
+    Return the result as a JSON object with the keys {", ".join(f'"{field}"' for field in fields)}.
     For "founders_background", provide a brief summary of their experience. For "ip_patents", summarize any mention of intellectual property.
     If a metric is not found, set its value to "Not found".
 
@@ -24,15 +27,4 @@ def analyze_team(text_content: str) -> dict:
     JSON Output:
     """
 
-    response = gemini_request_with_retry(model, prompt)
-
-    try:
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned_response)
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing AI response: {e}")
-        return {
-            "founders_background": "Error",
-            "team_size": "Error",
-            "ip_patents": "Error"
-        }
+    return {**structured_call("team", prompt, object_schema(string_fields(fields))), **known}
@@ -0,0 +1,54 @@
+import os
+
+from agents.base import object_schema, string_fields, structured_call
+from utils.context_builder import log_prompt_size, shorten
+from utils.metric_extractor import FINANCIAL_FIELDS, MARKET_FIELDS, known_fields
+
+RESPONSE_SCHEMA = object_schema({
+    "score": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+    **string_fields(["screen_summary", "red_flags"]),
+})
+
+
+def triage_context_tokens():
+    return int(os.getenv("TRIAGE_CONTEXT_TOKENS", "1500"))
+
+
+def screen_deck(text_content: str, profile: dict = None) -> dict:
+    """
+    Gives a deck a preliminary 0-100 score from one call on the small model tier.
+
+    The model only reads the start of the document (TRIAGE_CONTEXT_TOKENS),
+    where decks state their pitch and headline numbers, plus the metrics the
+    rule-based extractor found in the whole text. A failed call scores None,
+    so the caller can escalate rather than drop the deck.
+    """
+    print("Running Triage Agent...")
+
+    metrics, _ = known_fields(text_content, [*FINANCIAL_FIELDS, *MARKET_FIELDS, "team_size"])
+    excerpt = shorten(text_content, 4 * triage_context_tokens())
+    facts = "; ".join(f"{field}: {value}" for field, value in {**(profile or {}), **metrics}.items()
+                      if value not in (None, "all"))
+
+    prompt = f"""
+    You are screening inbound startup pitch decks for a venture capital firm. Most decks do not fit; flag the ones worth a full analysis.
+    Based on the excerpt below, give:
+    1.  A "score" from 0 to 100: how likely the startup is to merit investment (traction, market size, team, clarity of the business).
+    2.  A one-sentence "screen_summary" of the business and the main reason for the score.
+    3.  The main "red_flags", or "None".
+
+    Return the result as a JSON object with the keys "score", "screen_summary" and "red_flags".
+
+    Metrics found in the full document: {facts or "none"}
+
+    Excerpt:
+    ---
+    {excerpt}
+    ---
+
+    JSON Output:
+    """
+
+    log_prompt_size("triage", prompt)
+    result = structured_call("triage", prompt, RESPONSE_SCHEMA, fallback={"score": None})
+    return {**result, "metrics": metrics}
@@ -0,0 +1,86 @@
+"""Helpers shared by the benchmarks that record their results per commit."""
+import json
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def multipart(filename, content):
+    """Encodes one file as a multipart/form-data body for the "file" field."""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def request_json(url, data=None, content_type=None, timeout=60):
+    """Sends a GET (or a POST with `data`) and returns (status, decoded JSON body)."""
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": content_type} if content_type else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def wait_for_job(base_url, job_id, poll_interval=0.05):
+    """Polls /jobs/{job_id} until it finishes and returns the final job."""
+    while True:
+        _, job = request_json(f"{base_url}/jobs/{job_id}")
+        if job.get("status") in ("done", "failed", "timeout"):
+            return job
+        time.sleep(poll_interval)
+
+
+def git_commit():
+    """Returns (short commit hash, whether tracked files are modified), or (None, False) outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def previous_result(path, settings, commit):
+    """Returns the latest recorded result with the same settings from another commit, or None."""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["settings"] == settings and record["commit"] != commit:
+                previous = record
+    return previous
+
+
+def report_results(title, settings, results, path=RESULTS_PATH, compare=False, record=True):
+    """Prints results (with the change against the previous commit if asked) and appends them to `path`."""
+    commit, dirty = git_commit()
+    print(f"\n{title} (commit {commit}{'+dirty' if dirty else ''}):")
+    previous = previous_result(path, settings, commit) if compare else None
+    for key, value in results.items():
+        line = f"  {key:<24} {value}"
+        if previous and isinstance(previous["results"].get(key), (int, float)) and previous["results"][key]:
+            change = (value - previous["results"][key]) / previous["results"][key] * 100
+            line += f"   ({change:+.1f}% vs {previous['commit']})"
+        print(line)
+    if record:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "commit": commit, "dirty": dirty,
+                                "settings": settings, "results": results}) + "\n")
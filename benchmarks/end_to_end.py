@@ -0,0 +1,254 @@
+"""
+End-to-end latency and throughput of the analysis pipeline and the web server.
+
+Usage:
+    python -m benchmarks.end_to_end sample_startup.txt [--scenario latency throughput http]
+        [--runs 10] [--concurrency 8] [--workers 2] [--backend fake|vertex] [--triage] [--compare]
+
+Scenarios:
+    latency     run_analysis one deck at a time: mean, p50, p95 and max seconds.
+    throughput  run_analysis on --concurrency decks at once: decks per second.
+    http        POST /analyze from --concurrency clients against a local server:
+                accepted requests per second, rejections (HTTP 503), and the time
+                until every job has finished on --workers worker processes. Each
+                request sends a slightly different document so none are deduplicated.
+
+With --triage, TRIAGE_MODE is on and every run analyzes a slightly different
+copy of the deck, so the triage scores (and the share of decks that exit
+early, reported as triage_exit_share) vary as they would across a funnel.
+
+By default the offline fake backend is used (configure it with the FAKE_*
+variables), so the numbers measure this code rather than the network. The
+response cache and report store are disabled so every run does the full work.
+Each result is appended to benchmarks/results.jsonl with the current git
+commit; --compare prints the change against the latest result recorded for
+the same scenario and settings on another commit.
+"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from benchmarks.common import RESULTS_PATH, multipart, percentile, report_results, request_json, wait_for_job
+
+
+def _quiet(verbose):
+    # Agents log every call; keep the benchmark output readable
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+@contextlib.contextmanager
+def _quiet_processes(verbose):
+    # Worker processes write to the inherited file descriptor, not sys.stdout
+    if verbose:
+        yield
+        return
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def _backend_counts():
+    from utils.backends import get_backend
+    from utils.rate_limiter import get_limiter
+
+    backend = get_backend()
+    counts = {"requests": get_limiter().metrics()["requests"]}
+    if hasattr(backend, "stats"):
+        counts.update(backend.stats())
+    return counts
+
+
+def _per_run(before, after, runs):
+    return {f"{key}_per_deck": round((after[key] - before[key]) / runs, 2)
+            for key in ("requests", "prompt_tokens", "output_tokens", "throttled") if key in after}
+
+
+def _inputs(input_file, runs, triage):
+    """The deck once per run; in triage mode each copy differs, so each gets its own score."""
+    if not triage:
+        return [input_file] * runs
+    with open(input_file, "rb") as f:
+        content = f.read()
+    directory = tempfile.mkdtemp(prefix="bench-decks-")
+    name, extension = os.path.splitext(os.path.basename(input_file))
+    paths = []
+    for i in range(runs):
+        paths.append(os.path.join(directory, f"{name}-{i}{extension}"))
+        with open(paths[-1], "wb") as f:
+            f.write(content + f"\n\n(run {i})".encode("utf-8"))
+    return paths
+
+
+def _paths_taken(reports):
+    paths = [report.get("analysis_path") for report in reports]
+    if "full" in paths or not paths:
+        return {}
+    return {"triage_exit_share": round(paths.count("triage_exit") / len(paths), 2)}
+
+
+def bench_latency(input_file, runs, verbose, triage=False):
+    from main import run_analysis
+
+    latencies = []
+    reports = []
+    before = _backend_counts()
+    for path in _inputs(input_file, runs, triage):
+        start = time.perf_counter()
+        with _quiet(verbose):
+            reports.append(run_analysis(path))
+        latencies.append(time.perf_counter() - start)
+    errors = sum("error" in report for report in reports)
+    return {
+        "mean_s": round(statistics.mean(latencies), 3),
+        "p50_s": round(percentile(latencies, 0.5), 3),
+        "p95_s": round(percentile(latencies, 0.95), 3),
+        "max_s": round(max(latencies), 3),
+        "errors": errors,
+        **_paths_taken(reports),
+        **_per_run(before, _backend_counts(), runs),
+    }
+
+
+def bench_throughput(input_file, runs, concurrency, verbose, triage=False):
+    from main import run_analysis
+
+    inputs = _inputs(input_file, runs, triage)
+    before = _backend_counts()
+    start = time.perf_counter()
+    with _quiet(verbose), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        reports = list(executor.map(run_analysis, inputs))
+    elapsed = time.perf_counter() - start
+    return {
+        "decks_per_s": round(runs / elapsed, 3),
+        "elapsed_s": round(elapsed, 3),
+        "errors": sum("error" in report for report in reports),
+        **_paths_taken(reports),
+        **_per_run(before, _backend_counts(), runs),
+    }
+
+
+def bench_http(input_file, runs, concurrency, verbose):
+    import uvicorn
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    # A fresh queue so jobs left over from other runs are not picked up
+    os.environ["JOB_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench-jobs-"), "jobs.sqlite")
+    with _quiet(verbose), _quiet_processes(verbose):
+        import web_server
+        server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    with open(input_file, "rb") as f:
+        content = f.read()
+    requests = [multipart(os.path.basename(input_file), content + f"\n\n(run {i})".encode("utf-8"))
+                for i in range(runs)]
+
+    def submit(i):
+        body, content_type = requests[i]
+        start = time.perf_counter()
+        status, payload = request_json(f"{base_url}/analyze", body, content_type)
+        return status, payload.get("job_id"), time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        with _quiet(verbose):
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                responses = list(executor.map(submit, range(runs)))
+            submitted = time.perf_counter() - start
+            job_ids = [job_id for status, job_id, _ in responses if status == 202]
+            failed = sum(wait_for_job(base_url, job_id)["status"] != "done" for job_id in job_ids)
+        finished = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        with _quiet_processes(verbose):
+            thread.join()
+
+    request_latencies = [seconds for _, _, seconds in responses]
+    return {
+        "accepted_rps": round(len(job_ids) / submitted, 2),
+        "request_p95_ms": round(percentile(request_latencies, 0.95) * 1000, 1),
+        "rejected_503": sum(status == 503 for status, _, _ in responses),
+        "jobs_failed": failed,
+        "completed_per_s": round(len(job_ids) / finished, 3),
+        "elapsed_s": round(finished, 3),
+    }
+
+
+def _settings(args, scenario):
+    settings = {"scenario": scenario, "input": os.path.basename(args.input_file), "runs": args.runs,
+                "backend": os.environ["AI_BACKEND"], "extraction_mode": os.getenv("EXTRACTION_MODE", "separate")}
+    if args.triage:
+        settings["triage_threshold"] = os.getenv("TRIAGE_THRESHOLD", "40")
+    if scenario != "latency":
+        settings["concurrency"] = args.concurrency
+    if scenario == "http":
+        settings["workers"] = args.workers
+    if settings["backend"] == "fake":
+        settings.update({key.lower(): value for key, value in sorted(os.environ.items()) if key.startswith("FAKE_")})
+    return settings
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end analysis latency and throughput.")
+    parser.add_argument("input_file", help="Path to the startup material file.")
+    parser.add_argument("--scenario", nargs="+", choices=["latency", "throughput", "http"],
+                        default=["latency", "throughput", "http"])
+    parser.add_argument("--runs", type=int, default=10, help="Analyses (or HTTP requests) per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent analyses or HTTP clients.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")),
+                        help="Worker processes the web server starts (http scenario).")
+    parser.add_argument("--backend", choices=["fake", "vertex"], default="fake")
+    parser.add_argument("--triage", action="store_true", help="Screen each deck first (TRIAGE_MODE=1).")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSONL file the results are appended to.")
+    parser.add_argument("--no-record", action="store_true", help="Do not append the results.")
+    parser.add_argument("--compare", action="store_true", help="Compare with the last result from another commit.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log output.")
+    args = parser.parse_args()
+
+    os.environ["AI_BACKEND"] = args.backend
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ["REPORT_STORE_DISABLED"] = "1"
+    os.environ["JOB_WORKERS"] = str(args.workers)
+    os.environ["TRIAGE_MODE"] = "1" if args.triage else "0"
+    if args.backend == "fake":
+        # The fake has no quota of its own; keep the limiter from being the only thing measured
+        os.environ.setdefault("GEMINI_RPM", "100000")
+        os.environ.setdefault("GEMINI_TPM", "100000000")
+        os.environ.setdefault("JOB_QUEUE_SIZE", str(max(args.runs, 20)))
+
+    scenarios = {
+        "latency": lambda: bench_latency(args.input_file, args.runs, args.verbose, args.triage),
+        "throughput": lambda: bench_throughput(args.input_file, args.runs, args.concurrency, args.verbose,
+                                             args.triage),
+        "http": lambda: bench_http(args.input_file, args.runs, args.concurrency, args.verbose),
+    }
+    for scenario in args.scenario:
+        results = scenarios[scenario]()
+        report_results(f"{scenario} ({args.backend} backend)", _settings(args, scenario), results,
+                       path=args.results, compare=args.compare, record=not args.no_record)
+
+if __name__ == "__main__":
+    main()
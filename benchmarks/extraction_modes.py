@@ -0,0 +1,74 @@
+"""
+Compares the "separate" (three calls) and "combined" (one call) extraction modes.
+
+Usage:
+    python -m benchmarks.extraction_modes sample_startup.txt --runs 3
+
+Uses the same credentials as the main application. The response cache is
+disabled so every run reaches the model. Input tokens are the limiter's
+estimate of the prompts that were sent.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+
+def build_extraction_graph(mode):
+    """Returns only the extraction nodes of the analysis graph for the given mode."""
+    from main import build_analysis_graph
+
+    wanted = {"document_index", "extraction", "financial_data", "market_data", "team_data"}
+    return [node for node in build_analysis_graph(mode) if node.name in wanted]
+
+
+def run_mode(mode, content, runs):
+    from utils.pipeline import run_pipeline
+    from utils.rate_limiter import get_limiter
+
+    limiter = get_limiter()
+    latencies = []
+    before = limiter.metrics()
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_pipeline(build_extraction_graph(mode), {"content": content})
+        latencies.append(time.perf_counter() - start)
+    after = limiter.metrics()
+
+    return {
+        "mode": mode,
+        "calls_per_deck": (after["requests"] - before["requests"]) / runs,
+        "input_tokens_per_deck": (after["tokens_estimated"] - before["tokens_estimated"]) / runs,
+        "latency_median_s": statistics.median(latencies),
+        "latency_max_s": max(latencies),
+    }
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+
+    parser = argparse.ArgumentParser(description="Benchmark separate vs. combined extraction.")
+    parser.add_argument("input_file", help="Path to the startup material file.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs per mode.")
+    args = parser.parse_args()
+
+    from utils import file_parser
+    content = file_parser.parse_file(args.input_file)
+
+    results = [run_mode(mode, content, args.runs) for mode in ("separate", "combined")]
+
+    print(f"\n{'mode':<10} {'calls':>6} {'input tokens':>13} {'median s':>9} {'max s':>7}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['calls_per_deck']:>6.1f} {result['input_tokens_per_deck']:>13.0f} "
+              f"{result['latency_median_s']:>9.2f} {result['latency_max_s']:>7.2f}")
+    separate, combined = results
+    if combined["input_tokens_per_deck"]:
+        print(f"\nInput token reduction: {separate['input_tokens_per_deck'] / combined['input_tokens_per_deck']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
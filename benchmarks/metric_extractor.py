@@ -0,0 +1,110 @@
+"""
+Measures the rule-based metric extractor against a labelled corpus.
+
+Usage:
+    python -m benchmarks.metric_extractor [--corpus benchmarks/metric_corpus.jsonl] [--compare-llm]
+
+Reports how many financial/market agent calls the rules make unnecessary,
+the precision and recall of the values they accept, and their latency.
+With --compare-llm the same documents also go through the model-only path
+(METRIC_RULES_DISABLED) so the two can be compared field by field.
+"""
+import argparse
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from utils.metric_extractor import FINANCIAL_FIELDS, MARKET_FIELDS, known_fields, parse_amount
+
+FIELDS = FINANCIAL_FIELDS + MARKET_FIELDS + ("team_size",)
+
+
+def _matches(text, expected):
+    amount = parse_amount(text)
+    return amount is not None and abs(amount["value"] - expected) <= 0.01 * abs(expected)
+
+
+def evaluate_rules(corpus):
+    accepted = correct = labelled = recalled = 0
+    calls_saved = 0
+    timings = []
+    for entry in corpus:
+        start = time.perf_counter()
+        known = {}
+        for group in (FINANCIAL_FIELDS, MARKET_FIELDS, ("team_size",)):
+            group_known, missing = known_fields(entry["text"], list(group))
+            known.update(group_known)
+            if not missing and group != ("team_size",):
+                calls_saved += 1
+        timings.append(time.perf_counter() - start)
+
+        for field in FIELDS:
+            expected = entry["expected"].get(field)
+            if expected is not None:
+                labelled += 1
+            if field in known:
+                accepted += 1
+                if expected is not None and _matches(known[field], expected):
+                    correct += 1
+                    recalled += 1
+
+    return {
+        "documents": len(corpus),
+        "model_calls_saved": calls_saved,
+        "model_calls_without_rules": 2 * len(corpus),
+        "fields_accepted": accepted,
+        "precision": correct / accepted if accepted else 0.0,
+        "recall": recalled / labelled if labelled else 0.0,
+        "mean_latency_us": 1e6 * sum(timings) / len(timings),
+    }
+
+
+def evaluate_llm(corpus):
+    """Runs the model-only extraction and scores it against the same labels."""
+    from agents import financial_agent, market_agent, team_agent
+
+    os.environ["METRIC_RULES_DISABLED"] = "1"
+    correct = labelled = 0
+    for entry in corpus:
+        result = {
+            **financial_agent.analyze_financials(entry["text"]),
+            **market_agent.analyze_market(entry["text"]),
+            **team_agent.analyze_team(entry["text"]),
+        }
+        for field in FIELDS:
+            expected = entry["expected"].get(field)
+            if expected is not None:
+                labelled += 1
+                if _matches(str(result.get(field)), expected):
+                    correct += 1
+    os.environ.pop("METRIC_RULES_DISABLED")
+    return {"recall": correct / labelled if labelled else 0.0, "model_calls": 3 * len(corpus)}
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based metric extractor.")
+    parser.add_argument("--corpus", default=os.path.join(base_dir, "benchmarks", "metric_corpus.jsonl"))
+    parser.add_argument("--compare-llm", action="store_true", help="Also score the model-only extraction path.")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    rules = evaluate_rules(corpus)
+    print(f"Documents: {rules['documents']}")
+    print(f"Financial/market model calls saved: {rules['model_calls_saved']} of {rules['model_calls_without_rules']}")
+    print(f"Fields filled by rules: {rules['fields_accepted']} (precision {rules['precision']:.0%}, recall {rules['recall']:.0%})")
+    print(f"Mean extractor latency per document: {rules['mean_latency_us']:.0f} µs")
+
+    if args.compare_llm:
+        llm = evaluate_llm(corpus)
+        print(f"Model-only path: recall {llm['recall']:.0%} using {llm['model_calls']} model calls")
+
+
+if __name__ == "__main__":
+    main()
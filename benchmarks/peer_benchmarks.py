@@ -0,0 +1,93 @@
+"""
+Measures the local peer benchmark engine (utils/peer_benchmarks.py).
+
+Usage:
+    python -m benchmarks.peer_benchmarks [--batch 10000] [--runs 200] [--compare-llm]
+
+Reports the latency of benchmarking one startup, the per-startup cost of
+benchmarking a synthetic batch in one vectorized pass, and the time to load
+the reference table. With --compare-llm the benchmark agent is also run with
+BENCHMARK_LLM_SUMMARY=1 (the model phrases the summary) on the configured
+backend, so the cost of that round-trip can be compared.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from utils import peer_benchmarks
+
+STAGES = ("pre_seed", "seed", "series_a", "series_b", "growth", None)
+SECTORS = ("saas", "fintech", "healthtech", "consumer", None)
+
+
+def synthetic_startups(count, seed=0):
+    """Startups with log-uniform metrics; about one value in ten is missing, as in real extractions."""
+    rng = random.Random(seed)
+
+    def amount(low, high):
+        return None if rng.random() < 0.1 else f"${10 ** rng.uniform(low, high):,.0f}"
+
+    return [{
+        "stage": rng.choice(STAGES), "sector": rng.choice(SECTORS),
+        "revenue": amount(4, 8), "cac": amount(1, 4), "ltv": amount(2, 5),
+        "tam": amount(8.5, 11.5), "sam": amount(7.5, 10.5), "som": amount(6.5, 9.5),
+        "team_size": str(rng.randint(2, 400)),
+    } for _ in range(count)]
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+
+    parser = argparse.ArgumentParser(description="Benchmark the local peer benchmark engine.")
+    parser.add_argument("--batch", type=int, default=10000, help="Startups in the batch run.")
+    parser.add_argument("--runs", type=int, default=200, help="Single-startup runs to time.")
+    parser.add_argument("--compare-llm", action="store_true",
+                        help="Also time the benchmark agent with the model phrasing the summary.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    peer_benchmarks.load_reference()
+    print(f"Reference table load (incl. pandas import): {time.perf_counter() - start:.3f} s")
+
+    startups = synthetic_startups(max(args.batch, args.runs))
+    timings = []
+    for data in startups[:args.runs]:
+        start = time.perf_counter()
+        peer_benchmarks.summarize(peer_benchmarks.benchmark(data))
+        timings.append(time.perf_counter() - start)
+    print(f"One startup (benchmark + summary): median {1e6 * statistics.median(timings):.0f} µs")
+
+    batch = startups[:args.batch]
+    start = time.perf_counter()
+    results = peer_benchmarks.benchmark_many(batch)
+    seconds = time.perf_counter() - start
+    compared = sum(len(result["metrics"]) for result in results)
+    print(f"Batch of {len(batch)}: {seconds:.3f} s, {1e6 * seconds / len(batch):.1f} µs per startup "
+          f"({compared} metric comparisons)")
+
+    start = time.perf_counter()
+    frame = peer_benchmarks.benchmark_frame(batch)
+    print(f"Batch as a DataFrame: {time.perf_counter() - start:.3f} s, {len(frame)} rows")
+
+    if args.compare_llm:
+        from agents import benchmark_agent
+
+        os.environ["BENCHMARK_LLM_SUMMARY"] = "1"
+        os.environ["LLM_CACHE_DISABLED"] = "1"
+        timings = []
+        for data in startups[:5]:
+            start = time.perf_counter()
+            benchmark_agent.benchmark_metrics(data)
+            timings.append(time.perf_counter() - start)
+        os.environ.pop("BENCHMARK_LLM_SUMMARY")
+        print(f"With model-phrased summary ({os.getenv('AI_BACKEND', 'vertex')} backend): "
+              f"median {statistics.median(timings):.3f} s per startup")
+
+
+if __name__ == "__main__":
+    main()
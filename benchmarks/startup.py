@@ -0,0 +1,121 @@
+"""
+Cold-start cost of the CLI and the web server.
+
+Usage:
+    python -m benchmarks.startup sample_startup.txt [--runs 3] [--backend fake|vertex] [--compare]
+
+Every measurement starts a fresh Python process, so nothing is imported or
+initialized beforehand:
+
+    import_main_s        time to import main (what every CLI run pays first)
+    import_server_s      time to import web_server
+    cli_first_report_s   process start to a finished report from main.run_analysis
+    server_ready_s       process start to the first 200 from GET /health (warm-up included)
+    server_first_report_s process start to the first finished /analyze job
+
+Medians over --runs are reported and recorded like benchmarks.end_to_end.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+
+from dotenv import load_dotenv
+
+from benchmarks.common import RESULTS_PATH, multipart, report_results, request_json, wait_for_job
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(code, env):
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True,
+                            check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def import_seconds(module, env):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return float(_python(code, env))
+
+
+def cli_first_report_seconds(input_file, env):
+    start = time.perf_counter()
+    _python(f"import main; report = main.run_analysis({input_file!r}); print('error' in report)", env)
+    return time.perf_counter() - start
+
+
+def server_seconds(input_file, env):
+    """Returns (seconds until /health answers, seconds until the first /analyze job is done)."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    with open(input_file, "rb") as f:
+        body, content_type = multipart(os.path.basename(input_file), f.read())
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web_server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("The web server exited during startup.")
+            try:
+                if request_json(f"{base_url}/health", timeout=1)[0] == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        ready = time.perf_counter() - start
+
+        _, accepted = request_json(f"{base_url}/analyze", body, content_type)
+        wait_for_job(base_url, accepted["job_id"], poll_interval=0.02)
+        first_report = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return ready, first_report
+
+
+def main():
+    load_dotenv(dotenv_path=os.path.join(BASE_DIR, '.env'), override=True)
+
+    parser = argparse.ArgumentParser(description="Benchmark CLI and web server cold starts.")
+    parser.add_argument("input_file", help="Path to the startup material file.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement.")
+    parser.add_argument("--backend", choices=["fake", "vertex"], default="fake")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSONL file the results are appended to.")
+    parser.add_argument("--no-record", action="store_true", help="Do not append the results.")
+    parser.add_argument("--compare", action="store_true", help="Compare with the last result from another commit.")
+    args = parser.parse_args()
+
+    input_file = os.path.abspath(args.input_file)
+    env = dict(os.environ, AI_BACKEND=args.backend, LLM_CACHE_DISABLED="1", REPORT_STORE_DISABLED="1")
+    if args.backend == "fake":
+        env.setdefault("GEMINI_RPM", "100000")
+
+    samples = {"import_main_s": [], "import_server_s": [], "cli_first_report_s": [],
+               "server_ready_s": [], "server_first_report_s": []}
+    for _ in range(args.runs):
+        samples["import_main_s"].append(import_seconds("main", env))
+        samples["import_server_s"].append(import_seconds("web_server", env))
+        samples["cli_first_report_s"].append(cli_first_report_seconds(input_file, env))
+        ready, first_report = server_seconds(input_file, env)
+        samples["server_ready_s"].append(ready)
+        samples["server_first_report_s"].append(first_report)
+
+    results = {key: round(statistics.median(values), 3) for key, values in samples.items()}
+    settings = {"scenario": "startup", "input": os.path.basename(input_file), "runs": args.runs,
+                "backend": args.backend}
+    report_results(f"startup ({args.backend} backend)", settings, results, path=args.results,
+                   compare=args.compare, record=not args.no_record)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,419 @@
 import os
 import argparse
-import vertexai
+import time
+from functools import partial
+from operator import itemgetter
 from dotenv import load_dotenv
 
 from utils import file_parser
-from agents import (
-    financial_agent,
-    market_agent,
-    team_agent,
-    public_data_agent,
-    risk_agent,
-    benchmark_agent,
-    recommendation_agent
-)
-
-
-def run_analysis(file_path):
-    """Runs the full analysis pipeline on a given file."""
-    # Initialize Vertex AI with the correct project from .env
-    print(f"--- DEBUG: Initializing Vertex AI with project: {os.getenv('GOOGLE_CLOUD_PROJECT')} ---")
-    vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+from utils.batch import resolve_inputs, run_batch
+from utils.backends import get_backend
+from utils.document_index import DocumentIndex, relevant_context, run_on_relevant_context
+from utils.peer_benchmarks import infer_profile
+from utils.portfolio import normalize_metrics
+from utils.pipeline import Node, run_pipeline, same_inputs
+from utils.report_store import get_report_store, store_enabled
+from utils.telemetry import span, start_trace
+from utils.uploads import Upload
+from utils.rate_limiter import deadline_budget
+
+
+def _combine_extractions(company_name, profile, financial_data, market_data, team_data, public_data):
+    """Merges the document-level agent outputs into one dict for the downstream agents."""
+    return {
+        "company_name": company_name,
+        **profile,
+        **financial_data,
+        **market_data,
+        **team_data,
+        **public_data
+    }
+
+
+def _combine_final(combined_data, risk_data, benchmark_data):
+    """Merges all agent outputs for the final recommendation."""
+    return {**combined_data, **risk_data, **benchmark_data}
+
+
+def _model_key(agent, key=same_inputs):
+    """Reuse key that also includes the agent's model, so changing AGENT_MODELS or a tier is not served old outputs."""
+    def model_key(*args):
+        from agents.base import model_for
+        return {"model": model_for(agent), "inputs": key(*args)}
+    return model_key
+
+
+def build_analysis_graph(extraction_mode="separate"):
+    """
+    Declares the agents of the analysis pipeline and the values they depend on.
+
+    In "combined" extraction mode the financial, market and team fields are
+    read from the document in one schema-constrained call instead of three.
+    """
+    # Agents are imported when the first graph is built, not when this module is loaded
+    from agents import (
+        extraction_agent,
+        financial_agent,
+        market_agent,
+        team_agent,
+        public_data_agent,
+        risk_agent,
+        benchmark_agent,
+        recommendation_agent
+    )
+
+    if extraction_mode == "combined":
+        extraction_nodes = [
+            Node("extraction", partial(run_on_relevant_context, "extraction", extraction_agent.extract_all),
+                 ["document_index"], key=_model_key("extraction", partial(relevant_context, "extraction"))),
+            Node("financial_data", itemgetter("financial_data"), ["extraction"]),
+            Node("market_data", itemgetter("market_data"), ["extraction"]),
+            Node("team_data", itemgetter("team_data"), ["extraction"]),
+        ]
+    elif extraction_mode == "separate":
+        extraction_nodes = [
+            Node("financial_data", partial(run_on_relevant_context, "financial", financial_agent.analyze_financials),
+                 ["document_index"], key=_model_key("financial", partial(relevant_context, "financial"))),
+            Node("market_data", partial(run_on_relevant_context, "market", market_agent.analyze_market),
+                 ["document_index"], key=_model_key("market", partial(relevant_context, "market"))),
+            Node("team_data", partial(run_on_relevant_context, "team", team_agent.analyze_team),
+                 ["document_index"], key=_model_key("team", partial(relevant_context, "team"))),
+        ]
+    else:
+        raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+
+    # Agents with a reuse key are skipped when a stored earlier output has the same inputs
+    return [
+        # Ingestion: chunk and index the document so each agent reads only its relevant sections
+        Node("document_index", DocumentIndex, ["content"]),
+        # Stage and sector select the benchmark peer group; read with keyword rules, no model call
+        Node("profile", infer_profile, ["content"]),
+        # Parallel Processing Agents
+        *extraction_nodes,
+        # Not reused from the report store: the company cache (PUBLIC_DATA_TTL_SECONDS) decides how long it is kept
+        Node("public_data", public_data_agent.analyze_public_data, ["company_name"]),
+        Node("combined_data", _combine_extractions,
+             ["company_name", "profile", "financial_data", "market_data", "team_data", "public_data"]),
+        # Risk and benchmark only need the combined extraction, so they also run side by side
+        Node("risk_data", risk_agent.analyze_risk, ["combined_data"], key=_model_key("risk")),
+        Node("benchmark_data", benchmark_agent.benchmark_metrics, ["combined_data"], key=_model_key("benchmark")),
+        Node("final_data", _combine_final, ["combined_data", "risk_data", "benchmark_data"]),
+        Node("recommendation_data", recommendation_agent.generate_recommendation, ["final_data"],
+             key=_model_key("recommendation")),
+    ]
+
+
+def _agent_schemas():
+    """Response schema of each agent's first call; the per-field agents are asked for all of their fields."""
+    from agents import (benchmark_agent, deal_notes_agent, extraction_agent, public_data_agent,
+                        recommendation_agent, risk_agent, triage_agent)
+    from agents.base import object_schema, string_fields
+    from agents.financial_agent import FIELD_DESCRIPTIONS
+    from utils.metric_extractor import MARKET_FIELDS
+
+    return {
+        "triage": triage_agent.RESPONSE_SCHEMA,
+        "extraction": extraction_agent.RESPONSE_SCHEMA,
+        "financial": object_schema(string_fields(FIELD_DESCRIPTIONS)),
+        "market": object_schema(string_fields(MARKET_FIELDS)),
+        "team": object_schema(string_fields(["founders_background", "team_size", "ip_patents"])),
+        "public_data": public_data_agent.RESPONSE_SCHEMA,
+        "risk": risk_agent.RESPONSE_SCHEMA,
+        "benchmark": benchmark_agent.RESPONSE_SCHEMA,
+        "recommendation": recommendation_agent.RESPONSE_SCHEMA,
+        "deal_notes": deal_notes_agent.RESPONSE_SCHEMA,
+    }
+
+
+def warm_up():
+    """
+    Does the one-time setup of an analysis ahead of the first request.
+
+    Imports the agents and the model SDK, initializes the backend and creates
+    its shared clients, including the model instance of every agent on its
+    configured model, and loads the PDF reader and the benchmark reference
+    table. Returns the seconds each step took.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    build_analysis_graph()
+    timings["agents"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from google.api_core.exceptions import ResourceExhausted  # noqa: F401 - needed by the first model call
+    get_backend().warm_up()
+    from agents.base import warm_models
+    warm_models(_agent_schemas())
+    timings["backend"] = time.perf_counter() - start
+
+    start = time.perf_counter()
     try:
-        # 1. Document Ingestion
-        content = file_parser.parse_file(file_path)
-        company_name = content.splitlines()[0] if content else "Unknown Company"
-
-        # 2. Parallel Processing Agents
-        financial_data = financial_agent.analyze_financials(content)
-        market_data = market_agent.analyze_market(content)
-        team_data = team_agent.analyze_team(content)
-        public_data = public_data_agent.analyze_public_data(company_name)
-
-        # Combine parallel results
-        combined_data = {
-            "company_name": company_name,
-            **financial_data,
-            **market_data,
-            **team_data,
-            **public_data
-        }
+        import pypdf  # noqa: F401
+    except ImportError:
+        pass
+    timings["pdf_reader"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from utils.peer_benchmarks import load_reference
+    load_reference()
+    timings["peer_benchmarks"] = time.perf_counter() - start
+    return {step: round(seconds, 3) for step, seconds in timings.items()}
+
+
+# Pipeline values that are streamed to clients, keyed by the event name they are sent as
+STREAMED_RESULTS = {
+    "financial_data": "financial",
+    "market_data": "market",
+    "team_data": "team",
+    "public_data": "public_data",
+    "risk_data": "risk",
+    "benchmark_data": "benchmark",
+    "recommendation_data": "recommendation",
+}
+
+
+def triage_enabled():
+    """TRIAGE_MODE=1 screens each deck with one cheap call before the full pipeline."""
+    return os.getenv("TRIAGE_MODE", "0").lower() in ("1", "true", "yes")
+
+
+def triage_threshold():
+    return float(os.getenv("TRIAGE_THRESHOLD", "40"))
+
+
+def run_analysis(file_path, on_event=None, extraction_mode=None, trace=False, triage=None):
+    """
+    Runs the full analysis pipeline on a given file.
 
-        # 3. Sequential Analysis Agents
-        risk_data = risk_agent.analyze_risk(combined_data)
-        benchmark_data = benchmark_agent.benchmark_metrics(combined_data)
+    `file_path` may also be an in-memory upload (utils.uploads.Upload), which
+    is parsed without being written to disk.
 
-        # Combine all data for final recommendation
-        final_data = {**combined_data, **risk_data, **benchmark_data}
+    If `on_event(name, data)` is given, it is called with each agent's output
+    as soon as that agent finishes (see STREAMED_RESULTS for the names).
+    `extraction_mode` is "separate" or "combined" and defaults to the
+    EXTRACTION_MODE environment variable.
 
-        recommendation_data = recommendation_agent.generate_recommendation(final_data)
+    Unless REPORT_STORE_DISABLED is set, the report is saved to the report
+    store and agents whose inputs match a stored output are not re-run.
 
-        # 4. Final Output Assembly
+    With `trace`, the report carries a "trace" list of every span (parse,
+    agents, model calls, queue and back-off waits) recorded for this file.
+
+    With `triage` (default: TRIAGE_MODE), the deck is first screened by the
+    triage agent; one scoring below TRIAGE_THRESHOLD gets a lightweight PASS
+    report without running the other agents. The report's "analysis_path"
+    is "full", "triage_exit" or "triage_escalated".
+    """
+    if triage is None:
+        triage = triage_enabled()
+    with start_trace() as spans, span("analysis", "total"):
+        report = _run_analysis(file_path, on_event, extraction_mode, triage)
+    if trace:
+        report["trace"] = sorted(spans, key=lambda record: record["start"])
+    return report
+
+
+def _company_name(text):
+    return text.splitlines()[0] if text else "Unknown Company"
+
+
+def _prefetch_public_data(first_page):
+    from agents.public_data_agent import prefetch_public_data
+    prefetch_public_data(_company_name(first_page))
+
+
+def _screen(content, on_event):
+    """Runs the triage agent and decides whether the deck goes on to the full pipeline."""
+    from agents.triage_agent import screen_deck
+    from agents.base import model_for
+
+    start = time.perf_counter()
+    with span("agent", "triage"):
+        screen = screen_deck(content, infer_profile(content))
+    screen = {**screen, "threshold": triage_threshold(), "model": model_for("triage"),
+              "duration": time.perf_counter() - start}
+    # A deck whose screen failed is escalated rather than dropped
+    escalate = not isinstance(screen["score"], (int, float)) or screen["score"] >= screen["threshold"]
+    screen["path"] = "triage_escalated" if escalate else "triage_exit"
+    print(f"Triage score: {screen['score']} (threshold {screen['threshold']:g}) -> {screen['path']}")
+    if on_event is not None:
+        on_event("triage", screen)
+    return screen
+
+
+def _triage_summary(screen):
+    return {key: screen[key] for key in ("score", "threshold", "screen_summary", "red_flags", "model")}
+
+
+def _triage_report(company_name, doc_hash, screen):
+    """The lightweight report of a deck that did not pass triage."""
+    metrics = {field: screen["metrics"].get(field) for field in ("revenue", "cac", "ltv", "tam", "sam", "som")}
+    metrics["country"] = None
+    team = {"team_size": screen["metrics"].get("team_size")}
+    return {
+        "company_name": company_name,
+        "analysis_path": "triage_exit",
+        "recommendation": {
+            "recommendation": "PASS",
+            # The lower the screen scored the deck, the surer the PASS
+            "confidence": round(100 - screen["score"]),
+            "investment_rationale": screen["screen_summary"],
+        },
+        "triage": _triage_summary(screen),
+        "metrics": metrics,
+        "normalized_metrics": normalize_metrics(metrics, team),
+        "team": team,
+        "timings": {"triage": {"duration": screen["duration"]}},
+        "document_hash": doc_hash,
+    }
+
+
+def _run_analysis(file_path, on_event, extraction_mode, triage=False):
+    # The model backend (Vertex AI by default) is initialized once per process
+    get_backend().init()
+    try:
+        # 1. Document Ingestion; public data only needs the company name, so it starts with the first page,
+        # except in triage mode where most decks never get that far
+        on_first_page = None if triage else _prefetch_public_data
+        if isinstance(file_path, Upload):
+            doc_hash = file_path.sha256
+            content = file_path.parse(on_first_page=on_first_page)
+        else:
+            doc_hash = file_parser.file_hash(file_path)
+            content = file_parser.parse_file(file_path, on_first_page=on_first_page)
+        company_name = _company_name(content)
+        store = get_report_store() if store_enabled() else None
+        memo = store.memo() if store is not None else None
+
+        # Triage: one small-model call on the start of the deck; low scores stop here
+        screen = _screen(content, on_event) if triage else None
+        if screen is not None and screen["path"] == "triage_exit":
+            report = _triage_report(company_name, doc_hash, screen)
+            if store is not None:
+                report["report_id"] = store.save(doc_hash, company_name, report)
+            return report
+
+        # 2. Agent graph: each node runs as soon as its inputs are ready
+        def on_result(name, value):
+            if on_event is not None and name in STREAMED_RESULTS:
+                on_event(STREAMED_RESULTS[name], value)
+
+        with deadline_budget(float(os.getenv("PIPELINE_DEADLINE_SECONDS", "300"))):
+            values, timings = run_pipeline(
+                build_analysis_graph(extraction_mode or os.getenv("EXTRACTION_MODE", "separate")),
+                {"content": content, "company_name": company_name},
+                max_workers=int(os.getenv("PIPELINE_MAX_WORKERS", "4")),
+                on_result=on_result,
+                memo=memo,
+            )
+        financial_data = values["financial_data"]
+        market_data = values["market_data"]
+        team_data = values["team_data"]
+        public_data = values["public_data"]
+        risk_data = values["risk_data"]
+        benchmark_data = values["benchmark_data"]
+        recommendation_data = values["recommendation_data"]
+
+        # 3. Final Output Assembly
+        metrics = {
+            "revenue": financial_data.get('revenue'),
+            "cac": financial_data.get('cac'),
+            "ltv": financial_data.get('ltv'),
+            "tam": market_data.get('tam'),
+            "sam": market_data.get('sam'),
+            "som": market_data.get('som'),
+            "country": market_data.get('country'),
+        }
         report = {
             "company_name": company_name,
+            "analysis_path": screen["path"] if screen is not None else "full",
             "recommendation": recommendation_data,
-            "metrics": {
-                "revenue": financial_data.get('revenue'),
-                "cac": financial_data.get('cac'),
-                "ltv": financial_data.get('ltv'),
-                "tam": market_data.get('tam'),
-                "sam": market_data.get('sam'),
-                "som": market_data.get('som'),
-                "country": market_data.get('country'),
-            },
+            "metrics": metrics,
+            # The same metrics as numbers with currency and unit, as screened by /portfolio
+            "normalized_metrics": normalize_metrics(metrics, team_data),
             "team": team_data,
             "public_data": public_data,
             "risk": risk_data,
             "benchmark": benchmark_data,
+            "timings": timings,
+            "document_hash": doc_hash,
         }
+        if screen is not None:
+            report["triage"] = _triage_summary(screen)
+            report["timings"] = {"triage": {"duration": screen["duration"]}, **timings}
+        if store is not None:
+            report["reused_agents"] = sorted(memo.reused)
+            report["report_id"] = store.save(doc_hash, company_name, report, memo.outputs, memo.reused)
         return report
 
     except Exception as e:
         print(f"An error occurred during analysis: {e}")
         return {"error": str(e)}
 
+def run_batch_cli(args):
+    """Analyzes every document matched by the CLI arguments and prints a throughput summary."""
+    paths = resolve_inputs(args.input_file, args.manifest)
+    if not paths:
+        print("No .txt or .pdf documents matched the input.")
+        return
+
+    try:
+        summary = run_batch(
+            paths,
+            args.output,
+            partial(run_analysis, extraction_mode=args.extraction_mode, triage=args.triage),
+            concurrency=args.concurrency,
+            resume=not args.no_resume,
+        )
+    except ValueError as e:
+        print(f"Batch not started: {e}")
+        return
+    print("\n--- Batch Summary ---")
+    print(f"  Inputs: {summary['inputs']} (skipped, already done: {summary['skipped']})")
+    print(f"  Succeeded: {summary['succeeded']}, Failed: {summary['failed']}")
+    print(f"  Elapsed: {summary['seconds']:.1f}s, Throughput: {summary['docs_per_second']:.2f} docs/s")
+    print(f"  Results: {args.output}")
+    print("---------------------")
+
+
 def main():
     # Explicitly load .env from the script's directory
     base_dir = os.path.dirname(os.path.abspath(__file__))
     load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
 
     parser = argparse.ArgumentParser(description="AI Startup Investment Analyst")
-    parser.add_argument("input_file", help="Path to the startup material file.")
+    parser.add_argument("input_file", nargs="?",
+                        help="Path to the startup material file, or a directory or glob pattern for a batch.")
+    parser.add_argument("--extraction-mode", choices=["separate", "combined"], default=None,
+                        help="Extract financial, market and team fields with three calls or one combined call.")
+    parser.add_argument("--trace", action="store_true",
+                        help="Print every timed span (parse, agents, model calls, waits) of the analysis.")
+    parser.add_argument("--triage", action=argparse.BooleanOptionalAction, default=None,
+                        help="Screen each deck with one small-model call first; only promising decks get the full "
+                             "analysis. --no-triage turns it off for this run (default: TRIAGE_MODE).")
+    parser.add_argument("--manifest", help="Batch mode: a text file listing one document path per line.")
+    parser.add_argument("--output", default="batch_results.jsonl",
+                        help="Batch mode: results file; a .csv extension writes CSV, anything else JSONL.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                        help="Batch mode: number of documents analyzed at the same time.")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Batch mode: re-analyze documents that already have a result in the output file.")
     args = parser.parse_args()
 
+    if not args.input_file and not args.manifest:
+        parser.error("an input file, directory, glob pattern or --manifest is required")
+
     if not os.getenv("GOOGLE_API_KEY"):
         print("Error: GOOGLE_API_KEY not found in .env file.")
         return
 
+    if args.manifest or not os.path.isfile(args.input_file):
+        run_batch_cli(args)
+        return
+
     print(f"Analyzing {args.input_file}...")
-    report = run_analysis(args.input_file)
+    report = run_analysis(args.input_file, extraction_mode=args.extraction_mode, trace=args.trace, triage=args.triage)
 
     if "error" in report:
         print(f"Analysis failed: {report['error']}")
@@ -97,11 +423,19 @@ def main():
     print("\n--- Investment Analysis Report ---")
     print(f"COMPANY: {report['company_name']}")
     print(f"RECOMMENDATION: {report['recommendation'].get('recommendation')} (Confidence: {report['recommendation'].get('confidence')} %)")
-    print(f"Rationale: {report['recommendation'].get('investment_rationale')}\n")
+    print(f"Rationale: {report['recommendation'].get('investment_rationale')}")
+    print(f"PATH: {report['analysis_path']}\n")
+    if report.get('triage'):
+        triage = report['triage']
+        print(f"TRIAGE: score {triage['score']} (threshold {triage['threshold']:g}, model {triage['model']})")
+        print(f"  Red flags: {triage['red_flags']}\n")
     print("METRIC SCORECARD:")
     metrics = report['metrics']
     print(f"  Revenue: {metrics.get('revenue')}, CAC: {metrics.get('cac')}, LTV: {metrics.get('ltv')}")
     print(f"  TAM: {metrics.get('tam')}, SAM: {metrics.get('sam')}, SOM: {metrics.get('som')} (Market: {metrics.get('country')})")
+    if report['analysis_path'] == "triage_exit":
+        print("---------------------------------")
+        return
     print("\nTEAM ASSESSMENT:")
     team = report['team']
     print(f"  Founders Background: {team.get('founders_background')}")
@@ -120,6 +454,19 @@ def main():
     print("\nBENCHMARK ANALYSIS:")
     benchmark = report['benchmark']
     print(f"  {benchmark.get('benchmark_summary')}")
+    for metric, comparison in benchmark.get('metrics', {}).items():
+        print(f"  {metric}: percentile {comparison['percentile']}, z={comparison['z_score']:+.2f} "
+              f"(peers: {comparison['peers']})")
+    print("\nPIPELINE TIMINGS:")
+    for name, timing in report.get('timings', {}).items():
+        print(f"  {name}: {timing['duration']:.2f}s{' (reused)' if timing.get('reused') else ''}")
+    if report.get('trace'):
+        print("\nTRACE:")
+        for record in report['trace']:
+            attributes = ", ".join(f"{key}={value}" for key, value in record.items()
+                                   if key not in ("kind", "name", "start", "duration"))
+            print(f"  {record['start']:>8.3f}s +{record['duration']:.3f}s  {record['kind']}:{record['name']}"
+                  f"{'  ' + attributes if attributes else ''}")
     print("---------------------------------")
 
 
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Tests import the top-level modules (main, web_server, worker) and run offline against the fake backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "AI_BACKEND": "fake",
+    "LLM_CACHE_DISABLED": "1",
+    "REPORT_STORE_DISABLED": "1",
+    "PUBLIC_DATA_TTL_SECONDS": "0",
+    "GEMINI_RPM": "100000",
+    "GEMINI_TPM": "100000000",
+    "GOOGLE_API_KEY": "test",
+})
@@ -0,0 +1,32 @@
+import csv
+
+import pytest
+
+from utils.batch import CSV_COLUMNS, run_batch
+
+
+def _analyze(path):
+    return {"company_name": path, "recommendation": {"recommendation": "PASS", "confidence": 60}}
+
+
+def test_resumed_csv_keeps_its_columns(tmp_path):
+    output = str(tmp_path / "results.csv")
+    run_batch(["a.txt"], output, _analyze)
+    run_batch(["a.txt", "b.txt"], output, _analyze)
+
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == CSV_COLUMNS
+    assert [row[0] for row in rows[1:]] == ["a.txt", "b.txt"]
+    assert all(len(row) == len(CSV_COLUMNS) for row in rows)
+
+
+def test_csv_with_other_columns_is_not_appended_to(tmp_path):
+    output = tmp_path / "results.csv"
+    old_columns = [column for column in CSV_COLUMNS if column not in ("analysis_path", "triage_score")]
+    output.write_text(",".join(old_columns) + "\na.txt" + "," * (len(old_columns) - 1) + "\n", encoding="utf-8")
+    before = output.read_text(encoding="utf-8")
+
+    with pytest.raises(ValueError, match="different columns"):
+        run_batch(["a.txt", "b.txt"], str(output), _analyze)
+    assert output.read_text(encoding="utf-8") == before
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue
+
+DOCUMENT = [("abc123", "deck.txt", b"Acme Robotics")]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), orphan_after=0, max_attempts=2)
+    queue.register_worker("w1")
+    return queue
+
+
+def _orphan(queue, worker_id="w1"):
+    """Claims the next job after the previous run's heartbeat has gone stale (orphan_after is 0)."""
+    time.sleep(0.01)
+    return queue.claim(worker_id)
+
+
+def test_identical_active_jobs_are_deduplicated(queue):
+    first = queue.submit("analysis", {}, DOCUMENT, dedup_key="abc123.txt")
+    second = queue.submit("analysis", {}, DOCUMENT, dedup_key="abc123.txt")
+    other = queue.submit("analysis", {}, DOCUMENT, dedup_key="abc123.txt:trace")
+
+    assert first == second != other
+    assert queue.get(first)["subscribers"] == 2
+    assert queue.stats() == {"queued": 2}
+
+
+def test_job_is_cancelled_only_when_its_last_subscriber_leaves(queue):
+    job_id = queue.submit("analysis", {}, DOCUMENT, dedup_key="abc123.txt")
+    queue.submit("analysis", {}, DOCUMENT, dedup_key="abc123.txt")
+
+    assert queue.cancel(job_id) == "queued"
+    assert queue.cancel(job_id) == "cancelled"
+    assert queue.claim("w1") is None
+    # The cancelled job's documents are released
+    assert queue.load_documents(job_id) == []
+
+
+def test_running_job_is_stopped_at_the_next_heartbeat_when_cancelled(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.register_worker("w1")
+    job_id = queue.submit("analysis", {}, DOCUMENT)
+    queue.claim("w1")
+
+    assert queue.heartbeat("w1", job_id) is False
+    assert queue.cancel(job_id) == "running"
+    assert queue.heartbeat("w1", job_id) is True
+
+
+def test_orphaned_job_is_requeued_without_its_earlier_events(queue):
+    job_id = queue.submit("analysis", {}, DOCUMENT)
+    assert queue.claim("w1")["attempt"] == 1
+    queue.add_event(job_id, "financial", {"revenue": "$1M"})
+    queue.add_event(job_id, "market", {"tam": "$4B"})
+
+    job = _orphan(queue)
+    assert (job["id"], job["attempt"]) == (job_id, 2)
+    assert queue.events(job_id) == [(2, "requeued", {"attempt": 2})]
+
+    # A client that had read the first run's events still receives the new run's
+    queue.add_event(job_id, "financial", {"revenue": "$1.2M"})
+    assert queue.events(job_id, after=2) == [(3, "financial", {"revenue": "$1.2M"})]
+
+
+def test_job_fails_after_max_attempts(queue):
+    job_id = queue.submit("analysis", {}, DOCUMENT)
+    queue.claim("w1")
+    _orphan(queue)
+
+    assert _orphan(queue) is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert "2 attempts" in job["error"]
+    assert queue.finish(job_id, "w1", "done", result={}) is False
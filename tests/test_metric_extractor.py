@@ -0,0 +1,34 @@
+import pytest
+
+from utils.metric_extractor import FINANCIAL_FIELDS, MARKET_FIELDS, known_fields
+from utils.portfolio import normalize_metrics
+
+FIELDS = [*FINANCIAL_FIELDS, *MARKET_FIELDS]
+
+
+@pytest.mark.parametrize("text", [
+    "SAM: 500M users across Southeast Asia.",
+    "TAM of 50M households in India alone.",
+    "We expect revenue of $10M by 2026.",
+    "Target revenue $5M in 2025.",
+    "Revenue: 2.4M in FY23.",
+])
+def test_counts_projections_and_amounts_without_currency_are_left_to_the_model(text):
+    known, _ = known_fields(text, FIELDS)
+    assert known == {}
+
+
+def test_stated_amounts_are_read():
+    known, missing = known_fields("ARR: $1.2M. Our target market is worth $4B TAM.", FIELDS)
+    assert known == {"revenue": "$1.2M ARR", "tam": "$4B"}
+
+
+@pytest.mark.parametrize("text, revenue, annual_value", [
+    ("Our monthly recurring revenue is $100K.", "$100K MRR", 1.2e6),
+    ("Annual recurring revenue: $1.2M.", "$1.2M ARR", 1.2e6),
+    ("We closed the year at $3.5M ARR.", "$3.5M ARR", 3.5e6),
+])
+def test_revenue_keeps_whether_it_is_monthly_or_annual(text, revenue, annual_value):
+    known, _ = known_fields(text, FIELDS)
+    assert known["revenue"] == revenue
+    assert normalize_metrics(known)["revenue"]["value"] == annual_value
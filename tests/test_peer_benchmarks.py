@@ -0,0 +1,30 @@
+import pytest
+
+from utils.peer_benchmarks import benchmark, benchmark_frame
+
+
+@pytest.mark.parametrize("data, metric, assessment", [
+    ({"revenue": "$1M"}, "revenue", "at median"),
+    ({"cac": "$1,000"}, "cac", "at median"),
+    ({"revenue": "$1.5M"}, "revenue", "above median"),
+    ({"cac": "$800"}, "cac", "above median"),
+    ({"revenue": "$700K"}, "revenue", "below median"),
+])
+def test_assessment_around_the_median(data, metric, assessment):
+    assert benchmark(data)["metrics"][metric]["assessment"] == assessment
+    frame = benchmark_frame([data])
+    assert frame.loc[frame["metric"] == metric, "assessment"].item() == assessment
+
+
+def test_monthly_revenue_is_annualized_like_the_reference():
+    monthly = benchmark({"revenue": "$100K MRR", "stage": "seed", "sector": "saas"})["metrics"]["revenue"]
+    annual = benchmark({"revenue": "$1.2M ARR", "stage": "seed", "sector": "saas"})["metrics"]["revenue"]
+    assert monthly["value"] == annual["value"] == 1.2e6
+    assert monthly["percentile"] == annual["percentile"]
+
+
+@pytest.mark.parametrize("team_size", ["Since 2019, 25 employees", "2 founders and 25 employees"])
+def test_team_size_is_the_number_of_people(team_size):
+    metrics = benchmark({"team_size": team_size, "revenue": "$2.5M"})["metrics"]
+    assert metrics["team_size"]["value"] == 25
+    assert metrics["revenue_per_employee"]["value"] == 100e3
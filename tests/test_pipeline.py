@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from utils.backends import FakeBackend, get_backend, set_backend
+from utils.pipeline import Node, run_pipeline
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_startup.txt")
+LATENCY = 0.2
+
+
+def _sleep(seconds, value):
+    def func(*_):
+        time.sleep(seconds)
+        return value
+    return func
+
+
+def test_independent_nodes_run_in_parallel():
+    nodes = [
+        Node("a", _sleep(0.2, 1), ["start"]),
+        Node("b", _sleep(0.2, 2), ["start"]),
+        Node("c", _sleep(0.2, 3), ["start"]),
+        Node("d", _sleep(0.1, 4), ["a", "b", "c"]),
+    ]
+    start = time.perf_counter()
+    values, timings = run_pipeline(nodes, {"start": None}, max_workers=4)
+    elapsed = time.perf_counter() - start
+
+    assert values["d"] == 4
+    # Longest path is a|b|c then d: 0.3 s; run one after another the nodes take 0.7 s
+    assert 0.3 <= elapsed < 0.45
+    assert timings["d"]["start"] >= max(timings[name]["end"] for name in "abc")
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    # Every model call sleeps a fixed time; the rule-based extractor is off so each extraction agent calls it
+    monkeypatch.setenv("METRIC_RULES_DISABLED", "1")
+    previous = get_backend()
+    set_backend(FakeBackend(latency=LATENCY, jitter=0, distribution="fixed", ms_per_1k_tokens=0))
+    yield
+    set_backend(previous)
+
+
+def test_analysis_wall_time_is_close_to_the_longest_path(stub_model):
+    from main import build_analysis_graph, warm_up
+
+    # Imports and the benchmark table load are one-time costs, not part of the path
+    warm_up()
+    with open(SAMPLE) as f:
+        content = f.read()
+    start = time.perf_counter()
+    values, timings = run_pipeline(build_analysis_graph("separate"),
+                                   {"content": content, "company_name": "InnovateFlow"}, max_workers=4)
+    elapsed = time.perf_counter() - start
+
+    assert values["recommendation_data"]["recommendation"] in ("BUY", "HOLD", "PASS")
+    serial = sum(timing["duration"] for name, timing in timings.items() if name != "total")
+    # Longest path: an extraction agent, then risk, then recommendation, one model call each
+    assert serial >= 6 * LATENCY
+    assert 3 * LATENCY <= elapsed < 4.5 * LATENCY
+    assert elapsed < 0.6 * serial
@@ -0,0 +1,32 @@
+import pytest
+
+from utils.portfolio import normalize_metrics
+
+
+@pytest.mark.parametrize("text, value, annualized", [
+    ("$1.2M ARR, growing 15% monthly", 1.2e6, False),
+    ("$40K per month", 480e3, True),
+    ("$85K MRR", 1.02e6, True),
+    ("MRR: $85K", 1.02e6, True),
+    ("$30K/mo", 360e3, True),
+    ("$500K annual revenue, billed monthly", 500e3, False),
+    ("$2M", 2e6, False),
+])
+def test_revenue_is_annualized_only_when_the_amount_is_monthly(text, value, annualized):
+    revenue = normalize_metrics({"revenue": text})["revenue"]
+    assert revenue["value"] == pytest.approx(value)
+    assert ("annualized_from" in revenue) == annualized
+
+
+@pytest.mark.parametrize("text, size", [
+    ("Founded in 2019, 12 people", 12),
+    ("Team of 8 across 3 countries", 8),
+    ("45 employees", 45),
+    ("10", 10),
+    ("~25", 25),
+    ("Since 2019", None),
+    ("Not found", None),
+])
+def test_team_size_is_the_number_of_people(text, size):
+    normalized = normalize_metrics({}, {"team_size": text})
+    assert normalized.get("team_size", {}).get("value") == size
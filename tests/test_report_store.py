@@ -0,0 +1,35 @@
+import sqlite3
+
+from utils.portfolio import PortfolioTable
+from utils.report_store import ReportStore
+
+
+def _report(company_name, recommendation):
+    return {"company_name": company_name, "recommendation": {"recommendation": recommendation, "confidence": 70},
+            "metrics": {"revenue": "$1M ARR"}}
+
+
+def test_spelling_variants_of_a_company_are_one_company(tmp_path):
+    store = ReportStore(str(tmp_path / "reports.sqlite"))
+    store.save("doc1", "Acme, Inc.", _report("Acme, Inc.", "PASS"))
+    store.save("doc2", "ACME Inc", _report("ACME Inc", "INVEST"))
+
+    assert [report["document_hash"] for report in store.list(company="acme corp")] == ["doc2", "doc1"]
+    rows = PortfolioTable(store).query(latest=True)["rows"]
+    assert [row["recommendation"] for row in rows] == ["INVEST"]
+
+
+def test_company_keys_stored_by_an_earlier_version_are_recomputed(tmp_path):
+    path = str(tmp_path / "reports.sqlite")
+    store = ReportStore(path)
+    store.save("doc1", "Acme, Inc.", _report("Acme, Inc.", "PASS"))
+    store._db.close()
+    # The key an earlier version stored: lowercased, punctuation and legal form kept
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE reports SET company_key = 'acme, inc.'")
+        db.execute("UPDATE portfolio SET company_key = 'acme, inc.'")
+        db.execute("PRAGMA user_version = 0")
+
+    store = ReportStore(path)
+    assert len(store.list(company="ACME")) == 1
+    assert store._db.execute("SELECT company_key FROM portfolio").fetchall() == [("acme",)]
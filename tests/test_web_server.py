@@ -0,0 +1,93 @@
+import json
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from benchmarks.common import multipart
+
+LATENCY_MS = 300
+
+
+@pytest.fixture(scope="module")
+def base_url(tmp_path_factory):
+    """
+    A local server with one worker process, whose fake model answers every call after a fixed delay.
+
+    It is shared by the module: web_server opens its job queue once, on import.
+    """
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("JOB_WORKERS", "1")
+    monkeypatch.setenv("JOB_QUEUE_PATH", str(tmp_path_factory.mktemp("queue") / "jobs.sqlite"))
+    monkeypatch.setenv("FAKE_LATENCY_MS", str(LATENCY_MS))
+    monkeypatch.setenv("FAKE_LATENCY_DIST", "fixed")
+    monkeypatch.setenv("FAKE_MS_PER_1K_TOKENS", "0")
+    monkeypatch.setenv("METRIC_RULES_DISABLED", "1")
+    monkeypatch.setenv("JOB_EVENT_POLL_SECONDS", "0.02")
+    import uvicorn
+    import web_server
+
+    # A real server rather than TestClient, which only returns a streamed body once it is complete
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+    monkeypatch.undo()
+
+
+def _events(response):
+    event = None
+    for line in response:
+        line = line.decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+def test_stream_sends_the_first_agent_result_before_the_report(base_url):
+    deck = b"StreamCo\n\nStreamCo sells software to restaurants. Revenue is $2M ARR and the team is 12 people.\n"
+    body, content_type = multipart("deck.txt", deck)
+    request = urllib.request.Request(f"{base_url}/analyze/stream", data=body, headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    arrivals = []
+    with urllib.request.urlopen(request, timeout=60) as response:
+        for event, _ in _events(response):
+            arrivals.append((event, time.perf_counter() - start))
+            if event in ("report", "error"):
+                break
+
+    names = [event for event, _ in arrivals]
+    assert names[0] == "job"
+    assert names[-1] == "report"
+    first_agent, first_seconds = arrivals[1]
+    report_seconds = arrivals[-1][1]
+    assert first_agent in ("financial", "market", "team", "public_data")
+    # The first result follows one model call; the report needs three in a row (extraction, risk, recommendation)
+    assert report_seconds >= 3 * LATENCY_MS / 1000
+    assert report_seconds - first_seconds >= 1.5 * LATENCY_MS / 1000
+
+
+def test_health_shows_each_workers_client_setup(base_url):
+    deadline = time.monotonic() + 30
+    while True:
+        with urllib.request.urlopen(f"{base_url}/health", timeout=10) as response:
+            workers = json.load(response)["workers"]
+        if workers and workers[0]["client_setup"] is not None or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    assert len(workers) == 1
+    assert {"models_created", "model_setup_seconds", "vision_clients_created"} <= set(workers[0]["client_setup"])
+
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=10) as response:
+        metrics = response.read().decode("utf-8")
+    assert f'worker="{workers[0]["id"]}"' in metrics
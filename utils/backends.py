@@ -0,0 +1,249 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from . import gcp_clients
+from .llm_cache import _describe_config
+from .rate_limiter import estimate_tokens
+
+
+class VertexBackend:
+    """
+    Calls Vertex AI Gemini and Cloud Vision.
+
+    A backend provides `init()`, `warm_up()`, `get_model(name, config)`,
+    `generate(model, prompt)` and `ocr_pdf(content, page_numbers)`; the
+    pipeline only talks to models and OCR through these methods.
+    """
+
+    name = "vertex"
+
+    def init(self):
+        gcp_clients.init_vertex()
+
+    def warm_up(self):
+        gcp_clients.warm_up()
+
+    def get_model(self, model_name, generation_config=None):
+        if isinstance(generation_config, dict):
+            from vertexai.generative_models import GenerationConfig
+            generation_config = GenerationConfig(**generation_config)
+        return gcp_clients.get_model(model_name, generation_config)
+
+    def generate(self, model, prompt):
+        return model.generate_content(prompt)
+
+    def ocr_pdf(self, content, page_numbers=None):
+        """Runs Cloud Vision document OCR on the given 1-based pages (or the whole file)."""
+        from google.cloud import vision
+
+        client = gcp_clients.get_vision_client()
+
+        input_config = vision.InputConfig(content=content, mime_type='application/pdf')
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+
+        request = vision.AnnotateFileRequest(
+            input_config=input_config,
+            features=[feature],
+            pages=page_numbers or []
+        )
+
+        response = client.batch_annotate_files(requests=[request])
+
+        return [image_response.full_text_annotation.text for image_response in response.responses[0].responses]
+
+
+class FakeModel:
+    """Stands in for a GenerativeModel; carries the attributes the response cache keys on."""
+
+    def __init__(self, model_name, generation_config=None):
+        self._model_name = model_name
+        self._generation_config = generation_config
+
+
+# Typed answers for keys whose consumers expect a particular shape
+FAKE_VALUES = {
+    "confidence": 70,
+    "news_sentiment": "Neutral",
+    "financial_risk": "Medium",
+    "market_risk": "Medium",
+    "execution_risk": "Medium",
+    "overall_risk": "MEDIUM",
+    "team_size": "10",
+    "country": "India",
+}
+RECOMMENDATIONS = ("BUY", "HOLD", "PASS")
+
+# Quoted keys in the instructions of a prompt, e.g. the keys "revenue", "cac"
+_PROMPT_KEY = re.compile(r'"([a-z][a-z_]*)"')
+# Embedded documents and data sit between "---" lines and are not instructions
+_EMBEDDED = re.compile(r"^\s*---\s*$.*?^\s*---\s*$", re.MULTILINE | re.DOTALL)
+
+
+class FakeBackend:
+    """
+    An offline stand-in for Gemini and Cloud Vision, for benchmarks and load tests.
+
+    Model calls sleep for a latency drawn from a fixed, uniform or lognormal
+    distribution (plus a per-prompt-token cost) and answer with JSON holding
+    every key the prompt or response schema asks for. A share of calls can
+    raise ResourceExhausted or return malformed JSON. Prompt and output
+    tokens are counted and reported through `usage_metadata` and `stats()`.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.5, jitter=0.2, distribution="lognormal", ms_per_1k_tokens=50.0,
+                 throttle_rate=0.0, malformed_rate=0.0, ocr_latency=1.0, seed=None):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.ocr_latency = ocr_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "malformed": 0, "prompt_tokens": 0, "output_tokens": 0,
+                       "ocr_requests": 0, "ocr_pages": 0}
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv("FAKE_SEED")
+        return cls(
+            latency=float(os.getenv("FAKE_LATENCY_MS", "500")) / 1000,
+            jitter=float(os.getenv("FAKE_LATENCY_JITTER_MS", "200")) / 1000,
+            distribution=os.getenv("FAKE_LATENCY_DIST", "lognormal"),
+            ms_per_1k_tokens=float(os.getenv("FAKE_MS_PER_1K_TOKENS", "50")),
+            throttle_rate=float(os.getenv("FAKE_THROTTLE_RATE", "0")),
+            malformed_rate=float(os.getenv("FAKE_MALFORMED_RATE", "0")),
+            ocr_latency=float(os.getenv("FAKE_OCR_LATENCY_MS", "1000")) / 1000,
+            seed=int(seed) if seed else None,
+        )
+
+    def init(self):
+        pass
+
+    def warm_up(self):
+        pass
+
+    def get_model(self, model_name, generation_config=None):
+        return FakeModel(model_name, generation_config)
+
+    def _sample_latency(self, base):
+        with self._lock:
+            if self.distribution == "fixed" or self.jitter <= 0 or base <= 0:
+                return base
+            if self.distribution == "uniform":
+                return max(0.0, self._random.uniform(base - self.jitter, base + self.jitter))
+            # Lognormal with the configured mean and standard deviation: a long tail like real APIs
+            sigma2 = math.log(1 + (self.jitter / base) ** 2)
+            return self._random.lognormvariate(math.log(base) - sigma2 / 2, math.sqrt(sigma2))
+
+    def _roll(self, rate):
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def generate(self, model, prompt):
+        prompt_tokens = estimate_tokens(prompt)
+        time.sleep(self._sample_latency(self.latency) + prompt_tokens / 1000 * self.ms_per_1k_tokens / 1000)
+        self._count(calls=1, prompt_tokens=prompt_tokens)
+
+        if self._roll(self.throttle_rate):
+            from google.api_core.exceptions import ResourceExhausted
+            self._count(throttled=1)
+            raise ResourceExhausted("Fake backend: quota exceeded.")
+
+        text = json.dumps(self._answer(model, prompt))
+        if self._roll(self.malformed_rate):
+            self._count(malformed=1)
+            text = text[:len(text) // 2]
+        output_tokens = estimate_tokens(text)
+        self._count(output_tokens=output_tokens)
+        return SimpleNamespace(
+            text=f"```json\n{text}\n```",
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
+
+    @staticmethod
+    def _answer(model, prompt):
+        schema = (_describe_config(model._generation_config) or {}).get("response_schema") or {}
+        properties = schema.get("properties") or {}
+        keys = list(properties)
+        if not keys:
+            keys = list(dict.fromkeys(_PROMPT_KEY.findall(_EMBEDDED.sub("", prompt))))
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        answer = {}
+        for key in keys:
+            options = properties.get(key, {}).get("enum")
+            if key == "recommendation":
+                answer[key] = RECOMMENDATIONS[digest % len(RECOMMENDATIONS)]
+            elif key == "score":
+                answer[key] = digest % 101
+            elif options and FAKE_VALUES.get(key) not in options:
+                answer[key] = options[digest % len(options)]
+            else:
+                answer[key] = FAKE_VALUES.get(key, f"Fake {key.replace('_', ' ')}")
+        return answer
+
+    def ocr_pdf(self, content, page_numbers=None):
+        pages = page_numbers or [1]
+        time.sleep(self._sample_latency(self.ocr_latency))
+        self._count(ocr_requests=1, ocr_pages=len(pages))
+        return [f"Fake OCR text of page {number}." for number in pages]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+BACKENDS = {"vertex": VertexBackend, "fake": FakeBackend.from_env}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend selected by AI_BACKEND ("vertex" or "fake")."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.getenv("AI_BACKEND", "vertex")
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown AI backend: {name}")
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+def set_backend(backend):
+    """Replaces the process-wide backend, e.g. with a configured FakeBackend in a benchmark."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_model(model_name, generation_config=None):
+    """
+    Returns a shared model handle for the given name from the active backend.
+
+    `generation_config` is a plain dict of generation settings (for example
+    response_mime_type and response_schema), so callers need no SDK types.
+    """
+    return get_backend().get_model(model_name, generation_config)
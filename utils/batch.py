@@ -0,0 +1,169 @@
+import contextvars
+import csv
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf')
+
+# New columns go at the end; a resumed CSV must have exactly these columns (see ResultWriter)
+CSV_COLUMNS = [
+    "file", "company_name", "recommendation", "confidence", "overall_risk",
+    "revenue", "cac", "ltv", "tam", "sam", "som", "seconds", "error", "analysis_path", "triage_score",
+]
+
+
+def resolve_inputs(spec=None, manifest=None):
+    """
+    Returns the sorted list of documents to analyze.
+
+    `spec` is a directory (every .txt/.pdf inside it) or a glob pattern;
+    `manifest` is a text file with one path per line, relative to the manifest.
+    """
+    paths = []
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    paths.append(os.path.normpath(os.path.join(base, line)))
+    if spec:
+        if os.path.isdir(spec):
+            paths.extend(os.path.join(spec, name) for name in os.listdir(spec))
+        else:
+            paths.extend(glob.glob(spec, recursive=True))
+    return sorted({path for path in paths if path.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(path)})
+
+
+def _output_format(output_path):
+    return "csv" if output_path.lower().endswith(".csv") else "jsonl"
+
+
+def completed_inputs(output_path):
+    """Returns the inputs that already have a successful result in `output_path`."""
+    if not os.path.exists(output_path):
+        return set()
+    done = {}
+    with open(output_path, 'r', encoding='utf-8', newline='') as f:
+        if _output_format(output_path) == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            # Later rows win, so a file that failed and then succeeded counts as done
+            done[row["file"]] = not row.get("error")
+    return {path for path, ok in done.items() if ok}
+
+
+def _csv_row(path, report, seconds):
+    recommendation = report.get("recommendation") or {}
+    metrics = report.get("metrics") or {}
+    return {
+        "file": path,
+        "company_name": report.get("company_name"),
+        "recommendation": recommendation.get("recommendation"),
+        "confidence": recommendation.get("confidence"),
+        "overall_risk": (report.get("risk") or {}).get("overall_risk"),
+        "analysis_path": report.get("analysis_path"),
+        "triage_score": (report.get("triage") or {}).get("score"),
+        **{key: metrics.get(key) for key in ("revenue", "cac", "ltv", "tam", "sam", "som")},
+        "seconds": round(seconds, 2),
+        "error": report.get("error"),
+    }
+
+
+def _csv_header(output_path):
+    with open(output_path, 'r', encoding='utf-8', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+class ResultWriter:
+    """
+    Appends one result per finished document to a JSONL or CSV file, flushing as it goes.
+
+    An existing CSV is only appended to if its header matches CSV_COLUMNS,
+    since rows are written without repeating the header; otherwise a
+    ValueError is raised before anything is written.
+    """
+
+    def __init__(self, output_path):
+        self.format = _output_format(output_path)
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        if self.format == "csv" and not new_file and _csv_header(output_path) != CSV_COLUMNS:
+            raise ValueError(f"{output_path} was written with different columns than this version; "
+                             f"write the results to a new file.")
+        self._file = open(output_path, 'a', encoding='utf-8', newline='')
+        self._lock = threading.Lock()
+        if self.format == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS)
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, path, report, seconds):
+        with self._lock:
+            if self.format == "csv":
+                self._writer.writerow(_csv_row(path, report, seconds))
+            else:
+                row = {"file": path, "seconds": round(seconds, 2), "error": report.get("error"), "report": report}
+                self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(paths, output_path, analyze, concurrency=4, resume=True):
+    """
+    Analyzes many documents concurrently and streams each result to `output_path`.
+
+    All analyses share the process-wide model rate limiter. With `resume`,
+    inputs that already have a successful result in the output file are
+    skipped. Returns a summary dict with counts, elapsed time and throughput.
+    """
+    skipped = completed_inputs(output_path) if resume else set()
+    pending = [path for path in paths if path not in skipped]
+    print(f"Batch: {len(paths)} inputs, {len(paths) - len(pending)} already done, {len(pending)} to analyze "
+          f"with concurrency {concurrency}.")
+
+    def analyze_one(path):
+        start = time.perf_counter()
+        try:
+            report = analyze(path)
+        except Exception as e:
+            report = {"error": str(e)}
+        return path, report, time.perf_counter() - start
+
+    writer = ResultWriter(output_path)
+    succeeded = failed = 0
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, analyze_one, path) for path in pending]
+            for number, future in enumerate(as_completed(futures), start=1):
+                path, report, seconds = future.result()
+                writer.write(path, report, seconds)
+                if "error" in report:
+                    failed += 1
+                    outcome = f"ERROR: {report['error']}"
+                else:
+                    succeeded += 1
+                    outcome = (report.get("recommendation") or {}).get("recommendation")
+                elapsed = time.perf_counter() - start
+                print(f"[{number}/{len(pending)}] {os.path.basename(path)}: {outcome} ({seconds:.1f}s) "
+                      f"- {number / elapsed:.2f} docs/s")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "inputs": len(paths),
+        "skipped": len(paths) - len(pending),
+        "succeeded": succeeded,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "docs_per_second": round(len(pending) / elapsed, 3) if pending and elapsed else 0.0,
+    }
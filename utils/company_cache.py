@@ -0,0 +1,79 @@
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from .telemetry import CACHE_LOOKUPS
+
+# Trailing words that do not distinguish one company from another
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "llc", "llp", "lp", "ltd", "limited",
+    "plc", "gmbh", "ag", "sa", "sas", "bv", "nv", "pte", "pty", "pvt", "private", "oy", "ab",
+}
+
+
+def company_key(name):
+    """
+    Normalizes a company name so spelling variants share cache entries.
+
+    Case, punctuation and trailing legal forms are ignored, so "Acme, Inc.",
+    "ACME Inc" and "Acme Corp." all become "acme".
+    """
+    words = re.findall(r"[a-z0-9&]+", (name or "").lower())
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class CompanyCache:
+    """
+    Values computed per company, stored in a DiskCache for `ttl` seconds.
+
+    Concurrent requests for the same company while its value is being
+    computed wait for that computation instead of starting their own.
+    """
+
+    def __init__(self, disk_cache, ttl, namespace=""):
+        self.disk_cache = disk_cache
+        self.ttl = ttl
+        self.namespace = namespace
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _key(self, company_name):
+        return hashlib.sha256(f"{self.namespace}:{company_key(company_name)}".encode("utf-8")).hexdigest()
+
+    def get_or_compute(self, company_name, compute, cacheable=lambda value: True, store=True):
+        """
+        Returns the cached value for the company, or `compute()` stored when
+        `cacheable(value)` is true. Exceptions reach every waiting caller and
+        nothing is cached. With `store=False` the disk is neither read nor
+        written, but concurrent callers still share one computation.
+        """
+        key = self._key(company_name)
+        entry = self.disk_cache.get(key) if store else None
+        if entry is not None and time.time() - entry["stored_at"] < self.ttl:
+            return entry["value"]
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            CACHE_LOOKUPS.inc(cache=self.disk_cache.name, result="in_flight")
+            return future.result()
+
+        try:
+            value = compute()
+            if store and cacheable(value):
+                self.disk_cache.put(key, {"stored_at": time.time(), "value": value})
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
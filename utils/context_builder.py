@@ -0,0 +1,84 @@
+import json
+import os
+import re
+
+from .rate_limiter import estimate_tokens
+from .telemetry import AGENT_INPUT_TOKENS
+
+# The fields each downstream agent reads from the accumulated analysis data
+AGENT_FIELDS = {
+    "risk": [
+        "company_name", "revenue", "cac", "ltv", "tam", "sam", "som", "country",
+        "founders_background", "team_size", "ip_patents", "news_sentiment", "public_data_summary",
+    ],
+    "recommendation": [
+        "company_name", "revenue", "cac", "ltv", "tam", "sam", "som", "country",
+        "founders_background", "team_size", "ip_patents", "news_sentiment", "public_data_summary",
+        "financial_risk", "market_risk", "execution_risk", "overall_risk", "benchmark_summary",
+    ],
+}
+
+# Default token budget for each agent's serialized context
+AGENT_TOKEN_BUDGETS = {"risk": 600, "recommendation": 900}
+
+# Free-text values are shortened to this many characters before the budget is applied
+MAX_FIELD_CHARS = 400
+MIN_FIELD_CHARS = 60
+
+
+def token_budget(agent):
+    """Returns the context token budget for an agent (CONTEXT_BUDGET_<AGENT> overrides the default)."""
+    return int(os.getenv(f"CONTEXT_BUDGET_{agent.upper()}", AGENT_TOKEN_BUDGETS[agent]))
+
+
+def shorten(text, max_chars):
+    """Cuts text to at most `max_chars`, preferring to end on a sentence boundary."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1]
+    sentences = [m.end() for m in re.finditer(r"[.!?](\s|$)", cut)]
+    if sentences and sentences[-1] > max_chars // 2:
+        return cut[:sentences[-1]].rstrip()
+    return cut.rstrip() + "…"
+
+
+def _compact(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def build_context(agent, data):
+    """
+    Serializes only the fields `agent` needs, in compact JSON, within its token budget.
+
+    Long free-text values are shortened first; if the result is still over
+    budget, the longest value is shortened repeatedly until it fits.
+    """
+    selected = {}
+    for field in AGENT_FIELDS[agent]:
+        if field in data:
+            value = data[field]
+            selected[field] = shorten(value, MAX_FIELD_CHARS) if isinstance(value, str) else value
+
+    budget = token_budget(agent)
+    context = _compact(selected)
+    while estimate_tokens(context) > budget:
+        longest = max((k for k, v in selected.items() if isinstance(v, str)),
+                      key=lambda k: len(selected[k]), default=None)
+        if longest is None or len(selected[longest]) <= MIN_FIELD_CHARS:
+            break
+        selected[longest] = shorten(selected[longest], max(MIN_FIELD_CHARS, len(selected[longest]) // 2))
+        context = _compact(selected)
+
+    tokens = estimate_tokens(context)
+    AGENT_INPUT_TOKENS.observe(tokens, agent=agent, part="context")
+    full_tokens = estimate_tokens(json.dumps(data, indent=2, default=str))
+    print(f"{agent} context: {tokens} tokens (full data: {full_tokens} tokens)")
+    return context
+
+
+def log_prompt_size(agent, prompt):
+    """Records the estimated token size of an agent's prompt in the metrics (see /metrics) and prints it."""
+    tokens = estimate_tokens(prompt)
+    AGENT_INPUT_TOKENS.observe(tokens, agent=agent, part="prompt")
+    print(f"{agent} prompt size: {tokens} tokens")
+    return tokens
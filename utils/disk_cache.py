@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+
+from .llm_cache import CACHE_DIR
+from .telemetry import CACHE_LOOKUPS
+
+
+class DiskCache:
+    """
+    A directory of JSON files keyed by content hash, capped at `max_bytes`.
+
+    Reads refresh a file's modification time, so when the cap is exceeded the
+    least recently used entries are deleted first. Several processes may share
+    the same directory; writes go through a temporary file and an atomic rename.
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.name = os.path.basename(os.path.normpath(directory))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Returns the stored value for `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+        return value
+
+    def put(self, key, value):
+        """Stores a JSON-serializable value under `key` and enforces the size cap."""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._stats["writes"] += 1
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._stats["evictions"] += 1
+
+
+def named_cache(name, max_mb_env, default_mb):
+    """Creates a DiskCache under the shared cache directory, sized from an environment variable."""
+    return DiskCache(
+        os.path.join(CACHE_DIR, name),
+        max_bytes=int(float(os.getenv(max_mb_env, str(default_mb))) * 1024 * 1024),
+    )
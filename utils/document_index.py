@@ -0,0 +1,177 @@
+import contextvars
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .rate_limiter import estimate_tokens
+
+# Target size of a single chunk
+CHUNK_TOKENS = 250
+# Upper bound on the number of map calls when the relevant material exceeds one prompt
+MAX_MAP_GROUPS = 4
+# Chunks scoring below this fraction of the best chunk are not considered relevant
+RELEVANCE_CUTOFF = 0.3
+
+# Keywords that describe the sections each document-level agent needs
+AGENT_QUERIES = {
+    "financial": [
+        "revenue", "arr", "mrr", "recurring", "booked", "sales", "cac", "acquisition", "cost", "ltv",
+        "lifetime", "value", "customer", "customers", "margin", "burn", "runway", "profit", "pricing",
+        "churn", "growth", "financials", "funding", "raised",
+    ],
+    "market": [
+        "tam", "sam", "som", "market", "addressable", "serviceable", "obtainable", "size", "billion",
+        "industry", "segment", "competitors", "competition", "opportunity", "region", "global",
+    ],
+    "team": [
+        "team", "founder", "founders", "cofounder", "ceo", "cto", "coo", "employees", "engineers",
+        "experience", "previously", "background", "phd", "hired", "advisors", "patent", "patents",
+        "ip", "intellectual", "property",
+    ],
+}
+AGENT_QUERIES["extraction"] = AGENT_QUERIES["financial"] + AGENT_QUERIES["market"] + AGENT_QUERIES["team"]
+
+MISSING_VALUES = (None, "", "Not found", "Error")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def split_chunks(text, chunk_tokens=CHUNK_TOKENS):
+    """Splits text into chunks of roughly `chunk_tokens`, breaking on paragraph and line boundaries."""
+    max_chars = chunk_tokens * 4
+    chunks = []
+    current = []
+    current_len = 0
+    for line in text.splitlines():
+        # Very long lines (e.g. OCR output without breaks) are split on whitespace
+        while len(line) > max_chars:
+            split_at = line.rfind(" ", 0, max_chars)
+            if split_at <= 0:
+                split_at = max_chars
+            if current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            chunks.append(line[:split_at])
+            line = line[split_at:].lstrip()
+        if current and current_len + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+        current.append(line)
+        current_len += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+class DocumentIndex:
+    """
+    An in-memory BM25 index over the chunks of one document.
+
+    Lets each agent read only the chunks that are relevant to it, so prompt
+    size stays bounded regardless of how long the document is.
+    """
+
+    def __init__(self, text, chunk_tokens=CHUNK_TOKENS, k1=1.5, b=0.75):
+        self.text = text
+        self.chunks = split_chunks(text, chunk_tokens)
+        self.k1 = k1
+        self.b = b
+        self._term_counts = [Counter(_terms(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def score(self, terms):
+        """Returns the BM25 score of every chunk for the given query terms."""
+        scores = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def context_groups(self, agent, budget_tokens):
+        """
+        Returns the text an agent should read, as one or more groups of at most `budget_tokens`.
+
+        Short documents are returned whole. Otherwise the most relevant chunks
+        are packed in score order; if they do not fit one prompt they are
+        spread over up to MAX_MAP_GROUPS groups for a map-reduce pass. Chunks
+        keep their document order inside each group.
+        """
+        if estimate_tokens(self.text) <= budget_tokens:
+            return [self.text]
+
+        scores = self.score(AGENT_QUERIES[agent])
+        cutoff = max(scores, default=0.0) * RELEVANCE_CUTOFF
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0 and score >= cutoff),
+                        key=lambda i: -scores[i])
+        if not ranked:
+            # Nothing matched: the opening of a deck usually carries the overview
+            ranked = list(range(len(self.chunks)))
+
+        groups = [[]]
+        used = 0
+        for i in ranked:
+            size = estimate_tokens(self.chunks[i])
+            if used + size > budget_tokens and groups[-1]:
+                if len(groups) == MAX_MAP_GROUPS:
+                    break
+                groups.append([])
+                used = 0
+            groups[-1].append(i)
+            used += size
+        return ["\n...\n".join(self.chunks[i] for i in sorted(group)) for group in groups]
+
+
+def context_budget():
+    return int(os.getenv("AGENT_CONTEXT_TOKENS", "4000"))
+
+
+def merge_results(results):
+    """Reduces per-group agent outputs, keeping the first real value of each field."""
+    merged = {}
+    for result in results:
+        for key, value in result.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = merge_results([merged[key], value])
+            elif key not in merged or (merged[key] in MISSING_VALUES and value not in MISSING_VALUES):
+                merged[key] = value
+    return merged
+
+
+def relevant_context(agent, index):
+    """Pipeline reuse key: an agent's output only depends on the chunks it reads."""
+    return index.context_groups(agent, context_budget())
+
+
+def run_on_relevant_context(agent, func, index):
+    """
+    Calls `func(text)` on the part of the document that is relevant to `agent`.
+
+    When the relevant chunks do not fit one prompt, `func` is mapped over the
+    groups concurrently and the results are merged.
+    """
+    groups = index.context_groups(agent, context_budget())
+    if len(groups) == 1:
+        return func(groups[0])
+
+    print(f"{agent}: relevant material spans {len(groups)} prompts, running map-reduce...")
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, group) for group in groups]
+        return merge_results([future.result() for future in futures])
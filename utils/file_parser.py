@@ -1,40 +1,159 @@
+import hashlib
+import io
 import os
-from .gcp_clients import get_vision_client
-from google.cloud import vision
-
-def parse_file(file_path):
-    """Parses the input file and returns its content."""
-    _, extension = os.path.splitext(file_path)
-
-    if extension.lower() == '.txt':
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    elif extension.lower() == '.pdf':
-        print("PDF file detected. Processing with Cloud Vision API...")
-        return parse_pdf(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {extension}")
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .backends import get_backend
+from .disk_cache import named_cache
+from .telemetry import span
 
-def parse_pdf(file_path):
-    """Extracts text from a PDF using Cloud Vision API."""
-    client = get_vision_client()
+# Vision accepts at most five pages per inline PDF request
+OCR_PAGES_PER_REQUEST = 5
+# Pages whose text layer is shorter than this are treated as scanned images
+MIN_TEXT_LAYER_CHARS = 20
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Returns the on-disk cache of extracted document text, keyed by file SHA-256."""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = named_cache("extracted_text", "EXTRACTION_CACHE_MAX_MB", 500)
+        return _extraction_cache
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 of a file's bytes, which identifies a document version."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
+
+def parse_file(file_path, on_first_page=None):
+    """Parses the input file and returns its content (see parse_bytes for `on_first_page`)."""
     with open(file_path, 'rb') as f:
         content = f.read()
+    return parse_bytes(content, file_path, on_first_page=on_first_page)
+
 
-    input_config = vision.InputConfig(content=content, mime_type='application/pdf')
-    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+def parse_bytes(content, filename, content_hash=None, on_first_page=None):
+    """
+    Parses a document held in memory, e.g. an upload, without writing it to disk.
 
-    request = vision.AnnotateFileRequest(
-        input_config=input_config,
-        features=[feature]
-    )
+    The extension of `filename` selects the parser. Pass the SHA-256 of
+    `content` if it is already known to skip hashing it again.
+    `on_first_page(text)` is called with the start of the returned text as
+    soon as it is known: the first page of a PDF, the whole of a text file.
+    """
+    _, extension = os.path.splitext(filename)
+    extension = extension.lower()
+    with span("parse", extension.lstrip('.') if extension in ('.txt', '.pdf') else "other"):
+        if extension == '.txt':
+            # Same newline handling as reading the file in text mode
+            text = content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            if on_first_page is not None:
+                on_first_page(text)
+            return text
+        elif extension == '.pdf':
+            print("PDF file detected. Extracting text layer, with Cloud Vision OCR for scanned pages...")
+            return parse_pdf_bytes(content, content_hash, on_first_page)
+        else:
+            raise ValueError(f"Unsupported file type: {extension}")
 
-    response = client.batch_annotate_files(requests=[request])
 
-    full_text = ""
-    for image_response in response.responses[0].responses:
-        full_text += image_response.full_text_annotation.text + '\n'
+def parse_pdf(file_path):
+    """Extracts text from a PDF, reusing earlier results for identical files."""
+    with open(file_path, 'rb') as f:
+        return parse_pdf_bytes(f.read())
 
+
+def parse_pdf_bytes(content, content_hash=None, on_first_page=None):
+    """Extracts text from an in-memory PDF, reusing earlier results for identical files."""
+    pages = []
+    for page in iter_pdf_content(content, content_hash):
+        pages.append(page + '\n')
+        if on_first_page is not None and len(pages) == 1:
+            on_first_page(pages[0])
     print("PDF processing complete.")
-    return full_text
+    return ''.join(pages)
+
+
+def iter_pdf_pages(file_path):
+    """Yields the text of each page of the PDF at `file_path` in order (see iter_pdf_content)."""
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    yield from iter_pdf_content(content)
+
+
+def iter_pdf_content(content, content_hash=None):
+    """
+    Yields the text of each page of an in-memory PDF in order.
+
+    Pages with a text layer are read locally; only pages without extractable
+    text are sent to Cloud Vision, in concurrent batches. Born-digital pages
+    are yielded while the OCR batches are still running.
+    """
+    file_hash = content_hash or hashlib.sha256(content).hexdigest()
+    cache = get_extraction_cache()
+    cached = cache.get(file_hash)
+    if cached is not None:
+        print("PDF text served from extraction cache.")
+        yield from cached["pages"]
+        return
+
+    text_layer = _extract_text_layer(content)
+    if text_layer is None:
+        # No local extractor available: fall back to sending the whole file to Vision
+        pages = _ocr_pages(content)
+        cache.put(file_hash, {"pages": pages})
+        yield from pages
+        return
+
+    scanned = [number for number, text in enumerate(text_layer, start=1) if len(text.strip()) < MIN_TEXT_LAYER_CHARS]
+    batches = [scanned[i:i + OCR_PAGES_PER_REQUEST] for i in range(0, len(scanned), OCR_PAGES_PER_REQUEST)]
+    if batches:
+        print(f"Sending {len(scanned)} of {len(text_layer)} pages to Cloud Vision OCR in {len(batches)} batches...")
+
+    pages = []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(batches), int(os.getenv("OCR_MAX_WORKERS", "4"))))) as executor:
+        ocr_futures = {}
+        for batch in batches:
+            future = executor.submit(_ocr_pages, content, batch)
+            for position, number in enumerate(batch):
+                ocr_futures[number] = (future, position)
+
+        for number, text in enumerate(text_layer, start=1):
+            if number in ocr_futures:
+                future, position = ocr_futures[number]
+                ocr_texts = future.result()
+                text = ocr_texts[position] if position < len(ocr_texts) else ''
+            pages.append(text)
+            yield text
+
+    cache.put(file_hash, {"pages": pages})
+
+
+def _extract_text_layer(content):
+    """Returns the embedded text of every page, or None if the PDF cannot be read locally."""
+    try:
+        # Optional dependency, imported on the first PDF so text files never pay for it
+        from pypdf import PdfReader
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        return [page.extract_text() or '' for page in reader.pages]
+    except Exception as e:
+        print(f"Could not read PDF text layer locally: {e}")
+        return None
+
+
+def _ocr_pages(content, page_numbers=None):
+    """Runs document OCR on the given 1-based pages (or the whole file) with the active backend."""
+    with span("ocr", "batch", pages=len(page_numbers) if page_numbers else "all"):
+        return get_backend().ocr_pdf(content, page_numbers)
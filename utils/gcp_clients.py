@@ -1,18 +1,115 @@
-from google.cloud import aiplatform
-from google.cloud import vision
-from google.api_core.client_options import ClientOptions
+import itertools
 import os
+import threading
+import time
+
+# The Google SDKs take seconds to import, so they are imported on first use
+# (or by warm_up) rather than when this module is loaded.
+
+# Process-wide registry: the SDK is initialized once and clients are shared between threads
+_lock = threading.Lock()
+_vertex_initialized = False
+_models = {}
+_vision_pool = []
+_vision_cycle = None
+_setup_stats = {
+    "vertex_import_seconds": 0.0,
+    "vertex_init_seconds": 0.0,
+    "models_created": 0,
+    "model_setup_seconds": 0.0,
+    "model_reuses": 0,
+    "vision_clients_created": 0,
+    "vision_setup_seconds": 0.0,
+    "vision_reuses": 0,
+}
+
+
+def init_vertex():
+    """Initializes the Vertex AI SDK once per process."""
+    global _vertex_initialized
+    if _vertex_initialized:
+        return
+    with _lock:
+        if _vertex_initialized:
+            return
+        start = time.perf_counter()
+        import vertexai
+        _setup_stats["vertex_import_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+        print(f"Initializing Vertex AI with project: {project_id}")
+        vertexai.init(project=project_id, location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+        _setup_stats["vertex_init_seconds"] = time.perf_counter() - start
+        _vertex_initialized = True
+
 
 def get_vertex_ai_client():
     """Initializes and returns the Vertex AI client."""
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-    print(f"Initializing Vertex AI with project: {project_id}")
-    aiplatform.init(project=project_id, location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+    init_vertex()
+    from google.cloud import aiplatform
     return aiplatform
 
+
+def get_model(model_name, generation_config=None):
+    """Returns a shared GenerativeModel for the given name and generation config."""
+    init_vertex()
+    key = (model_name, repr(generation_config))
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _setup_stats["model_reuses"] += 1
+            return model
+        start = time.perf_counter()
+        from vertexai.generative_models import GenerativeModel
+        model = GenerativeModel(model_name, generation_config=generation_config)
+        _models[key] = model
+        _setup_stats["models_created"] += 1
+        _setup_stats["model_setup_seconds"] += time.perf_counter() - start
+        return model
+
+
 def get_vision_client():
-    """Initializes and returns the Vision API client with the correct quota project."""
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-    return vision.ImageAnnotatorClient(
-        client_options=ClientOptions(quota_project_id=project_id)
-    )
+    """Returns a shared Vision API client with the correct quota project.
+
+    Clients come from a small round-robin pool (GCP_CLIENT_POOL_SIZE) so
+    concurrent OCR batches spread over more than one gRPC channel.
+    """
+    global _vision_cycle
+    with _lock:
+        if _vision_cycle is None:
+            start = time.perf_counter()
+            from google.api_core.client_options import ClientOptions
+            from google.cloud import vision
+            project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+            for _ in range(max(1, int(os.getenv("GCP_CLIENT_POOL_SIZE", "2")))):
+                _vision_pool.append(vision.ImageAnnotatorClient(
+                    client_options=ClientOptions(quota_project_id=project_id)
+                ))
+            _vision_cycle = itertools.cycle(_vision_pool)
+            _setup_stats["vision_clients_created"] = len(_vision_pool)
+            _setup_stats["vision_setup_seconds"] = time.perf_counter() - start
+        else:
+            _setup_stats["vision_reuses"] += 1
+        return next(_vision_cycle)
+
+
+def warm_up(model_names=(), vision_client=True):
+    """
+    Initializes the SDK and creates shared clients ahead of the first request.
+
+    Models are shared per generation config, so the agents' models are warmed
+    with their own configs (see agents.base.warm_models) rather than here.
+    """
+    start = time.perf_counter()
+    init_vertex()
+    for model_name in model_names:
+        get_model(model_name)
+    if vision_client:
+        get_vision_client()
+    print(f"GCP clients warmed up in {time.perf_counter() - start:.2f}s")
+
+
+def setup_stats():
+    """Returns counters and timings for SDK and client setup in this process."""
+    with _lock:
+        return dict(_setup_stats)
@@ -0,0 +1,350 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Jobs that still need a worker; at most one of these exists per deduplication key
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "timeout", "cancelled")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is already at capacity."""
+
+
+class JobQueue:
+    """
+    A durable job queue in a SQLite file, shared by the web server and worker processes.
+
+    The web server submits jobs together with the documents they need;
+    workers (see worker.py) claim them, report heartbeats and progress
+    events, and store the result. Jobs move through the states
+    queued -> running -> done / failed / timeout / cancelled and survive
+    restarts of either side.
+
+    A job submitted with the `dedup_key` of a queued or running job is not
+    added again: the caller gets the existing job's ID and becomes one more
+    subscriber. Cancelling removes a subscriber; the job itself is cancelled
+    when none are left. Running jobs whose worker stops sending heartbeats
+    for `orphan_after` seconds are queued again, up to `max_attempts` runs;
+    the events of the abandoned run are replaced by a "requeued" event.
+    Finished jobs are kept for `result_ttl` seconds so clients can poll for
+    the result.
+    """
+
+    def __init__(self, path, max_queue=20, timeout=600, result_ttl=3600, orphan_after=30, max_attempts=3):
+        self.path = path
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.orphan_after = orphan_after
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, dedup_key TEXT, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "subscribers INTEGER NOT NULL DEFAULT 1, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+            "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, heartbeat_at REAL, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, result TEXT, error TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);"
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedup ON jobs (kind, dedup_key) "
+            "WHERE status IN ('queued', 'running') AND dedup_key IS NOT NULL;"
+            "CREATE TABLE IF NOT EXISTS documents (sha256 TEXT PRIMARY KEY, content BLOB NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS job_documents ("
+            "job_id TEXT NOT NULL, position INTEGER NOT NULL, sha256 TEXT NOT NULL, filename TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, position));"
+            "CREATE INDEX IF NOT EXISTS job_documents_sha256 ON job_documents (sha256);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "job_id TEXT NOT NULL, seq INTEGER NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, seq));"
+            "CREATE TABLE IF NOT EXISTS workers ("
+            "id TEXT PRIMARY KEY, host TEXT, pid INTEGER, status TEXT NOT NULL, job_id TEXT, "
+            "started_at REAL NOT NULL, heartbeat_at REAL NOT NULL, metrics TEXT);"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # --- Web server side ---
+
+    def submit(self, kind, payload, documents=(), dedup_key=None):
+        """
+        Queues a job and returns its ID (an existing one if `dedup_key` matches an active job).
+
+        `payload` is any JSON-serializable value handed to the worker.
+        `documents` is a list of (sha256, filename, content bytes) the job reads
+        with load_documents; identical content is stored once.
+        """
+        return self.submit_many(kind, [(payload, documents, dedup_key)])[0]
+
+    def submit_many(self, kind, jobs):
+        """
+        Queues every (payload, documents, dedup_key) in `jobs` and returns the job IDs.
+
+        Either all jobs are accepted or none are, so a batch is never half-queued.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._prune(db, now)
+            active = db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            job_ids, new = [], 0
+            for payload, documents, dedup_key in jobs:
+                existing = None
+                if dedup_key is not None:
+                    existing = db.execute(
+                        "SELECT id FROM jobs WHERE kind = ? AND dedup_key = ? AND status IN ('queued', 'running')",
+                        (kind, dedup_key),
+                    ).fetchone()
+                if existing is not None:
+                    db.execute("UPDATE jobs SET subscribers = subscribers + 1 WHERE id = ?", existing)
+                    job_ids.append(existing[0])
+                    continue
+
+                new += 1
+                if active + new > self.max_queue:
+                    raise QueueFullError(f"Job queue is full ({active} of {self.max_queue} jobs pending, "
+                                         f"{len(jobs)} requested).")
+                job_id = uuid.uuid4().hex
+                db.execute(
+                    "INSERT INTO jobs (id, kind, dedup_key, status, payload, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (job_id, kind, dedup_key, json.dumps(payload), now),
+                )
+                for position, (sha256, filename, content) in enumerate(documents):
+                    db.execute("INSERT OR IGNORE INTO documents (sha256, content) VALUES (?, ?)", (sha256, content))
+                    db.execute("INSERT INTO job_documents (job_id, position, sha256, filename) VALUES (?, ?, ?, ?)",
+                               (job_id, position, sha256, filename))
+                job_ids.append(job_id)
+        return job_ids
+
+    def get(self, job_id):
+        """Returns a snapshot of the job, or None if it is unknown or expired."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, subscribers, attempts, worker, created_at, started_at, finished_at, "
+                "result, error FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "status", "subscribers", "attempts", "worker", "created_at", "started_at",
+                        "finished_at", "result", "error"), row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def events(self, job_id, after=0):
+        """Returns the job's progress events with a sequence number above `after`, as (seq, name, data)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, name, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [(seq, name, json.loads(data)) for seq, name, data in rows]
+
+    def cancel(self, job_id):
+        """
+        Withdraws one subscriber from the job and returns its status, or None if unknown.
+
+        A queued job without subscribers is cancelled at once; a running one is
+        flagged, and its worker stops it at the next model call.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT status, subscribers FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status, subscribers = row
+            if status not in ACTIVE:
+                return status
+            subscribers = max(0, subscribers - 1)
+            db.execute("UPDATE jobs SET subscribers = ? WHERE id = ?", (subscribers, job_id))
+            if subscribers == 0:
+                if status == "queued":
+                    self._finish(db, job_id, "cancelled", error="Cancelled by the client.", now=now)
+                    status = "cancelled"
+                else:
+                    db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return status
+
+    def stats(self):
+        """Returns the number of jobs in each state."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def workers(self, max_age=None):
+        """Returns the registered workers that sent a heartbeat within `max_age` seconds (default orphan_after)."""
+        since = time.time() - (self.orphan_after if max_age is None else max_age)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, host, pid, status, job_id, started_at, heartbeat_at, metrics FROM workers "
+                "WHERE heartbeat_at >= ? AND status != 'stopped' ORDER BY started_at", (since,)
+            ).fetchall()
+        return [
+            {"id": worker_id, "host": host, "pid": pid, "status": status, "job_id": job_id,
+             "started_at": started_at, "heartbeat_at": heartbeat_at,
+             "metrics": json.loads(metrics) if metrics else {}}
+            for worker_id, host, pid, status, job_id, started_at, heartbeat_at, metrics in rows
+        ]
+
+    # --- Worker side ---
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workers (id, host, pid, status, started_at, heartbeat_at) "
+                "VALUES (?, ?, ?, 'idle', ?, ?)",
+                (worker_id, socket.gethostname(), os.getpid(), now, now),
+            )
+
+    def claim(self, worker_id):
+        """Marks the oldest queued job as running on this worker and returns it with its payload, or None."""
+        now = time.time()
+        with self._transaction() as db:
+            self._requeue_orphans(db, now)
+            row = db.execute(
+                "SELECT id, kind, payload, attempts FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, payload, attempts = row
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, "
+                "heartbeat_at = ? WHERE id = ?", (worker_id, now, now, job_id),
+            )
+            db.execute("UPDATE workers SET status = 'busy', job_id = ?, heartbeat_at = ? WHERE id = ?",
+                       (job_id, now, worker_id))
+        return {"id": job_id, "kind": kind, "payload": json.loads(payload), "attempt": attempts + 1,
+                "started_at": now}
+
+    def load_documents(self, job_id):
+        """Returns the job's documents as (sha256, filename, content bytes), in submission order."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT d.sha256, jd.filename, d.content FROM job_documents jd JOIN documents d USING (sha256) "
+                "WHERE jd.job_id = ? ORDER BY jd.position", (job_id,)
+            ).fetchall()
+
+    def heartbeat(self, worker_id, job_id=None, status=None, metrics=None):
+        """
+        Records that the worker (and its current job) is alive; returns True if the job should stop.
+
+        `metrics` holds the worker's telemetry "samples", shown by the server's
+        /metrics, and its model "client_setup" counters, shown by /health.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE workers SET heartbeat_at = ?, status = COALESCE(?, status), job_id = ?, "
+                "metrics = COALESCE(?, metrics) WHERE id = ?",
+                (now, status, job_id, json.dumps(metrics) if metrics is not None else None, worker_id),
+            )
+            if job_id is None:
+                return False
+            self._db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                             (now, job_id, worker_id))
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                                   (job_id, worker_id)).fetchone()
+        # The job is gone from this worker: timed out, or requeued after missed heartbeats
+        return row is None or bool(row[0])
+
+    def add_event(self, job_id, name, data):
+        with self._transaction() as db:
+            seq = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?",
+                             (job_id,)).fetchone()[0]
+            db.execute("INSERT INTO job_events (job_id, seq, name, data) VALUES (?, ?, ?, ?)",
+                       (job_id, seq, name, json.dumps(data)))
+
+    def finish(self, job_id, worker_id, status, result=None, error=None):
+        """Stores the outcome of a job this worker ran. Returns False if the job was taken from it meanwhile."""
+        with self._transaction() as db:
+            owned = db.execute("SELECT 1 FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                               (job_id, worker_id)).fetchone()
+            if owned:
+                self._finish(db, job_id, status, result, error)
+            db.execute("UPDATE workers SET status = 'idle', job_id = NULL WHERE id = ?", (worker_id,))
+        return bool(owned)
+
+    def stop_worker(self, worker_id):
+        with self._lock:
+            self._db.execute("UPDATE workers SET status = 'stopped', job_id = NULL WHERE id = ?", (worker_id,))
+
+    # --- Internals (called inside a transaction) ---
+
+    def _finish(self, db, job_id, status, result=None, error=None, now=None):
+        db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, now or time.time(), job_id),
+        )
+        # Documents are only needed until no active job refers to them
+        db.execute(
+            "DELETE FROM documents WHERE sha256 IN (SELECT sha256 FROM job_documents WHERE job_id = ?) "
+            "AND sha256 NOT IN (SELECT jd.sha256 FROM job_documents jd JOIN jobs j ON j.id = jd.job_id "
+            "WHERE j.status IN ('queued', 'running'))", (job_id,),
+        )
+
+    def _requeue_orphans(self, db, now):
+        orphans = db.execute("SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat_at < ?",
+                             (now - self.orphan_after,)).fetchall()
+        for job_id, attempts in orphans:
+            if attempts >= self.max_attempts:
+                self._finish(db, job_id, "failed", error=f"Worker stopped responding ({attempts} attempts).", now=now)
+            else:
+                print(f"Job {job_id}: worker stopped responding, queuing it again.")
+                db.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (job_id,))
+                self._reset_events(db, job_id, attempts + 1)
+
+    def _reset_events(self, db, job_id, attempt):
+        # The next run sends its own events; one "requeued" event keeps the sequence numbers going,
+        # so a client that already read the earlier run's events still gets every new one
+        last = db.execute("SELECT MAX(seq) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+        if last:
+            db.execute("INSERT INTO job_events (job_id, seq, name, data) VALUES (?, ?, 'requeued', ?)",
+                       (job_id, last, json.dumps({"attempt": attempt})))
+
+    def _prune(self, db, now):
+        expired = [row[0] for row in db.execute(
+            "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.result_ttl,)
+        ).fetchall()]
+        for job_id in expired:
+            db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            db.execute("DELETE FROM job_documents WHERE job_id = ?", (job_id,))
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        db.execute("DELETE FROM workers WHERE status = 'stopped' AND heartbeat_at < ?", (now - self.result_ttl,))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide handle on the job queue file (JOB_QUEUE_PATH, default data/jobs.sqlite)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            from .report_store import DATA_DIR
+            _queue = JobQueue(
+                os.getenv("JOB_QUEUE_PATH", os.path.join(DATA_DIR, "jobs.sqlite")),
+                max_queue=int(os.getenv("JOB_QUEUE_SIZE", "20")),
+                timeout=int(os.getenv("JOB_TIMEOUT_SECONDS", "600")),
+                result_ttl=int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+                orphan_after=float(os.getenv("JOB_ORPHAN_SECONDS", "30")),
+                max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            )
+        return _queue
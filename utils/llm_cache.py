@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Default location of the on-disk cache, shared by the CLI and the web server
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+
+
+class CachedResponse:
+    """Stands in for a model response that was served from the cache."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def _describe_config(generation_config):
+    if generation_config is None:
+        return None
+    if hasattr(generation_config, "to_dict"):
+        return generation_config.to_dict()
+    return generation_config
+
+
+def make_key(model_name, generation_config, prompt):
+    """Returns the content hash identifying a model request."""
+    payload = json.dumps(
+        {"model": model_name, "config": _describe_config(generation_config), "prompt": prompt},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    A two-tier cache for model responses.
+
+    Lookups go to a bounded in-process LRU first and then to a SQLite file, so
+    cached responses survive restarts and are shared between processes.
+    Entries older than `ttl` seconds are ignored and removed, and the SQLite
+    tier is trimmed to `max_entries` by least recent use.
+    """
+
+    def __init__(self, path, memory_entries=256, max_entries=10000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+
+    def get(self, key):
+        """Returns the cached response text for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self._db.execute("SELECT text, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self._memory.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, row[0], row[1])
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return row[0]
+
+    def put(self, key, text):
+        """Stores a response text in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, text, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, text, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._stats["evictions"] += overflow
+            self._db.commit()
+            self._stats["writes"] += 1
+
+    def delete(self, key):
+        """Removes a response from both tiers."""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory))
+
+    def _remember(self, key, text, created_at):
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled():
+    return os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def get_cache():
+    """Returns the process-wide response cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite")),
+                memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                ttl=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            )
+        return _cache
@@ -0,0 +1,206 @@
+import os
+import re
+
+CURRENCIES = {
+    "$": "USD", "usd": "USD", "us$": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "₹": "INR", "inr": "INR", "rs": "INR", "rs.": "INR",
+}
+
+UNITS = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mn": 1e6, "mil": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "t": 1e12, "tn": 1e12, "trillion": 1e12,
+    "lakh": 1e5, "lakhs": 1e5, "crore": 1e7, "crores": 1e7, "cr": 1e7,
+}
+
+_AMOUNT = (
+    r"(?P<amount>(?P<currency>US\$|\$|€|£|₹|(?i:usd|eur|gbp|inr|rs\.?)\s?)?"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?![\d.,]\d)"
+    r"(?:\s?(?P<unit>(?i:thousand|million|billion|trillion|lakhs?|crores?|mil|mn|bn|tn|mm|cr)\b|[KkMmBbTt]\b))?)"
+    r"(?!\s?%)"
+)
+
+# Acronyms are matched case-sensitively so that e.g. the name "Sam" is not read as SAM
+_LABELS = {
+    "revenue": r"(?P<label>(?i:annual recurring revenue|monthly recurring revenue|booked revenue|revenues?)|ARR|MRR)",
+    "cac": r"(?P<label>(?i:customer acquisition costs?)|CAC)",
+    "ltv": r"(?P<label>(?i:customer lifetime value|lifetime value)|CLTV|CLV|LTV)",
+    "tam": r"(?P<label>(?i:total addressable market)|TAM)",
+    "sam": r"(?P<label>(?i:serviceable (?:available|addressable) market)|SAM)",
+    "som": r"(?P<label>(?i:serviceable obtainable market)|SOM)",
+}
+
+# Revenue labels that say whether the amount is annual or monthly; the tag is kept with the value ("$100K MRR")
+_REVENUE_TAGS = {"arr": "ARR", "annual recurring revenue": "ARR", "mrr": "MRR", "monthly recurring revenue": "MRR"}
+
+_AMOUNT_PATTERN = re.compile(_AMOUNT)
+_LABEL_PATTERNS = {field: re.compile(rf"\b{label}\b") for field, label in _LABELS.items()}
+_ANY_LABEL = re.compile("|".join(rf"\b{label.replace('?P<label>', '')}\b" for label in _LABELS.values()))
+# "$1.2M ARR", "$4B TAM", "$4B in TAM"
+_AMOUNT_FIRST_PATTERNS = {
+    field: re.compile(rf"{_AMOUNT}\s*(?:(?i:in|of)\s+)?{label}\b") for field, label in _LABELS.items()
+}
+# How far after a label ("ARR: ...") an amount may appear; the window also ends at the sentence
+LABEL_WINDOW_CHARS = 40
+_SENTENCE_END = re.compile(r"\n|[.;!?](?:\s|$)")
+# Words that may sit between a label and its amount without lowering confidence
+_FILLER_WORDS = {"of", "is", "was", "at", "about", "approx", "approximately", "around", "currently", "~", ":", "=", "-", "–", "(", ")"}
+
+# "500M users" is a count, not an amount of money
+_COUNT_NOUN = re.compile(
+    r"\s*(?i:users|customers|households|downloads|subscribers|members|people|patients|merchants|businesses|"
+    r"installs|visitors|devices|units|farmers|students|smes)\b"
+)
+# Projections and goals ("we expect", "target", "by 2026") are not current figures
+_FORWARD_LOOKING = re.compile(
+    r"(?i:\b(?:expect(?:s|ed|ing)?|projected|projections?|forecast(?:s|ed|ing)?|plan(?:s|ned)? to|aim(?:s|ing)? to|"
+    r"will (?:reach|hit|be)|goal|target(?:s|ed|ing)?(?!\s+(?:market|customers?|audience|segment)))\b|"
+    r"\bby (?:20\d\d|the end of|next year)\b)"
+)
+# Confidence of an amount quoted without a currency: below the default METRIC_RULES_MIN_CONFIDENCE
+NO_CURRENCY_CONFIDENCE = 0.8
+FORWARD_LOOKING_CONFIDENCE = 0.5
+
+_TEAM_SIZE_PATTERNS = (
+    re.compile(r"(?i:\bteam of)\s+(?P<number>\d{1,6})\b"),
+    re.compile(r"(?i:\b(?:headcount|team size|employees|number of employees))\s*[:\-]?\s*(?P<number>\d{1,6})\b"),
+    re.compile(r"\b(?P<number>\d{1,6})\s+(?i:(?:full[- ]time\s+)?(?:employees|people|team members|ftes|staff))\b"),
+)
+
+FINANCIAL_FIELDS = ("revenue", "cac", "ltv")
+MARKET_FIELDS = ("tam", "sam", "som")
+
+
+def parse_amount(text):
+    """
+    Parses a free-form amount such as "$1.2M", "USD 450" or "€4 billion".
+
+    Returns a dict with "value" (a float in base units), "currency" (ISO code
+    or None) and "unit" (the scale word as written, or None), or None if the
+    text has no number.
+    """
+    match = amount_match(text)
+    return _normalize(match) if match is not None else None
+
+
+def amount_match(text):
+    """Returns the regex match of the first amount in `text` (see parse_amount), or None."""
+    if not isinstance(text, str):
+        return None
+    return _AMOUNT_PATTERN.search(text)
+
+
+def _normalize(match):
+    number = float(match.group("number").replace(",", ""))
+    unit = match.group("unit")
+    currency = match.group("currency")
+    return {
+        "value": number * UNITS.get(unit.lower(), 1) if unit else number,
+        "currency": CURRENCIES.get(currency.strip().lower()) if currency else None,
+        "unit": unit,
+    }
+
+
+def _money_candidates(field, text):
+    # label ... amount, e.g. "ARR: $1.2M" or "LTV of $9K"
+    for label_match in _LABEL_PATTERNS[field].finditer(text):
+        window = _SENTENCE_END.split(text[label_match.end():label_match.end() + LABEL_WINDOW_CHARS], 1)[0]
+        next_label = _ANY_LABEL.search(window)
+        if next_label:
+            window = window[:next_label.start()]
+        # Without a currency or scale a number is usually a year, a count or a percentage
+        amounts = [(match, _normalize(match)) for match in _AMOUNT_PATTERN.finditer(window)]
+        amounts = [(match, amount) for match, amount in amounts if (amount["currency"] or amount["unit"])
+                   and not _COUNT_NOUN.match(window, match.end())]
+        if not amounts:
+            continue
+        match, amount = amounts[0]
+        gap = window[:match.start()].replace(":", " : ").split()
+        confidence = 0.95 if all(word.lower() in _FILLER_WORDS for word in gap) else 0.85
+        if len(amounts) > 1:
+            # e.g. "Revenue: $1.1M in 2022 and $2.6M in 2023" - let the model pick
+            confidence = 0.6
+        yield _candidate(field, label_match.group("label"), match, amount, confidence,
+                         _sentence(text, label_match.start(), label_match.end()))
+
+    # amount ... label, e.g. "$1.2M ARR"
+    for match in _AMOUNT_FIRST_PATTERNS[field].finditer(text):
+        amount = _normalize(match)
+        if amount["currency"] is None and amount["unit"] is None:
+            continue
+        yield _candidate(field, match.group("label"), match, amount, 0.9, _sentence(text, match.start(), match.end()))
+
+
+def _sentence(text, start, end):
+    """Returns the sentence of `text` around the span start:end."""
+    before = [m.end() for m in _SENTENCE_END.finditer(text, 0, start)]
+    after = _SENTENCE_END.search(text, end)
+    return text[before[-1] if before else 0:after.start() if after else len(text)]
+
+
+def _candidate(field, label, match, amount, confidence, sentence):
+    if amount["currency"] is None:
+        # Money values are nearly always quoted with a currency; leave the others to the model
+        confidence = min(confidence - 0.1, NO_CURRENCY_CONFIDENCE)
+    if _FORWARD_LOOKING.search(sentence):
+        confidence = min(confidence, FORWARD_LOOKING_CONFIDENCE)
+    amount_text = match.group("amount").strip()
+    tag = _REVENUE_TAGS.get(label.lower()) if field == "revenue" else None
+    if tag:
+        amount_text = f"{amount_text} {tag}"
+    return {"text": amount_text, "confidence": round(confidence, 2), **amount}
+
+
+def _team_size_candidates(text):
+    for pattern in _TEAM_SIZE_PATTERNS:
+        for match in pattern.finditer(text):
+            number = int(match.group("number"))
+            if 0 < number < 1_000_000:
+                yield {"text": str(number), "value": float(number), "currency": None, "unit": None, "confidence": 0.9}
+
+
+def extract_metrics(text, fields=FINANCIAL_FIELDS + MARKET_FIELDS + ("team_size",)):
+    """
+    Extracts explicitly stated metrics from text with precompiled patterns.
+
+    Returns {field: {"text", "value", "currency", "unit", "confidence"}} for
+    every field that was found. When a field is stated with several
+    different values, its confidence is lowered so the model decides.
+    """
+    results = {}
+    for field in fields:
+        candidates = list(_team_size_candidates(text) if field == "team_size" else _money_candidates(field, text))
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda c: c["confidence"])
+        if len({c["value"] for c in candidates}) > 1:
+            best = dict(best, confidence=min(best["confidence"], 0.6))
+        results[field] = best
+    return results
+
+
+def min_confidence():
+    return float(os.getenv("METRIC_RULES_MIN_CONFIDENCE", "0.85"))
+
+
+def rules_enabled():
+    return os.getenv("METRIC_RULES_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def known_fields(text, fields):
+    """
+    Splits `fields` into the values the rules can fill with high confidence and the rest.
+
+    Returns (known, missing) where `known` maps field names to the metric
+    text to report and `missing` lists the fields the model still has to read.
+    """
+    if not rules_enabled():
+        return {}, list(fields)
+    found = extract_metrics(text, fields)
+    threshold = min_confidence()
+    known = {field: found[field]["text"] for field in fields
+             if field in found and found[field]["confidence"] >= threshold}
+    return known, [field for field in fields if field not in known]
@@ -0,0 +1,344 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from .portfolio import normalize_metrics
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "peer_benchmarks.csv")
+
+QUANTILES = (10, 25, 50, 75, 90)
+QUANTILE_COLUMNS = [f"p{q}" for q in QUANTILES]
+
+AMOUNT_FIELDS = ("revenue", "cac", "ltv", "tam", "sam", "som")
+# Ratios benchmarked like the metrics themselves: name -> (numerator, denominator)
+RATIOS = {
+    "ltv_cac": ("ltv", "cac"),
+    "revenue_per_employee": ("revenue", "team_size"),
+    "sam_share_of_tam": ("sam", "tam"),
+    "som_share_of_sam": ("som", "sam"),
+}
+# In the order they appear in the summary
+METRICS = ("ltv_cac", "revenue", "cac", "ltv", "tam", "sam", "som", "team_size", "revenue_per_employee",
+           "sam_share_of_tam", "som_share_of_sam")
+LOWER_IS_BETTER = {"cac"}
+
+LABELS = {
+    "ltv_cac": "LTV/CAC", "revenue": "Revenue", "cac": "CAC", "ltv": "LTV", "tam": "TAM", "sam": "SAM",
+    "som": "SOM", "team_size": "Team size", "revenue_per_employee": "Revenue per employee",
+    "sam_share_of_tam": "SAM share of TAM", "som_share_of_sam": "SOM share of SAM",
+}
+STAGE_LABELS = {"pre_seed": "pre-seed", "seed": "seed", "series_a": "Series A", "series_b": "Series B",
+                "growth": "growth-stage"}
+SECTOR_LABELS = {"saas": "SaaS", "fintech": "fintech", "healthtech": "healthtech", "consumer": "consumer"}
+
+_STAGE = (r"(?:(?P<pre_seed>pre[- ]?seed)|(?P<seed>seed)|(?P<series_a>series\s+a)|(?P<series_b>series\s+b)"
+          r"|(?P<growth>series\s+[c-h]|growth[- ]stage|pre[- ]ipo))\b")
+_STAGE_PATTERN = re.compile(rf"\b{_STAGE}", re.IGNORECASE)
+# "raising a $2M Series A", "raising our seed round": the round being raised is the peer group
+_RAISING_PATTERN = re.compile(rf"\braising\b[^.\n]{{0,40}}?\b{_STAGE}", re.IGNORECASE)
+
+SECTOR_KEYWORDS = {
+    "saas": ("saas", "software-as-a-service", "subscription software", "b2b software", "cloud platform"),
+    "fintech": ("fintech", "payments", "lending", "neobank", "banking", "insurtech", "credit card", "wallet"),
+    "healthtech": ("healthtech", "healthcare", "medical", "clinical", "clinics?", "patients?", "hospitals?",
+                   "diagnostics?"),
+    "consumer": ("consumer", "e-?commerce", "d2c", "direct-to-consumer", "marketplace", "retail", "shoppers"),
+}
+_SECTOR_PATTERNS = {sector: re.compile(rf"\b(?:{'|'.join(words)})\b", re.IGNORECASE)
+                    for sector, words in SECTOR_KEYWORDS.items()}
+
+_reference = None
+_reference_lock = threading.Lock()
+
+
+def infer_profile(text):
+    """
+    Guesses the startup's stage and sector from its document with keyword rules.
+
+    Returns {"stage", "sector"}; either is "all" when the text gives no clue,
+    so the startup is compared with peers across stages or sectors.
+    """
+    stage = "all"
+    raising = _RAISING_PATTERN.search(text or "")
+    if raising is not None:
+        stage = raising.lastgroup
+    else:
+        mentions = Counter(match.lastgroup for match in _STAGE_PATTERN.finditer(text or ""))
+        if mentions:
+            stage = mentions.most_common(1)[0][0]
+
+    hits = {sector: len(pattern.findall(text or "")) for sector, pattern in _SECTOR_PATTERNS.items()}
+    sector = max(hits, key=hits.get)
+    return {"stage": stage, "sector": sector if hits[sector] else "all"}
+
+
+class ReferenceTable:
+    """
+    The reference quantiles, held as a dense array indexed by stage, sector and metric codes.
+
+    `quantiles[stage, sector, metric]` is the p10..p90 row, or NaN where the
+    dataset has no entry, so looking up any number of startups is a single
+    fancy-indexing operation.
+    """
+
+    def __init__(self, table):
+        import numpy as np
+
+        self.table = table
+        self.stages = sorted(set(table["stage"]) | {"all"})
+        self.sectors = sorted(set(table["sector"]) | {"all"})
+        self.quantiles = np.full((len(self.stages), len(self.sectors), len(METRICS), len(QUANTILES)), np.nan)
+        known = table[table["metric"].isin(METRICS)]
+        self.quantiles[
+            known["stage"].map(self.stages.index).to_numpy(),
+            known["sector"].map(self.sectors.index).to_numpy(),
+            known["metric"].map(METRICS.index).to_numpy(),
+        ] = known[QUANTILE_COLUMNS].to_numpy(dtype=float)
+        self.lower_is_better = np.isin(np.asarray(METRICS), list(LOWER_IS_BETTER))
+
+    @classmethod
+    def from_csv(cls, path):
+        import pandas as pd
+
+        return cls(pd.read_csv(path, comment="#"))
+
+    def codes(self, names, vocabulary):
+        """Maps stage or sector names to their codes; unknown names are compared as "all"."""
+        import numpy as np
+
+        index = {name: code for code, name in enumerate(vocabulary)}
+        return np.fromiter((index.get(name, index["all"]) for name in names), dtype=np.intp, count=len(names))
+
+
+def load_reference(path=None):
+    """
+    Returns the ReferenceTable, read once per process.
+
+    The data comes from BENCHMARK_DATA_PATH (default utils/peer_benchmarks.csv),
+    a CSV with the columns stage, sector, metric and p10, p25, p50, p75, p90.
+    """
+    global _reference
+    with _reference_lock:
+        if _reference is None or path is not None:
+            _reference = ReferenceTable.from_csv(path or os.getenv("BENCHMARK_DATA_PATH", DATA_PATH))
+        return _reference
+
+
+def _value(value, normalized):
+    if isinstance(value, (int, float)):
+        return float(value)
+    # Amounts in other currencies would need exchange rates; they are left out rather than misjudged
+    if normalized is None or normalized["currency"] not in (None, "USD"):
+        return math.nan
+    return normalized["value"]
+
+
+def metric_values(startups):
+    """
+    Turns analysis dicts (the combined agent outputs) into an array with one row per startup and a column per METRICS.
+
+    Amounts and the team size are read as the portfolio stores them (see
+    utils.portfolio.normalize_metrics), so monthly revenue is annualized
+    like the reference table; missing or unparseable values are NaN. The
+    ratios in RATIOS are computed here.
+    """
+    import numpy as np
+
+    values = np.full((len(startups), len(METRICS)), np.nan)
+    columns = {metric: position for position, metric in enumerate(METRICS)}
+    for row, data in enumerate(startups):
+        normalized = data.get("normalized_metrics") or normalize_metrics(data, data)
+        for field in (*AMOUNT_FIELDS, "team_size"):
+            values[row, columns[field]] = _value(data.get(field), normalized.get(field))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for ratio, (numerator, denominator) in RATIOS.items():
+            values[:, columns[ratio]] = values[:, columns[numerator]] / values[:, columns[denominator]]
+    return values
+
+
+def compare(values, stages, sectors, reference=None):
+    """
+    Compares a (startups x METRICS) array of values with the reference table in one vectorized pass.
+
+    Each value is looked up for (stage, sector), then (all stages, sector),
+    (stage, all sectors) and finally (all, all). Returns arrays of the same
+    shape: the peer "median", the "percentile" (interpolated between the
+    reference quantiles on a log scale), the "z_score" (log scale, spread
+    taken from the interquartile range), the "ratio_to_median", a "score"
+    that is the percentile turned around for metrics where lower is better,
+    and the "peer_stage" / "peer_sector" codes used. Values that are missing,
+    not positive or without reference data are NaN.
+    """
+    import numpy as np
+
+    reference = load_reference() if reference is None else reference
+    stage = reference.codes(stages, reference.stages)[:, None]
+    sector = reference.codes(sectors, reference.sectors)[:, None]
+    any_stage = np.full_like(stage, reference.stages.index("all"))
+    any_sector = np.full_like(sector, reference.sectors.index("all"))
+    metric = np.arange(len(METRICS))[None, :]
+
+    candidates = [(stage, sector), (any_stage, sector), (stage, any_sector), (any_stage, any_sector)]
+    levels = np.stack([reference.quantiles[s, c, metric] for s, c in candidates])  # levels x startups x metrics x 5
+    level = (~np.isnan(levels[..., 0])).argmax(axis=0)
+    quantiles = np.take_along_axis(levels, level[None, ..., None], axis=0)[0]
+    peer_stage = np.choose(level, [np.broadcast_to(s, level.shape) for s, _ in candidates])
+    peer_sector = np.choose(level, [np.broadcast_to(c, level.shape) for _, c in candidates])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.log(np.where(values > 0, values, np.nan))
+        logq = np.log(quantiles)
+        points = np.asarray(QUANTILES, dtype=float)
+        # Segment between two reference quantiles containing x; outside p10..p90 the nearest one is extended
+        upper = np.clip((x[..., None] > logq).sum(axis=-1), 1, len(QUANTILES) - 1)
+        x0 = np.take_along_axis(logq, (upper - 1)[..., None], axis=-1)[..., 0]
+        x1 = np.take_along_axis(logq, upper[..., None], axis=-1)[..., 0]
+        p0, p1 = points[upper - 1], points[upper]
+        percentile = np.where(x1 > x0, p0 + (x - x0) * (p1 - p0) / (x1 - x0), np.where(x >= x1, p1, p0))
+        percentile = np.where(np.isnan(x + x0), np.nan, np.clip(percentile, 1, 99))
+        sigma = (logq[..., 3] - logq[..., 1]) / 1.349
+        z_score = np.where(np.isnan(percentile), np.nan, np.where(sigma > 0, (x - logq[..., 2]) / sigma, 0.0))
+        ratio = np.exp(x) / quantiles[..., 2]
+    return {
+        "median": quantiles[..., 2],
+        "percentile": percentile,
+        "z_score": z_score,
+        "ratio_to_median": ratio,
+        "score": np.where(reference.lower_is_better, 100 - percentile, percentile),
+        "peer_stage": peer_stage,
+        "peer_sector": peer_sector,
+    }
+
+
+# Bands of the (rounded) score; a value at the peer median is neither above nor below it
+ASSESSMENTS = ["strong", "above median", "at median", "below median"]
+
+
+def _assessment_conditions(score):
+    score = score.round() if hasattr(score, "round") else round(score)
+    return [score >= 75, score > 50, score == 50, score >= 25]
+
+
+def _assessment(score):
+    return next((label for label, met in zip(ASSESSMENTS, _assessment_conditions(score)) if met), "weak")
+
+
+def benchmark_many(startups):
+    """
+    Benchmarks a batch of analysis dicts against the reference table in one vectorized pass.
+
+    Returns one result per startup, in order: its stage and sector, the
+    comparison for each metric that could be benchmarked, and the metrics
+    that were missing.
+    """
+    reference = load_reference()
+    stages = [data.get("stage") or "all" for data in startups]
+    sectors = [data.get("sector") or "all" for data in startups]
+    values = metric_values(startups)
+    result = compare(values, stages, sectors, reference)
+
+    # Plain lists are much faster to read element by element than numpy arrays
+    percentile, z_score = result["percentile"].round().tolist(), result["z_score"].round(2).tolist()
+    median, ratio = result["median"].tolist(), result["ratio_to_median"].round(2).tolist()
+    score, value_list = result["score"].tolist(), values.tolist()
+    peer_stage, peer_sector = result["peer_stage"].tolist(), result["peer_sector"].tolist()
+
+    benchmarks = []
+    for row, (stage, sector) in enumerate(zip(stages, sectors)):
+        metrics = {}
+        for column, metric in enumerate(METRICS):
+            if percentile[row][column] != percentile[row][column]:  # NaN: not benchmarked
+                continue
+            metrics[metric] = {
+                "value": value_list[row][column],
+                "percentile": int(percentile[row][column]),
+                "z_score": z_score[row][column],
+                "median": median[row][column],
+                "ratio_to_median": ratio[row][column],
+                "assessment": _assessment(score[row][column]),
+                "peers": f"{reference.stages[peer_stage[row][column]]}/{reference.sectors[peer_sector[row][column]]}",
+            }
+        benchmarks.append({"stage": stage, "sector": sector, "metrics": metrics,
+                           "not_benchmarked": [metric for metric in METRICS if metric not in metrics]})
+    return benchmarks
+
+
+def benchmark(data):
+    """Benchmarks one startup's analysis data; see benchmark_many."""
+    return benchmark_many([data])[0]
+
+
+def benchmark_frame(startups):
+    """
+    Benchmarks a batch of analysis dicts and returns a pandas DataFrame for portfolio analysis.
+
+    The frame has one row per startup and benchmarked metric, with the
+    startup's position in `startups`, the metric, its value, the peer group
+    used and the columns computed by compare().
+    """
+    import numpy as np
+    import pandas as pd
+
+    reference = load_reference()
+    stages = [data.get("stage") or "all" for data in startups]
+    sectors = [data.get("sector") or "all" for data in startups]
+    values = metric_values(startups)
+    result = compare(values, stages, sectors, reference)
+    rows, columns = np.nonzero(~np.isnan(result["percentile"]))
+    return pd.DataFrame({
+        "startup": rows,
+        "metric": np.asarray(METRICS)[columns],
+        "value": values[rows, columns],
+        "peer_stage": np.asarray(reference.stages)[result["peer_stage"][rows, columns]],
+        "peer_sector": np.asarray(reference.sectors)[result["peer_sector"][rows, columns]],
+        "median": result["median"][rows, columns],
+        "percentile": result["percentile"][rows, columns].round(),
+        "z_score": result["z_score"][rows, columns].round(2),
+        "ratio_to_median": result["ratio_to_median"][rows, columns].round(2),
+        "assessment": np.select(_assessment_conditions(result["score"][rows, columns]), ASSESSMENTS, "weak"),
+    })
+
+
+def format_value(metric, value):
+    if metric == "ltv_cac":
+        return f"{value:.1f}x"
+    if "_share_of_" in metric:
+        return f"{value:.0%}"
+    if metric == "team_size":
+        return f"{value:.0f}"
+    for scale, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= scale:
+            return f"${value / scale:.3g}{suffix}"
+    return f"${value:,.0f}"
+
+
+def _ordinal(number):
+    suffix = "th" if 10 <= number % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+def peer_group(stage, sector):
+    words = [STAGE_LABELS.get(stage), SECTOR_LABELS.get(sector)]
+    if not any(words):
+        return "startups across stages and sectors"
+    return " ".join(word for word in words if word) + " startups"
+
+
+def summarize(result):
+    """Writes a benchmark result (see benchmark_many) as a short plain-text summary."""
+    sentences = [f"Compared with {peer_group(result['stage'], result['sector'])}:"]
+    for metric, comparison in result["metrics"].items():
+        note = " (lower is better)" if metric in LOWER_IS_BETTER else ""
+        sentences.append(
+            f"{LABELS[metric]} of {format_value(metric, comparison['value'])} is {comparison['assessment']}{note}, "
+            f"{_ordinal(comparison['percentile'])} percentile against a median of "
+            f"{format_value(metric, comparison['median'])}."
+        )
+    if not result["metrics"]:
+        sentences.append("no metric could be benchmarked.")
+    if result["not_benchmarked"]:
+        sentences.append("Not benchmarked (missing): "
+                         f"{', '.join(LABELS[metric] for metric in result['not_benchmarked'])}.")
+    return " ".join(sentences)
@@ -0,0 +1,137 @@
+import contextvars
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .telemetry import span
+
+
+class Node:
+    """A single step of the analysis pipeline.
+
+    `func` is called with the values of `inputs` (in order) and its return
+    value is stored under `name` for downstream nodes. Nodes with a `key`
+    function can be reused: `key(*inputs)` returns the JSON-serializable part
+    of the inputs that determines the output.
+    """
+
+    def __init__(self, name, func, inputs, key=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.key = key
+
+
+def same_inputs(*args):
+    """Reuse key for nodes whose output depends on all of their inputs."""
+    return list(args)
+
+
+def input_hash(node, args):
+    payload = json.dumps({"node": node.name, "key": node.key(*args)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _check_graph(nodes, initial):
+    """Ensures every input is produced by exactly one source and the graph has no cycles."""
+    produced = set(initial)
+    for node in nodes:
+        if node.name in produced:
+            raise ValueError(f"Pipeline value '{node.name}' is produced more than once.")
+        produced.add(node.name)
+
+    for node in nodes:
+        missing = [key for key in node.inputs if key not in produced]
+        if missing:
+            raise ValueError(f"Pipeline node '{node.name}' depends on unknown inputs: {missing}")
+
+    available = set(initial)
+    remaining = list(nodes)
+    while remaining:
+        ready = [node for node in remaining if all(key in available for key in node.inputs)]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {[n.name for n in remaining]}")
+        for node in ready:
+            available.add(node.name)
+            remaining.remove(node)
+
+
+def run_pipeline(nodes, initial, max_workers=4, on_result=None, memo=None):
+    """
+    Runs every node as soon as all of its inputs are available.
+
+    Independent nodes run at the same time on a bounded thread pool, so the
+    total latency is roughly the critical path of the graph. Returns a tuple
+    of (values, timings) where timings maps each node name to its start, end
+    and duration in seconds, relative to the start of the pipeline.
+
+    If given, `on_result(name, value)` is called as soon as each node
+    finishes, which lets callers stream partial results.
+
+    If a `memo` is given (see utils.report_store.ReuseMemo), nodes with a
+    `key` first look up an earlier output for the same input hash and only
+    run when there is none; their timings are marked with "reused".
+    """
+    _check_graph(nodes, initial)
+
+    values = dict(initial)
+    timings = {}
+    pending = list(nodes)
+    running = {}
+    started_at = time.perf_counter()
+
+    def call(node, args):
+        if memo is None or node.key is None:
+            return node.func(*args), False
+        key = input_hash(node, args)
+        found, value = memo.lookup(node.name, key)
+        if found:
+            return value, True
+        value = node.func(*args)
+        memo.record(node.name, key, value)
+        return value, False
+
+    def timed_call(node, args):
+        start = time.perf_counter()
+        reused = False
+        try:
+            with span("agent", node.name) as attributes:
+                value, reused = call(node, args)
+                if reused:
+                    attributes["reused"] = True
+            return value
+        finally:
+            end = time.perf_counter()
+            timings[node.name] = {
+                "start": round(start - started_at, 4),
+                "end": round(end - started_at, 4),
+                "duration": round(end - start, 4),
+            }
+            if reused:
+                timings[node.name]["reused"] = True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for node in [n for n in pending if all(key in values for key in n.inputs)]:
+                pending.remove(node)
+                args = [values[key] for key in node.inputs]
+                # Each node runs in a copy of the caller's context so deadline budgets carry over
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, timed_call, node, args)] = node
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    values[node.name] = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+                if on_result is not None:
+                    on_result(node.name, values[node.name])
+
+    total = round(time.perf_counter() - started_at, 4)
+    timings["total"] = {"start": 0.0, "end": total, "duration": total}
+    return values, timings
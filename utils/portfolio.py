@@ -0,0 +1,322 @@
+import math
+import re
+import threading
+import time
+import warnings
+
+from .metric_extractor import FINANCIAL_FIELDS, MARKET_FIELDS, amount_match, extract_metrics, parse_amount
+
+AMOUNT_FIELDS = FINANCIAL_FIELDS + MARKET_FIELDS
+# Columns of the portfolio table, in order; amounts also get <field>_currency and <field>_unit
+NUMBER_COLUMNS = ("created_at", "confidence", *AMOUNT_FIELDS, "team_size", "ltv_cac", "sam_share_of_tam")
+TEXT_COLUMNS = ("company_name", "company_key", "doc_hash", "recommendation", "overall_risk", "stage", "sector",
+                "country", *(f"{field}_{part}" for field in AMOUNT_FIELDS for part in ("currency", "unit")))
+COLUMNS = ("report_id", *NUMBER_COLUMNS, *TEXT_COLUMNS)
+
+# Names a query may use for a column
+ALIASES = {"ltv/cac": "ltv_cac", "ltv_to_cac": "ltv_cac", "sam/tam": "sam_share_of_tam", "company": "company_name",
+           "risk": "overall_risk", "arr": "revenue"}
+
+# A revenue amount is monthly only when it is tagged so itself: "$85K MRR", "$40K per month", "MRR: $85K"
+_MONTHLY_AFTER = re.compile(r"\s*(?:MRR\b|/\s?mo(?:nth)?\b|(?:per|a|each|every)\s+month\b|monthly\b)", re.IGNORECASE)
+_MONTHLY_BEFORE = re.compile(r"(?:\bMRR|\bmonthly(?: recurring)? revenue)\s*(?:of|is|was|:|=|-)?\s*$", re.IGNORECASE)
+_BARE_NUMBER = re.compile(r"\s*(?:~|about|approx\.?|approximately|around)?\s*(\d[\d,]*)\+?\s*", re.IGNORECASE)
+_ANNUAL = re.compile(r"\bARR\b|\bannual|\byearly\b|\bper year\b|/\s?y(?:ea)?r\b", re.IGNORECASE)
+
+
+class QueryError(ValueError):
+    """Raised for a portfolio query that cannot be parsed."""
+
+
+def normalize_metrics(metrics, team=None):
+    """
+    Parses a report's free-form metrics ("$500K ARR", "Not found") into numbers.
+
+    Returns {field: {"value", "currency", "unit"}} for each amount that has a
+    number. Monthly revenue (MRR) is annualized so revenue is always per year.
+    """
+    normalized = {}
+    for field in AMOUNT_FIELDS:
+        text = (metrics or {}).get(field)
+        amount = parse_amount(text)
+        if amount is None:
+            continue
+        if field == "revenue" and _is_monthly(text):
+            amount = {**amount, "value": amount["value"] * 12, "annualized_from": "MRR"}
+        normalized[field] = amount
+    team_size = _team_size((team or {}).get("team_size"))
+    if team_size is not None:
+        normalized["team_size"] = {"value": team_size, "currency": None, "unit": None}
+    return normalized
+
+
+def _is_monthly(text):
+    """True if the first amount in a revenue text is itself monthly, and nothing marks the text as annual."""
+    match = amount_match(text)
+    if match is None or _ANNUAL.search(text):
+        return False
+    return bool(_MONTHLY_AFTER.match(text, match.end()) or _MONTHLY_BEFORE.search(text, 0, match.start()))
+
+
+def _team_size(text):
+    """The number of people in a team size text: "12", or the number next to "people", "employees" or "team"."""
+    if text is None:
+        return None
+    found = extract_metrics(str(text), ["team_size"]).get("team_size")
+    if found is not None:
+        return found["value"]
+    # Without a word saying what is counted, only a bare number is taken ("10", "~10", "about 10")
+    match = _BARE_NUMBER.fullmatch(str(text))
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def portfolio_row(report_id, created_at, doc_hash, company_key, report):
+    """Returns the portfolio table row (a dict over COLUMNS) for a finished report."""
+    normalized = report.get("normalized_metrics") or normalize_metrics(report.get("metrics"), report.get("team"))
+    recommendation = report.get("recommendation") or {}
+    benchmark = report.get("benchmark") or {}
+    row = {
+        "report_id": report_id,
+        "created_at": created_at,
+        "confidence": _number(recommendation.get("confidence")),
+        "company_name": report.get("company_name"),
+        "company_key": company_key,
+        "doc_hash": doc_hash,
+        "recommendation": recommendation.get("recommendation"),
+        "overall_risk": (report.get("risk") or {}).get("overall_risk"),
+        # The benchmark falls back to "all" when the stage or sector is unknown
+        "stage": _known(benchmark.get("stage")),
+        "sector": _known(benchmark.get("sector")),
+        "country": (report.get("metrics") or {}).get("country"),
+    }
+    for field in (*AMOUNT_FIELDS, "team_size"):
+        amount = normalized.get(field) or {}
+        row[field] = amount.get("value", math.nan)
+        if field != "team_size":
+            row[f"{field}_currency"] = amount.get("currency")
+            row[f"{field}_unit"] = amount.get("unit")
+    # Ratios only make sense between amounts in the same currency
+    row["ltv_cac"] = _ratio(row, "ltv", "cac")
+    row["sam_share_of_tam"] = _ratio(row, "sam", "tam")
+    return row
+
+
+def _known(value):
+    return None if value == "all" else value
+
+
+def _ratio(row, numerator, denominator):
+    if row[f"{numerator}_currency"] != row[f"{denominator}_currency"] or not row[denominator]:
+        return math.nan
+    return row[numerator] / row[denominator]
+
+
+def _column(name):
+    name = name.strip().lower()
+    name = ALIASES.get(name, name)
+    if name not in COLUMNS:
+        raise QueryError(f"Unknown field: {name!r}. Fields: {', '.join(COLUMNS)}")
+    return name
+
+
+_CONDITION = re.compile(r"^\s*(?P<field>[\w/]+)\s*(?P<op>>=|<=|!=|==|=|>|<)\s*(?P<value>[^<>=!\s].*?)\s*$")
+_OPERATORS = {">": "__gt__", ">=": "__ge__", "<": "__lt__", "<=": "__le__", "=": "__eq__", "==": "__eq__",
+              "!=": "__ne__"}
+
+
+def parse_query(where):
+    """
+    Parses a filter such as "LTV/CAC > 3 and TAM > $1B and sector = saas".
+
+    Conditions are joined with "and". Numbers may carry a currency and scale
+    ("$1B", "€500K") or be percentages ("20%"). Returns a list of
+    (column, operator, value, currency) tuples.
+    """
+    conditions = []
+    for clause in re.split(r"\s+and\s+", (where or "").strip(), flags=re.IGNORECASE):
+        if not clause:
+            continue
+        match = _CONDITION.match(clause)
+        if match is None:
+            raise QueryError(f"Cannot parse condition: {clause!r} (expected e.g. 'tam > $1B').")
+        column, op, text = _column(match.group("field")), match.group("op"), match.group("value").strip("'\" ")
+        if column in TEXT_COLUMNS:
+            if op not in ("=", "==", "!="):
+                raise QueryError(f"{column} is text and can only be compared with = or !=.")
+            conditions.append((column, op, text, None))
+        elif text.endswith("%"):
+            conditions.append((column, op, _number(text[:-1]) / 100, None))
+        else:
+            amount = parse_amount(text)
+            if amount is None:
+                raise QueryError(f"Not a number: {text!r}")
+            conditions.append((column, op, amount["value"], amount["currency"]))
+    return conditions
+
+
+class PortfolioTable:
+    """
+    An in-memory columnar copy of the portfolio table, for screening and ranking queries.
+
+    Each column is a numpy array (float for numbers, object for text), so a
+    query is a handful of vectorized comparisons. `refresh()` appends the
+    rows that were added to the store since the last call; rows from worker
+    processes become visible at the next query.
+    """
+
+    def __init__(self, store):
+        import numpy as np
+
+        self.store = store
+        self.columns = {name: np.empty(0, dtype=float if name in NUMBER_COLUMNS else object) for name in COLUMNS}
+        self.columns["report_id"] = np.empty(0, dtype=np.int64)
+        # Text columns are also kept as integer codes of their lowercased values (-1 for none),
+        # so comparisons are integer comparisons
+        self._codes = {name: np.empty(0, dtype=np.int32) for name in TEXT_COLUMNS}
+        self._vocabulary = {name: {} for name in TEXT_COLUMNS}
+        # Only the newest report of each company is screened by default
+        self.latest = np.empty(0, dtype=bool)
+        self._latest_row = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns["report_id"])
+
+    def refresh(self):
+        import numpy as np
+
+        with self._lock:
+            rows = self.store.portfolio_rows(after_id=self._last_id)
+            if not rows:
+                return 0
+            start = len(self)
+            for position, name in enumerate(COLUMNS):
+                values = [row[position] for row in rows]
+                if name in NUMBER_COLUMNS:
+                    values = np.array([math.nan if value is None else value for value in values], dtype=float)
+                else:
+                    values = np.array(values, dtype=self.columns[name].dtype)
+                if name in TEXT_COLUMNS:
+                    vocabulary = self._vocabulary[name]
+                    codes = np.array([-1 if value is None else vocabulary.setdefault(str(value).lower(), len(vocabulary))
+                                      for value in values], dtype=np.int32)
+                    self._codes[name] = np.concatenate([self._codes[name], codes])
+                self.columns[name] = np.concatenate([self.columns[name], values])
+            latest = np.ones(len(rows), dtype=bool)
+            self.latest = np.concatenate([self.latest, latest])
+            # Rows arrive in report order, so a later row of the same company supersedes the earlier one
+            for offset, company in enumerate(self.columns["company_key"][start:]):
+                previous = self._latest_row.get(company)
+                if previous is not None:
+                    self.latest[previous] = False
+                self._latest_row[company] = start + offset
+            self._last_id = int(self.columns["report_id"][-1])
+            return len(rows)
+
+    def _mask(self, conditions, latest=True):
+        import numpy as np
+
+        mask = self.latest.copy() if latest else np.ones(len(self), dtype=bool)
+        for column, op, value, currency in conditions:
+            values = self.columns[column]
+            if column in TEXT_COLUMNS:
+                matches = self._codes[column] == self._vocabulary[column].get(value.lower(), -2)
+                mask &= matches if op != "!=" else ~matches
+                continue
+            with np.errstate(invalid="ignore"):
+                mask &= getattr(values, _OPERATORS[op])(value) & ~np.isnan(values)
+            if currency is not None and f"{column}_currency" in self.columns:
+                # "$1B" only matches amounts in dollars (or without a currency)
+                codes = self._codes[f"{column}_currency"]
+                mask &= (codes == self._vocabulary[f"{column}_currency"].get(currency.lower(), -2)) | (codes == -1)
+        return mask
+
+    def query(self, where=None, sort=None, limit=50, offset=0, latest=True):
+        """
+        Returns the rows matching `where` (see parse_query), sorted and paged.
+
+        `sort` is a column name, prefixed with "-" for descending order; rows
+        without a value sort last. With `latest`, only the newest report of
+        each company is considered.
+        """
+        import numpy as np
+
+        start = time.perf_counter()
+        conditions = parse_query(where)
+        sort_column = _column(sort.lstrip("-")) if sort else None
+        self.refresh()
+        with self._lock:
+            indices = np.flatnonzero(self._mask(conditions, latest))
+            if sort_column is not None:
+                values = self.columns[sort_column][indices]
+                if sort_column in NUMBER_COLUMNS:
+                    keys = -values if sort.startswith("-") else values
+                    order = np.argsort(keys, kind="stable")  # NaN sorts last either way
+                else:
+                    order = np.argsort(np.array(["" if v is None else str(v).lower() for v in values]), kind="stable")
+                    order = order[::-1] if sort.startswith("-") else order
+                indices = indices[order]
+            page = indices[offset:offset + limit]
+            rows = [
+                {name: _plain(self.columns[name][index]) for name in COLUMNS if name != "company_key"}
+                for index in page
+            ]
+        return {"count": len(indices), "rows": rows, "query_ms": round(1000 * (time.perf_counter() - start), 3)}
+
+    def aggregate(self, where=None, group_by=None, latest=True):
+        """Returns the count and the median of every numeric column for the matching rows, per `group_by` value."""
+        import numpy as np
+
+        conditions = parse_query(where)
+        group_column = _column(group_by) if group_by else None
+        if group_column is not None and group_column not in TEXT_COLUMNS:
+            raise QueryError(f"Can only group by a text field, not {group_column}.")
+        names = [name for name in NUMBER_COLUMNS if name != "created_at"]
+        self.refresh()
+        with self._lock:
+            indices = np.flatnonzero(self._mask(conditions, latest))
+            values = np.column_stack([self.columns[name][indices] for name in names])
+            groups = {"all": slice(None)}
+            if group_column is not None:
+                codes = self._codes[group_column][indices]
+                labels = {code: label for label, code in self._vocabulary[group_column].items()}
+                groups = {labels.get(code, "none"): codes == code for code in np.unique(codes).tolist()}
+            summary = {}
+            for key, rows in groups.items():
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns give NaN
+                    selected = values[rows]
+                    medians = np.nanmedian(selected, axis=0) if len(selected) else np.full(len(names), np.nan)
+                summary[key] = {"count": len(selected),
+                                "median": {name: _plain(median) for name, median in zip(names, medians)}}
+        return summary
+
+
+def _plain(value):
+    # numpy scalars and NaN are not JSON serializable as such
+    if isinstance(value, str) or value is None:
+        return value
+    value = value.item() if hasattr(value, "item") else value
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_portfolio():
+    """Returns the process-wide PortfolioTable over the report store."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            from .report_store import get_report_store
+            _table = PortfolioTable(get_report_store())
+        return _table
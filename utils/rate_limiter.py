@@ -0,0 +1,197 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+_deadline = contextvars.ContextVar("model_call_deadline", default=None)
+_cancel_event = contextvars.ContextVar("model_call_cancel_event", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a model call cannot be made within the current deadline budget."""
+
+
+class Cancelled(Exception):
+    """Raised instead of starting a model call once the enclosing cancellation scope is cancelled."""
+
+
+@contextmanager
+def deadline_budget(seconds):
+    """Limits every model call made inside the block, retries included, to `seconds` in total."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """Returns the monotonic deadline of the enclosing budget, or None."""
+    return _deadline.get()
+
+
+@contextmanager
+def cancellation_scope(event):
+    """Makes model calls inside the block raise Cancelled once `event` (a threading.Event) is set."""
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+
+def raise_if_cancelled():
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise Cancelled("The job was cancelled.")
+
+
+def estimate_tokens(prompt):
+    """Cheap token estimate (about four characters per token) used for TPM accounting."""
+    return max(1, len(str(prompt)) // 4)
+
+
+class TokenBucket:
+    """A continuously refilling bucket holding at most one minute of budget."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+
+class AdaptiveLimiter:
+    """
+    Process-wide governor for model calls.
+
+    Combines requests-per-minute and tokens-per-minute token buckets with an
+    AIMD concurrency limit: every successful call raises the limit by
+    1/limit, every throttle halves it and starts a shared cool-down, so all
+    callers back off together instead of each retrying on its own.
+    """
+
+    def __init__(self, rpm=60, tpm=1_000_000, initial_concurrency=4, max_concurrency=32,
+                 min_concurrency=1, decrease_ratio=0.5, max_cooldown=60.0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_ratio = decrease_ratio
+        self.max_cooldown = max_cooldown
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._consecutive_throttles = 0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "requests": 0,
+            "throttle_events": 0,
+            "deadline_exceeded": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "tokens_estimated": 0,
+        }
+
+    def _wait_time(self, tokens, now):
+        """Seconds to wait before a call may start, or None to wait for a release."""
+        if self.in_flight >= int(self.limit):
+            return None
+        return max(self.cooldown_until - now,
+                   self.requests.wait_time(1, now),
+                   self.tokens.wait_time(tokens, now))
+
+    def _admit(self, tokens, now, waited):
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+        self.in_flight += 1
+        self._metrics["requests"] += 1
+        self._metrics["tokens_estimated"] += tokens
+        self._metrics["queue_wait_seconds_total"] += waited
+        self._metrics["queue_wait_seconds_max"] = max(self._metrics["queue_wait_seconds_max"], waited)
+
+    def acquire(self, tokens, deadline=None):
+        """Blocks until a call may start. Raises DeadlineExceeded if `deadline` would pass first."""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(tokens, now)
+                if wait == 0.0:
+                    self._admit(tokens, now, now - start)
+                    return
+                if deadline is not None and (now >= deadline or (wait is not None and now + wait > deadline)):
+                    self._metrics["deadline_exceeded"] += 1
+                    raise DeadlineExceeded("Model call could not start within the deadline budget.")
+                timeout = wait
+                if deadline is not None:
+                    timeout = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(timeout)
+
+    def release(self, throttled=False, extra_tokens=0, backoff_factor=2):
+        """Returns a slot and adapts the concurrency limit to the outcome of the call."""
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if extra_tokens:
+                self.tokens.take(extra_tokens, now)
+            if throttled:
+                self._metrics["throttle_events"] += 1
+                self.limit = max(self.min_concurrency, self.limit * self.decrease_ratio)
+                cooldown = min(self.max_cooldown, backoff_factor ** self._consecutive_throttles) + random.uniform(0, 1)
+                self.cooldown_until = max(self.cooldown_until, now + cooldown)
+                self._consecutive_throttles += 1
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self._consecutive_throttles = 0
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            now = time.monotonic()
+            return dict(
+                self._metrics,
+                concurrency_limit=round(self.limit, 2),
+                in_flight=self.in_flight,
+                cooldown_remaining=round(max(0.0, self.cooldown_until - now), 2),
+            )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Returns the limiter shared by every model call in this process."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveLimiter(
+                rpm=int(os.getenv("GEMINI_RPM", "60")),
+                tpm=int(os.getenv("GEMINI_TPM", "1000000")),
+                initial_concurrency=int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "4")),
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")),
+            )
+        return _limiter
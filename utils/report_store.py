@@ -0,0 +1,260 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from . import company_cache, portfolio
+
+# Default location of persistent analysis data (reports are records, not cache entries)
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Bump when agent prompts or output shapes change so older outputs are not reused
+OUTPUT_VERSION = 2
+
+# Bump when company_key changes so the keys of stored reports are recomputed
+COMPANY_KEY_VERSION = 1
+
+
+def _summary(row):
+    report_id, doc_hash, company_name, created_at, recommendation, confidence = row
+    return {
+        "id": report_id,
+        "document_hash": doc_hash,
+        "company_name": company_name,
+        "created_at": created_at,
+        "recommendation": recommendation,
+        "confidence": confidence,
+    }
+
+
+class ReportStore:
+    """
+    A SQLite store of finished analysis reports.
+
+    Reports are indexed by document hash, company key (see
+    utils.company_cache.company_key) and creation time. Each agent's output
+    is also kept separately, keyed by the hash of the inputs it was computed
+    from, so a later analysis can reuse every output whose inputs did not
+    change.
+    """
+
+    _SUMMARY_COLUMNS = "id, doc_hash, company_name, created_at, recommendation, confidence"
+
+    def __init__(self, path, reuse_max_age=7 * 24 * 3600):
+        self.path = path
+        self.reuse_max_age = reuse_max_age
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, doc_hash TEXT NOT NULL, company_name TEXT, company_key TEXT, "
+            "created_at REAL NOT NULL, recommendation TEXT, confidence TEXT, report TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS reports_doc_hash ON reports (doc_hash, created_at);"
+            "CREATE INDEX IF NOT EXISTS reports_company ON reports (company_key, created_at);"
+            "CREATE INDEX IF NOT EXISTS reports_created_at ON reports (created_at);"
+            "CREATE TABLE IF NOT EXISTS agent_outputs ("
+            "report_id INTEGER NOT NULL REFERENCES reports (id), node TEXT NOT NULL, "
+            "input_hash TEXT NOT NULL, version INTEGER NOT NULL, created_at REAL NOT NULL, output TEXT NOT NULL, "
+            "reused INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (report_id, node));"
+            "CREATE INDEX IF NOT EXISTS agent_outputs_input ON agent_outputs (node, input_hash, version, created_at);"
+            f"CREATE TABLE IF NOT EXISTS portfolio ({self._portfolio_schema()});"
+        )
+        self._db.commit()
+        self._rekey_companies()
+        self._backfill_portfolio()
+
+    @staticmethod
+    def _portfolio_schema():
+        columns = ["report_id INTEGER PRIMARY KEY REFERENCES reports (id)"]
+        columns += [f"{name} REAL" for name in portfolio.NUMBER_COLUMNS]
+        columns += [f"{name} TEXT" for name in portfolio.TEXT_COLUMNS]
+        return ", ".join(columns)
+
+    def _insert_portfolio_row(self, report_id, created_at, doc_hash, company_key, report):
+        row = portfolio.portfolio_row(report_id, created_at, doc_hash, company_key, report)
+        self._db.execute(
+            f"INSERT OR REPLACE INTO portfolio ({', '.join(portfolio.COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(portfolio.COLUMNS))})",
+            # SQLite stores NaN as NULL
+            [row[name] for name in portfolio.COLUMNS],
+        )
+
+    def _rekey_companies(self):
+        """Recomputes company keys stored by an earlier version of company_key, once per COMPANY_KEY_VERSION."""
+        with self._lock:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] >= COMPANY_KEY_VERSION:
+                return
+            rows = self._db.execute("SELECT id, company_name, company_key FROM reports").fetchall()
+            changed = [(company_cache.company_key(name), report_id) for report_id, name, key in rows
+                       if company_cache.company_key(name) != key]
+            self._db.executemany("UPDATE reports SET company_key = ? WHERE id = ?", changed)
+            self._db.executemany("UPDATE portfolio SET company_key = ? WHERE report_id = ?", changed)
+            self._db.execute(f"PRAGMA user_version = {COMPANY_KEY_VERSION}")
+            self._db.commit()
+        if changed:
+            print(f"Report store: updated the company key of {len(changed)} earlier reports.")
+
+    def _backfill_portfolio(self):
+        """Adds portfolio rows for reports stored before the portfolio table existed."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created_at, doc_hash, company_key, report FROM reports "
+                "WHERE id NOT IN (SELECT report_id FROM portfolio) ORDER BY id"
+            ).fetchall()
+            for report_id, created_at, doc_hash, company_key, report in rows:
+                self._insert_portfolio_row(report_id, created_at, doc_hash, company_key, json.loads(report))
+            self._db.commit()
+        if rows:
+            print(f"Report store: added {len(rows)} earlier reports to the portfolio table.")
+
+    def save(self, doc_hash, company_name, report, outputs=None, reused=()):
+        """
+        Stores a report and the per-agent outputs it was built from; returns the report ID.
+
+        `outputs` maps node names to (input_hash, value) pairs.
+        """
+        now = time.time()
+        recommendation = report.get("recommendation") or {}
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO reports (doc_hash, company_name, company_key, created_at, recommendation, confidence, report) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_hash, company_name, company_cache.company_key(company_name), now,
+                 recommendation.get("recommendation"), str(recommendation.get("confidence")),
+                 json.dumps(report, ensure_ascii=False)),
+            )
+            report_id = cursor.lastrowid
+            self._insert_portfolio_row(report_id, now, doc_hash, company_cache.company_key(company_name), report)
+            self._db.executemany(
+                "INSERT INTO agent_outputs (report_id, node, input_hash, version, created_at, output, reused) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(report_id, node, input_hash, OUTPUT_VERSION, now, json.dumps(value, ensure_ascii=False),
+                  int(node in reused))
+                 for node, (input_hash, value) in (outputs or {}).items()],
+            )
+            self._db.commit()
+        return report_id
+
+    def get(self, report_id):
+        """Returns the stored report with its ID, document hash and per-agent outputs, or None."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {self._SUMMARY_COLUMNS}, report FROM reports WHERE id = ?", (report_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            outputs = self._db.execute(
+                "SELECT node, input_hash, output, reused FROM agent_outputs WHERE report_id = ? ORDER BY node",
+                (report_id,),
+            ).fetchall()
+        return {
+            **_summary(row[:-1]),
+            "report": json.loads(row[-1]),
+            "agent_outputs": {
+                node: {"input_hash": input_hash, "reused": bool(reused), "output": json.loads(output)}
+                for node, input_hash, output, reused in outputs
+            },
+        }
+
+    def latest_for_document(self, doc_hash):
+        """Returns the most recent report for a document hash, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM reports WHERE doc_hash = ? ORDER BY created_at DESC LIMIT 1", (doc_hash,)
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def list(self, company=None, since=None, limit=50, offset=0):
+        """Returns report summaries, newest first, optionally for one company or after a timestamp."""
+        where, params = [], []
+        if company:
+            where.append("company_key = ?")
+            params.append(company_cache.company_key(company))
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        sql = f"SELECT {self._SUMMARY_COLUMNS} FROM reports"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit, offset)).fetchall()
+        return [_summary(row) for row in rows]
+
+    def portfolio_rows(self, after_id=0):
+        """Returns the portfolio rows of reports with an ID above `after_id`, as tuples over portfolio.COLUMNS."""
+        with self._lock:
+            return self._db.execute(
+                f"SELECT {', '.join(portfolio.COLUMNS)} FROM portfolio WHERE report_id > ? ORDER BY report_id",
+                (after_id,),
+            ).fetchall()
+
+    def find_output(self, node, input_hash):
+        """Returns (True, value) for the newest reusable output of `node` for these inputs, else (False, None)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT output FROM agent_outputs WHERE node = ? AND input_hash = ? AND version = ? "
+                "AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (node, input_hash, OUTPUT_VERSION, time.time() - self.reuse_max_age),
+            ).fetchone()
+        return (True, json.loads(row[0])) if row else (False, None)
+
+    def memo(self):
+        return ReuseMemo(self)
+
+
+def _failed(value):
+    # Agents report parse failures as "Error" values; those outputs must be recomputed
+    return isinstance(value, dict) and any(v == "Error" for v in value.values())
+
+
+class ReuseMemo:
+    """
+    Per-analysis bridge between the pipeline and the store.
+
+    The pipeline asks it for earlier outputs by node name and input hash and
+    reports every output it computes, so the analysis can be saved afterwards.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.outputs = {}
+        self.reused = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, node, input_hash):
+        found, value = self.store.find_output(node, input_hash)
+        if found:
+            with self._lock:
+                self.outputs[node] = (input_hash, value)
+                self.reused.add(node)
+        return found, value
+
+    def record(self, node, input_hash, value):
+        if _failed(value):
+            return
+        with self._lock:
+            self.outputs[node] = (input_hash, value)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store_enabled():
+    return os.getenv("REPORT_STORE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def get_report_store():
+    """Returns the process-wide report store, configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReportStore(
+                os.getenv("REPORT_STORE_PATH", os.path.join(DATA_DIR, "reports.sqlite")),
+                reuse_max_age=int(os.getenv("REPORT_REUSE_MAX_AGE_SECONDS", str(7 * 24 * 3600))),
+            )
+        return _store
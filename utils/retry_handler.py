@@ -1,22 +1,89 @@
 import time
-import random
-from google.api_core.exceptions import ResourceExhausted
+from .backends import get_backend
+from .llm_cache import CachedResponse, cache_enabled, get_cache, make_key
+from .rate_limiter import DeadlineExceeded, current_deadline, estimate_tokens, get_limiter, raise_if_cancelled
+from .telemetry import CACHE_LOOKUPS, MODEL_CALLS, PROMPT_TOKENS, RESPONSE_TOKENS, THROTTLE_EVENTS, span
 
-def gemini_request_with_retry(model, prompt, max_retries=5, backoff_factor=2):
-    """Makes a request to the Gemini model with exponential backoff retry logic."""
-    for i in range(max_retries):
+def gemini_request_with_retry(model, prompt, max_retries=5, backoff_factor=2, use_cache=True, cache_if=None):
+    """
+    Makes a request to the Gemini model through the shared rate limiter.
+
+    The call goes to the active backend (see utils.backends), so the same
+    code path runs against Vertex AI or the offline fake.
+
+    Responses are cached by model, generation config and prompt, so repeated
+    identical requests are answered without a model call. Pass
+    `use_cache=False` (or set LLM_CACHE_DISABLED) to always call the model.
+    With `cache_if(text)`, only replies it accepts are cached, and a cached
+    reply it rejects is deleted and asked for again.
+
+    Throttled calls are retried after the limiter's shared cool-down. Inside a
+    `deadline_budget` block, retries continue until the deadline; otherwise
+    at most `max_retries` attempts are made.
+    """
+    # Imported here so loading this module does not pull in the Google SDK
+    from google.api_core.exceptions import ResourceExhausted
+
+    model_name = getattr(model, "_model_name", type(model).__name__)
+    cache_key = None
+    if use_cache and cache_enabled():
+        cache_key = make_key(model_name, getattr(model, "_generation_config", None), prompt)
+        cached_text = get_cache().get(cache_key)
+        CACHE_LOOKUPS.inc(cache="llm", result="miss" if cached_text is None else "hit")
+        if cached_text is not None and cache_if is not None and not cache_if(cached_text):
+            get_cache().delete(cache_key)
+            cached_text = None
+        if cached_text is not None:
+            print("AI model response served from cache.")
+            return CachedResponse(cached_text)
+
+    backend = get_backend()
+    limiter = get_limiter()
+    deadline = current_deadline()
+    tokens = estimate_tokens(prompt)
+    attempt = 0
+    while True:
+        attempt += 1
+        # A cancelled job stops spending quota at its next model call
+        raise_if_cancelled()
+        # The first wait is queueing for capacity; later ones are the shared back-off after a throttle
+        with span("wait", "queue" if attempt == 1 else "backoff", model=model_name, attempt=attempt):
+            limiter.acquire(tokens, deadline)
         try:
-            print(f"Attempt {i + 1} of {max_retries} to call the AI model...")
-            response = model.generate_content(prompt)
-            print("AI model call successful.")
-            return response
+            print(f"Attempt {attempt} to call the AI model...")
+            with span("model_call", model_name, attempt=attempt, prompt_tokens=tokens):
+                response = backend.generate(model, prompt)
         except ResourceExhausted as e:
-            if i == max_retries - 1:
+            limiter.release(throttled=True, backoff_factor=backoff_factor)
+            MODEL_CALLS.inc(model=model_name, outcome="throttled")
+            THROTTLE_EVENTS.inc(model=model_name)
+            if deadline is None and attempt >= max_retries:
                 print("Maximum retries reached. Failing.")
                 raise e
+            if deadline is not None and time.monotonic() >= deadline:
+                print("Deadline budget exhausted. Failing.")
+                raise DeadlineExceeded("Model call did not succeed within the deadline budget.") from e
+            print("Rate limit hit. Waiting for the shared cool-down before retrying...")
+            continue
+        except Exception:
+            limiter.release()
+            MODEL_CALLS.inc(model=model_name, outcome="error")
+            raise
+
+        usage = getattr(response, "usage_metadata", None)
+        total_tokens = getattr(usage, "total_token_count", 0) or 0
+        limiter.release(extra_tokens=max(0, total_tokens - tokens))
+        MODEL_CALLS.inc(model=model_name, outcome="ok")
+        PROMPT_TOKENS.observe(getattr(usage, "prompt_token_count", 0) or tokens, model=model_name)
+        RESPONSE_TOKENS.observe(getattr(usage, "candidates_token_count", 0) or 0, model=model_name)
+        print("AI model call successful.")
 
-            # Exponential backoff with jitter
-            wait_time = backoff_factor ** i + random.uniform(0, 1)
-            print(f"Rate limit hit. Waiting for {wait_time:.2f} seconds before retrying...")
-            time.sleep(wait_time)
-    raise Exception("Exhausted all retry attempts.")
+        if cache_key is not None:
+            try:
+                if cache_if is None or cache_if(response.text):
+                    get_cache().put(cache_key, response.text)
+                else:
+                    print("Response not cached: it failed validation.")
+            except (AttributeError, ValueError) as e:
+                print(f"Response not cached: {e}")
+        return response
@@ -0,0 +1,201 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Span durations range from sub-millisecond merges to multi-minute OCR runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self, extra=()):
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, key, extra)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def collect(self, extra=()):
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, key, extra)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self, extra=()):
+        lines = []
+        extra = list(extra)
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, extra + [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key, extra)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key, extra)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds the process's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def samples(self, **labels):
+        """Returns every metric's sample lines with `labels` added, keyed by metric name."""
+        return {metric.name: metric.collect(sorted(labels.items())) for metric in self._metrics}
+
+    def render(self, extra_samples=()):
+        """Renders this process's metrics followed by the sample lines other processes reported (see samples)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+            for samples in extra_samples:
+                lines.extend(samples.get(metric.name, ()))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.register(Histogram(
+    "analyst_span_seconds", "Duration of parse, agent, model call and wait spans.", ["kind", "name"]))
+MODEL_CALLS = REGISTRY.register(Counter(
+    "analyst_model_calls_total", "Model calls by outcome (ok, throttled, error).", ["model", "outcome"]))
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "analyst_prompt_tokens", "Prompt tokens per successful model call.", ["model"], TOKEN_BUCKETS))
+RESPONSE_TOKENS = REGISTRY.register(Histogram(
+    "analyst_response_tokens", "Response tokens per successful model call.", ["model"], TOKEN_BUCKETS))
+AGENT_INPUT_TOKENS = REGISTRY.register(Histogram(
+    "analyst_agent_input_tokens", "Estimated tokens of an agent's serialized context and of its whole prompt.",
+    ["agent", "part"], TOKEN_BUCKETS))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "analyst_cache_lookups_total", "Cache lookups by cache and result (hit, miss).", ["cache", "result"]))
+PARSE_FAILURES = REGISTRY.register(Counter(
+    "analyst_json_parse_failures_total", "Model responses an agent could not parse as JSON.", ["agent"]))
+AGENT_OUTPUTS = REGISTRY.register(Counter(
+    "analyst_agent_outputs_total",
+    "Agent outputs by outcome: valid as returned, repaired locally, fixed by a re-ask, or failed.",
+    ["agent", "outcome"]))
+OUTPUT_REPAIRS = REGISTRY.register(Counter(
+    "analyst_output_repairs_total", "Local repairs applied to model JSON, by kind.", ["agent", "repair"]))
+REASKED_FIELDS = REGISTRY.register(Counter(
+    "analyst_reasked_fields_total", "Fields asked for again after a missing or invalid value.", ["agent"]))
+THROTTLE_EVENTS = REGISTRY.register(Counter(
+    "analyst_throttle_events_total", "ResourceExhausted responses from the model.", ["model"]))
+GAUGES = REGISTRY.register(Gauge(
+    "analyst_state", "Point-in-time values sampled when /metrics is scraped.", ["name"]))
+
+# Spans of the current analysis when a trace was requested (see start_trace)
+_trace = contextvars.ContextVar("analysis_trace", default=None)
+
+
+@contextmanager
+def start_trace():
+    """Collects every span recorded in this context (and the threads it starts) into the yielded list."""
+    spans = []
+    token = _trace.set((spans, time.perf_counter(), threading.Lock()))
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    """
+    Times a block and records it in the span histogram and, if active, the current trace.
+
+    The yielded dict can be updated with attributes that are only known at the end.
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        SPAN_SECONDS.observe(end - start, kind=kind, name=name)
+        trace = _trace.get()
+        if trace is not None:
+            spans, trace_start, lock = trace
+            record = {"kind": kind, "name": name, "start": round(start - trace_start, 4),
+                      "duration": round(end - start, 4), **attributes}
+            if error:
+                record["error"] = error
+            with lock:
+                spans.append(record)
+
+
+def record_parse_failure(agent):
+    PARSE_FAILURES.inc(agent=agent)
+
+
+def render_metrics(gauges=None, extra_samples=()):
+    """
+    Returns all metrics in the Prometheus text format, after setting the given gauge values.
+
+    `extra_samples` are REGISTRY.samples() dicts from worker processes, whose
+    lines carry a label that tells them apart.
+    """
+    for name, value in (gauges or {}).items():
+        GAUGES.set(value, name=name)
+    return REGISTRY.render(extra_samples)
@@ -0,0 +1,97 @@
+import contextvars
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from . import file_parser
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload is larger than UPLOAD_MAX_MB."""
+
+
+class Upload:
+    """
+    An uploaded document held by the server until its job has run.
+
+    The bytes live in a spooled buffer: in memory up to UPLOAD_SPOOL_MB,
+    beyond that in an anonymous temporary file that has no name to collide
+    with and disappears when closed. The SHA-256 is computed while the
+    upload is received.
+    """
+
+    def __init__(self, filename, buffer, size, sha256):
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self._buffer = buffer
+
+    def read(self):
+        self._buffer.seek(0)
+        return self._buffer.read()
+
+    def parse(self, on_first_page=None):
+        """Returns the document's text (see file_parser.parse_bytes)."""
+        return file_parser.parse_bytes(self.read(), self.filename, self.sha256, on_first_page)
+
+    def close(self):
+        self._buffer.close()
+
+
+def _megabytes(name, default):
+    return int(float(os.getenv(name, default)) * 1024 * 1024)
+
+
+async def receive(file):
+    """
+    Copies a FastAPI UploadFile into an Upload chunk by chunk, hashing as it goes.
+
+    Raises UploadTooLargeError as soon as more than UPLOAD_MAX_MB (default 50)
+    has been read.
+    """
+    max_bytes = _megabytes("UPLOAD_MAX_MB", "50")
+    buffer = tempfile.SpooledTemporaryFile(max_size=_megabytes("UPLOAD_SPOOL_MB", "5"))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(
+                    f"{file.filename} is larger than the {max_bytes // (1024 * 1024)} MB upload limit.")
+            digest.update(chunk)
+            buffer.write(chunk)
+    except BaseException:
+        buffer.close()
+        raise
+    return Upload(os.path.basename(file.filename or ""), buffer, size, digest.hexdigest())
+
+
+async def receive_all(files):
+    """Receives every file of a multi-file request; if one fails, the others are released."""
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await receive(file))
+    except BaseException:
+        close_all(uploads)
+        raise
+    return uploads
+
+
+def close_all(uploads):
+    for upload in uploads:
+        upload.close()
+
+
+def parse_all(uploads):
+    """Parses uploads concurrently (UPLOAD_PARSE_WORKERS, default 4) and returns their texts in order."""
+    workers = max(1, min(len(uploads), int(os.getenv("UPLOAD_PARSE_WORKERS", "4"))))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, upload.parse) for upload in uploads]
+        return [future.result() for future in futures]
@@ -173,15 +173,20 @@ async function handleAnalysisSubmit(e) {
 
     setLoadingState(analyzeBtn, 'Analyzing...', resultsContainer, spinner, reportsContainer);
 
-    for (const file of files) {
+    if (files.length === 1) {
+        // A single deck is streamed so its report fills in agent by agent
         const formData = new FormData();
-        formData.append('file', file);
+        formData.append('file', files[0]);
         try {
-            const response = await fetch('/analyze', { method: 'POST', body: formData });
-            if (!response.ok) throw new Error((await response.json()).error || `HTTP error! status: ${response.status}`);
-            displayAnalysisReport(await response.json(), file.name);
+            await streamAnalysis(formData, files[0].name);
         } catch (error) {
-            reportsContainer.innerHTML += createErrorCard(file.name, error.message);
+            reportsContainer.insertAdjacentHTML('beforeend', createErrorCard(files[0].name, error.message));
+        }
+    } else {
+        try {
+            await analyzeBatch(files);
+        } catch (error) {
+            reportsContainer.insertAdjacentHTML('beforeend', createErrorCard('Batch Analysis', error.message));
         }
     }
     resetLoadingState(analyzeBtn, 'Analyze Pitch Decks', spinner, analyzeAnotherBtn);
@@ -197,15 +202,168 @@ async function handleDealNotesSubmit(e) {
     files.forEach(file => formData.append('files', file));
 
     try {
-        const response = await fetch('/deal-notes', { method: 'POST', body: formData });
-        if (!response.ok) throw new Error((await response.json()).error || `HTTP error! status: ${response.status}`);
-        displayDealNotes(await response.json());
+        displayDealNotes(await submitJob('/deal-notes', formData));
     } catch (error) {
         dealNotesReportContainer.innerHTML = createErrorCard('Deal Notes Generation', error.message);
     }
     resetLoadingState(generateNotesBtn, 'Generate Deal Notes', dealNotesSpinner, generateAnotherBtn);
 }
 
+// Submits a background job and polls its status until the result is ready
+async function submitJob(url, formData) {
+    const response = await fetch(url, { method: 'POST', body: formData });
+    const accepted = await response.json();
+    if (!response.ok) throw new Error(accepted.error || `HTTP error! status: ${response.status}`);
+    return pollJob(accepted.job_id);
+}
+
+// Sends all decks in one request and shows each report as soon as its job finishes
+async function analyzeBatch(files) {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    const response = await fetch('/analyze-batch', { method: 'POST', body: formData });
+    const accepted = await response.json();
+    if (!response.ok) throw new Error(accepted.error || `HTTP error! status: ${response.status}`);
+
+    await Promise.all(accepted.jobs.map(async (job, index) => {
+        const card = createPendingReportCard(job.filename, index);
+        reportsContainer.appendChild(card);
+        try {
+            card.replaceWith(createAnalysisReportCard(await pollJob(job.job_id), index, job.filename));
+        } catch (error) {
+            card.outerHTML = createErrorCard(job.filename, error.message);
+        }
+    }));
+}
+
+// Jobs this page is still waiting for; they are cancelled if the page is closed
+const pendingJobs = new Set();
+window.addEventListener('pagehide', () => {
+    pendingJobs.forEach(jobId => navigator.sendBeacon(`/jobs/${jobId}/cancel`));
+});
+
+async function pollJob(jobId) {
+    pendingJobs.add(jobId);
+    try {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const statusResponse = await fetch(`/jobs/${jobId}`);
+            const job = await statusResponse.json();
+            if (!statusResponse.ok) throw new Error(job.error || `HTTP error! status: ${statusResponse.status}`);
+            if (job.status === 'done') return job.result;
+            if (['failed', 'timeout', 'cancelled'].includes(job.status)) throw new Error(job.error || `Job ${job.status}`);
+        }
+    } finally {
+        pendingJobs.delete(jobId);
+    }
+}
+
+// Reads a Server-Sent Events response body and calls onEvent(name, data) for each event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
+    }
+}
+
+// Streams one analysis and fills in the report card section by section as agents finish
+async function streamAnalysis(formData, filename) {
+    const response = await fetch('/analyze/stream', { method: 'POST', body: formData });
+    if (!response.ok) throw new Error((await response.json()).error || `HTTP error! status: ${response.status}`);
+
+    const index = reportsContainer.children.length;
+    const card = createPendingReportCard(filename, index);
+    reportsContainer.appendChild(card);
+
+    let streamError = null;
+    await readEventStream(response, (event, data) => {
+        if (event === 'report') {
+            card.replaceWith(createAnalysisReportCard(data, index, filename));
+        } else if (event === 'error') {
+            streamError = data.error;
+        } else {
+            updatePendingReportCard(card, event, data);
+        }
+    });
+    if (streamError) {
+        card.remove();
+        throw new Error(streamError);
+    }
+}
+
+function createPendingReportCard(filename, index) {
+    const card = document.createElement('div');
+    card.className = 'report-card';
+    card.style.animationDelay = `${index * 0.1}s`;
+    const sections = [
+        ['financial', 'Financials'], ['market', 'Market'], ['team', 'Team'], ['public_data', 'Public Data'],
+        ['risk', 'Risk'], ['benchmark', 'Benchmark'], ['recommendation', 'Recommendation']
+    ];
+    card.innerHTML = `
+        <div class="report-header">
+            <div class="report-title">${filename}</div>
+            <div class="report-status">Analyzing...</div>
+        </div>
+        ${sections.map(([key, title]) => `<h5>${title}:</h5><p data-section="${key}">Pending...</p>`).join('')}
+    `;
+    return card;
+}
+
+function updatePendingReportCard(card, event, data) {
+    if (event === 'requeued') {
+        // A worker stopped mid-analysis and the job started over; its earlier results are discarded
+        card.querySelectorAll('[data-section]').forEach(section => { section.textContent = 'Pending...'; });
+        card.querySelector('.report-status').textContent = 'Retrying...';
+        return;
+    }
+    if (event === 'triage' && data) {
+        card.querySelector('.report-status').textContent = `Triage score: ${data.score ?? 'N/A'}`;
+        return;
+    }
+    const section = card.querySelector(`[data-section="${event}"]`);
+    if (!section || !data) return;
+    switch (event) {
+        case 'financial':
+            section.textContent = `Revenue: ${data.revenue || 'N/A'}, CAC: ${data.cac || 'N/A'}, LTV: ${data.ltv || 'N/A'}`;
+            break;
+        case 'market':
+            section.textContent = `TAM: ${data.tam || 'N/A'}, SAM: ${data.sam || 'N/A'}, SOM: ${data.som || 'N/A'}`;
+            break;
+        case 'team':
+            section.textContent = data.founders_background || 'N/A';
+            break;
+        case 'public_data':
+            section.textContent = `${data.news_sentiment || 'N/A'} - ${data.public_data_summary || 'N/A'}`;
+            break;
+        case 'risk':
+            section.textContent = `Overall: ${data.overall_risk || 'N/A'}`;
+            break;
+        case 'benchmark':
+            section.textContent = data.benchmark_summary || 'N/A';
+            break;
+        case 'recommendation':
+            section.textContent = `${data.recommendation || 'N/A'} (${data.confidence || 'N/A'}%) - ${data.investment_rationale || 'N/A'}`;
+            card.querySelector('.report-status').textContent = `${data.recommendation || 'N/A'} (${data.confidence || 'N/A'}%)`;
+            break;
+    }
+}
+
 function setLoadingState(btn, text, results, spinner, reports) {
     btn.disabled = true;
     btn.textContent = text;
@@ -244,7 +402,8 @@ function createAnalysisReportCard(report, index, filename) {
     card.style.animationDelay = `${index * 0.1}s`;
 
     const recommendation = report.recommendation || {};
-    const rec_text = `${recommendation.recommendation || 'N/A'} (${recommendation.confidence || 'N/A'}%)`;
+    const screened = report.analysis_path === 'triage_exit' ? ' - screened out' : '';
+    const rec_text = `${recommendation.recommendation || 'N/A'} (${recommendation.confidence || 'N/A'}%)${screened}`;
 
     card.innerHTML = `
         <div class="report-header">
@@ -287,11 +446,13 @@ function createRiskDashboard(risk, container) {
 function createRadarChart(report, canvas) {
     if (!report || !canvas) return;
     const riskToScore = (level) => ({ 'HIGH': 1, 'MEDIUM': 3, 'LOW': 5 }[level.toUpperCase()] || 0);
+    // A deck screened out at triage has no risk, team or benchmark analysis; its axes stay empty rather than scoring LOW risk
+    const screened = report.analysis_path === 'triage_exit';
     const data = {
         labels: ['Financial', 'Market', 'Team', 'Execution', 'Benchmark'],
         datasets: [{
-            label: 'Startup Score (out of 5)',
-            data: [
+            label: screened ? 'Not assessed (screened out at triage)' : 'Startup Score (out of 5)',
+            data: screened ? [null, null, null, null, null] : [
                 riskToScore(report.risk?.financial_risk || 'LOW'),
                 riskToScore(report.risk?.market_risk || 'LOW'),
                 (report.team?.founders_background?.includes('Error') ? 1 : 4),
@@ -1,13 +1,16 @@
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-import shutil
+import asyncio
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
-from typing import List
-import vertexai
+from typing import List, Optional
+from contextlib import asynccontextmanager
 
 # Get the absolute path of the directory containing web_server.py
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,12 +19,41 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 dotenv_path = os.path.join(base_dir, '.env')
 load_dotenv(dotenv_path=dotenv_path, override=True)
 
-# Import agents and parsers after loading .env
-from main import run_analysis
-from agents import deal_notes_agent
-from utils import file_parser
+# Import after loading .env so the queue and backend read its settings
+from utils.backends import get_backend
+from utils.job_queue import FINISHED, QueueFullError, get_job_queue
+from utils.portfolio import QueryError, get_portfolio
+from utils.report_store import get_report_store, store_enabled
+from utils.telemetry import render_metrics
+from utils.uploads import UploadTooLargeError, close_all, receive, receive_all
+from worker import start_workers, stop_workers
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start the worker processes and wait for them to finish warming up before reporting ready;
+    # with JOB_WORKERS=0 the workers run separately (python worker.py)
+    start = time.perf_counter()
+    count = int(os.getenv("JOB_WORKERS", "2"))
+    processes = start_workers(count) if count > 0 else []
+    deadline = time.monotonic() + float(os.getenv("JOB_WORKER_START_SECONDS", "60"))
+    while processes and len(await asyncio.to_thread(job_queue.workers)) < count and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if store_enabled():
+        # Load the portfolio table now rather than on the first screening query
+        await asyncio.to_thread(get_portfolio().refresh)
+    workers = await asyncio.to_thread(job_queue.workers)
+    app.state.warm_up = {"workers": len(workers), "total": round(time.perf_counter() - start, 3)}
+    print(f"Server warm-up finished in {app.state.warm_up['total']:.2f}s "
+          f"with {app.state.warm_up['workers']} worker(s) ready")
+    yield
+    await asyncio.to_thread(stop_workers, processes)
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Analyses run in worker processes (worker.py) that claim jobs from this durable queue
+job_queue = get_job_queue()
 
 templates = Jinja2Templates(directory=os.path.join(base_dir, "web/templates"))
 app.mount("/static", StaticFiles(directory=os.path.join(base_dir, "web/static")), name="static")
@@ -30,64 +62,214 @@ app.mount("/static", StaticFiles(directory=os.path.join(base_dir, "web/static"))
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/analyze")
-async def analyze_file(file: UploadFile = File(...)):
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, file.filename)
+def _document(upload):
+    return upload.sha256, upload.filename, upload.read()
+
+
+def _analysis_dedup_key(upload, trace=False, triage=None):
+    """Identical documents share one job while it is active; traced runs and explicit triage choices are kept apart."""
+    extension = os.path.splitext(upload.filename)[1].lower()
+    key = f"{upload.sha256}{extension}" + (":trace" if trace else "")
+    return key if triage is None else f"{key}:triage={triage}"
 
-    try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
 
-        report = run_analysis(temp_file_path)
+def _deal_notes_dedup_key(uploads):
+    return hashlib.sha256(":".join(upload.sha256 + os.path.splitext(upload.filename)[1].lower()
+                                   for upload in uploads).encode("utf-8")).hexdigest()
 
-        if "error" in report:
-            return JSONResponse(status_code=500, content=report)
 
-        return JSONResponse(content=report)
+def _job_accepted(job_id):
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"})
 
+
+@app.post("/analyze")
+async def analyze_file(file: UploadFile = File(...), trace: bool = False, triage: Optional[bool] = None):
+    try:
+        upload = await receive(file)
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    try:
+        job_id = await asyncio.to_thread(job_queue.submit, "analysis", {"trace": trace, "triage": triage},
+                                         [_document(upload)], _analysis_dedup_key(upload, trace, triage))
+        return _job_accepted(job_id)
+    except QueueFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
     finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        upload.close()
+
+@app.post("/analyze-batch")
+async def analyze_batch(files: List[UploadFile] = File(...), triage: Optional[bool] = None):
+    """Queues one analysis job per uploaded file; the jobs share the worker pool and model rate budget."""
+    uploads = []
+    try:
+        uploads = await receive_all(files)
+        job_ids = await asyncio.to_thread(job_queue.submit_many, "analysis", [
+            ({"trace": False, "triage": triage}, [_document(upload)], _analysis_dedup_key(upload, triage=triage))
+            for upload in uploads
+        ])
+        return JSONResponse(status_code=202, content={"jobs": [
+            {"filename": file.filename, "job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+            for file, job_id in zip(files, job_ids)
+        ]})
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except QueueFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
+    finally:
+        close_all(uploads)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/analyze/stream")
+async def analyze_file_stream(request: Request, file: UploadFile = File(...), trace: bool = False,
+                              triage: Optional[bool] = None):
+    """
+    Queues an analysis and streams each agent's result as a Server-Sent Event.
+
+    If the client disconnects before the report, its subscription to the job
+    is cancelled.
+    """
+    try:
+        upload = await receive(file)
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    try:
+        job_id = await asyncio.to_thread(job_queue.submit, "analysis", {"trace": trace, "triage": triage},
+                                         [_document(upload)], _analysis_dedup_key(upload, trace, triage))
+    except QueueFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    finally:
+        upload.close()
+
+    async def event_stream():
+        finished = False
+        try:
+            yield _sse("job", {"job_id": job_id})
+            seq = 0
+            while True:
+                # Read the status before the events so a job's last events are never missed
+                job = await asyncio.to_thread(job_queue.get, job_id)
+                for seq, name, data in await asyncio.to_thread(job_queue.events, job_id, seq):
+                    yield _sse(name, data)
+                    if name in ("report", "error"):
+                        finished = True
+                        return
+                if job is None or job["status"] in FINISHED:
+                    finished = True
+                    yield _sse("error", {"error": (job or {}).get("error") or f"Job {job_id} is no longer available."})
+                    return
+                if await request.is_disconnected():
+                    return
+                await asyncio.sleep(float(os.getenv("JOB_EVENT_POLL_SECONDS", "0.1")))
+        finally:
+            if not finished:
+                # The queue's writes can wait on its lock, so they stay off the event loop
+                await asyncio.to_thread(job_queue.cancel, job_id)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/deal-notes")
 async def create_deal_notes(files: List[UploadFile] = File(...)):
-    print(f"--- DEBUG: Initializing Vertex AI with project: {os.getenv('GOOGLE_CLOUD_PROJECT')} ---")
-    vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+    uploads = []
+    try:
+        uploads = await receive_all(files)
+        job_id = await asyncio.to_thread(job_queue.submit, "deal_notes", {}, [_document(upload) for upload in uploads],
+                                         _deal_notes_dedup_key(uploads))
+        return _job_accepted(job_id)
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except QueueFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
+    finally:
+        close_all(uploads)
 
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
+@app.get("/health")
+def health():
+    return JSONResponse(content={
+        "status": "ok",
+        "jobs": job_queue.stats(),
+        "workers": [{**{key: value for key, value in worker.items() if key != "metrics"},
+                     "client_setup": worker["metrics"].get("client_setup")} for worker in job_queue.workers()],
+        "backend": get_backend().name,
+        "warm_up_seconds": getattr(app.state, "warm_up", None),
+    })
 
-    texts = []
-    temp_files = []
+@app.get("/metrics")
+def metrics():
+    """Exposes span histograms, token, cache, parse-failure and throttle counters of every live worker to Prometheus."""
+    workers = job_queue.workers()
+    jobs = job_queue.stats()
+    gauges = {f"jobs_{status}": jobs.get(status, 0) for status in ("queued", "running") + FINISHED}
+    gauges["workers_alive"] = len(workers)
+    return PlainTextResponse(render_metrics(gauges, extra_samples=[worker["metrics"].get("samples", {}) for worker in workers]),
+                             media_type="text/plain; version=0.0.4")
 
-    try:
-        for file in files:
-            temp_file_path = os.path.join(temp_dir, file.filename)
-            temp_files.append(temp_file_path)
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return JSONResponse(content=job)
 
-            with open(temp_file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+@app.post("/jobs/{job_id}/cancel")
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Withdraws this client's interest in the job; it stops once no client is waiting for it."""
+    status = await asyncio.to_thread(job_queue.cancel, job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return JSONResponse(content={"job_id": job_id, "status": status})
 
-        for temp_file_path in temp_files:
-            texts.append(file_parser.parse_file(temp_file_path))
+@app.get("/reports")
+def list_reports(company: Optional[str] = None, since: Optional[float] = None,
+                       limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """Lists stored report summaries, newest first."""
+    return JSONResponse(content={"reports": get_report_store().list(company, since, limit, offset)})
 
-        notes = deal_notes_agent.generate_notes(texts)
+@app.get("/reports/by-document/{doc_hash}")
+def get_report_by_document(doc_hash: str):
+    """Returns the latest stored report for a document's SHA-256."""
+    report = get_report_store().latest_for_document(doc_hash)
+    if report is None:
+        return JSONResponse(status_code=404, content={"error": f"No report for document: {doc_hash}"})
+    return JSONResponse(content=report)
 
-        if "error" in notes:
-            return JSONResponse(status_code=500, content=notes)
+@app.get("/reports/{report_id}")
+def get_report(report_id: int):
+    report = get_report_store().get(report_id)
+    if report is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown report: {report_id}"})
+    return JSONResponse(content=report)
 
-        return JSONResponse(content=notes)
+@app.get("/portfolio")
+def screen_portfolio(where: Optional[str] = None, sort: Optional[str] = None,
+                     limit: int = Query(50, ge=1, le=1000), offset: int = Query(0, ge=0), latest: bool = True):
+    """
+    Screens and ranks analyzed companies by their normalized metrics, without model calls.
 
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
-    finally:
-        for temp_file_path in temp_files:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+    Example: ?where=LTV/CAC > 3 and TAM > $1B&sort=-confidence
+    """
+    try:
+        return JSONResponse(content=get_portfolio().query(where, sort, limit, offset, latest))
+    except QueryError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@app.get("/portfolio/summary")
+def summarize_portfolio(where: Optional[str] = None, group_by: Optional[str] = None, latest: bool = True):
+    """Counts the matching companies and gives the median of each metric, optionally per group (e.g. sector)."""
+    try:
+        return JSONResponse(content={"groups": get_portfolio().aggregate(where, group_by, latest)})
+    except QueryError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
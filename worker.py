@@ -0,0 +1,210 @@
+import argparse
+import contextvars
+import io
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+from utils import gcp_clients
+from utils.job_queue import get_job_queue
+from utils.rate_limiter import cancellation_scope, get_limiter
+from utils.telemetry import GAUGES, REGISTRY
+from utils.uploads import Upload, parse_all
+
+
+def _analysis_job(job, documents, emit):
+    from main import run_analysis
+
+    (sha256, filename, content), = documents
+    upload = Upload(filename, io.BytesIO(content), len(content), sha256)
+    report = run_analysis(upload, on_event=emit, trace=job["payload"].get("trace", False),
+                          triage=job["payload"].get("triage"))
+    emit("error" if "error" in report else "report", report)
+    if "error" in report:
+        raise RuntimeError(report["error"])
+    return report
+
+
+def _deal_notes_job(job, documents, emit):
+    from agents import deal_notes_agent
+
+    uploads = [Upload(filename, io.BytesIO(content), len(content), sha256) for sha256, filename, content in documents]
+    notes = deal_notes_agent.generate_notes(parse_all(uploads))
+    if "error" in notes:
+        raise RuntimeError(notes["error"])
+    return notes
+
+
+JOBS = {"analysis": _analysis_job, "deal_notes": _deal_notes_job}
+
+
+class Worker:
+    """
+    Claims jobs from the shared job queue one at a time and runs them.
+
+    While a job runs, the worker sends a heartbeat every `heartbeat_interval`
+    seconds and stops the job (at its next model call) if it was cancelled or
+    ran past the queue's timeout. `drain()` lets the current job finish and
+    then stops the loop.
+    """
+
+    def __init__(self, queue, worker_id=None, heartbeat_interval=5.0, poll_interval=0.2):
+        self.queue = queue
+        self.id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self._draining = threading.Event()
+
+    def drain(self):
+        self._draining.set()
+
+    def _metrics(self):
+        # The model quota is spent and the model clients are set up here, so both are reported with the heartbeat
+        limiter = get_limiter().metrics()
+        GAUGES.set(limiter["concurrency_limit"], name="limiter_concurrency_limit")
+        GAUGES.set(limiter["in_flight"], name="limiter_in_flight")
+        GAUGES.set(limiter["cooldown_remaining"], name="limiter_cooldown_seconds")
+        return {"samples": REGISTRY.samples(worker=self.id), "client_setup": gcp_clients.setup_stats()}
+
+    def run(self):
+        self.queue.register_worker(self.id)
+        print(f"Worker {self.id} started.")
+        last_heartbeat = 0
+        try:
+            while not self._draining.is_set():
+                job = self.queue.claim(self.id)
+                if job is not None:
+                    self._run_job(job)
+                    continue
+                if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                    self.queue.heartbeat(self.id, status="idle", metrics=self._metrics())
+                    last_heartbeat = time.monotonic()
+                self._draining.wait(self.poll_interval)
+        finally:
+            self.queue.stop_worker(self.id)
+            print(f"Worker {self.id} stopped.")
+
+    def _run_job(self, job):
+        print(f"Worker {self.id}: running {job['kind']} job {job['id']} (attempt {job['attempt']}).")
+        cancel = threading.Event()
+        outcome = {}
+
+        def emit(name, data):
+            self.queue.add_event(job["id"], name, data)
+
+        def target():
+            try:
+                with cancellation_scope(cancel):
+                    documents = self.queue.load_documents(job["id"])
+                    outcome["result"] = JOBS[job["kind"]](job, documents, emit)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(target,), daemon=True)
+        thread.start()
+        timed_out = False
+        while thread.is_alive():
+            thread.join(self.heartbeat_interval)
+            if thread.is_alive():
+                stop = self.queue.heartbeat(self.id, job["id"], status="busy",
+                                            metrics=self._metrics())
+                timed_out = bool(self.queue.timeout) and time.time() - job["started_at"] > self.queue.timeout
+                if stop or timed_out:
+                    cancel.set()
+
+        error = outcome.get("error")
+        if timed_out:
+            status, error = "timeout", f"Job exceeded the {self.queue.timeout}s time limit."
+        elif cancel.is_set() and error is not None:
+            # run_analysis reports the Cancelled raised by a model call as an error report
+            status, error = "cancelled", "Cancelled by the client."
+        elif error is not None:
+            status, error = "failed", str(error)
+        else:
+            status = "done"
+        self.queue.finish(job["id"], self.id, status, result=outcome.get("result"), error=error)
+        self.queue.heartbeat(self.id, status="idle", metrics=self._metrics())
+        print(f"Worker {self.id}: job {job['id']} {status}.")
+
+
+def run_worker(quota_share=1):
+    """
+    Runs one worker until SIGTERM or SIGINT, then lets its current job finish.
+
+    The Gemini quota (GEMINI_RPM, GEMINI_TPM) is per process, so a worker
+    that is one of `quota_share` processes takes that fraction of it.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+    if quota_share > 1:
+        os.environ["GEMINI_RPM"] = str(max(1, int(os.getenv("GEMINI_RPM", "60")) // quota_share))
+        os.environ["GEMINI_TPM"] = str(max(1, int(os.getenv("GEMINI_TPM", "1000000")) // quota_share))
+
+    worker = Worker(get_job_queue(), heartbeat_interval=float(os.getenv("JOB_HEARTBEAT_SECONDS", "5")))
+    # Import the SDKs and agents before the first job rather than during it
+    from main import warm_up
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"Warm-up failed, clients will be created on first use: {e}")
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: worker.drain())
+    worker.run()
+
+
+def start_workers(count):
+    """Starts `count` worker processes sharing the model quota and returns them."""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        process = context.Process(target=run_worker, args=(count,), name="analysis-worker")
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes, timeout=None):
+    """
+    Asks the workers to drain and waits up to `timeout` seconds (JOB_DRAIN_SECONDS, default 60).
+
+    Workers still busy after that are killed; their jobs are picked up again
+    by the next worker once their heartbeats are missed.
+    """
+    timeout = float(os.getenv("JOB_DRAIN_SECONDS", "60")) if timeout is None else timeout
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"Worker process {process.pid} did not drain in {timeout:.0f}s; killing it.")
+            process.kill()
+            process.join()
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    load_dotenv(dotenv_path=os.path.join(base_dir, '.env'), override=True)
+
+    parser = argparse.ArgumentParser(description="Run analysis workers for the web server's job queue.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKERS", "2")),
+                        help="Number of worker processes; they split the Gemini quota between them.")
+    args = parser.parse_args()
+
+    processes = start_workers(args.processes)
+    # Ctrl+C reaches the whole process group; SIGTERM is forwarded to the workers
+    signal.signal(signal.SIGTERM, lambda *_: stop_workers(processes))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers(processes)
+
+
+if __name__ == "__main__":
+    main()